@@ -12,14 +12,110 @@ class Settings:
     POSTGRES_SERVER: str = os.getenv("POSTGRES_SERVER", "localhost")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", 5432)
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "email_support")
-    DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
     
     EMAIL_USER: str = os.getenv("EMAIL_USER")
     EMAIL_PASSWORD: str = os.getenv("EMAIL_PASSWORD")
     EMAIL_SERVER: str = os.getenv("EMAIL_SERVER", "imap.gmail.com")
     EMAIL_PORT: int = int(os.getenv("EMAIL_PORT", 993))
+    EMAIL_USE_SSL: bool = os.getenv("EMAIL_USE_SSL", "true").lower() == "true"
+    EMAIL_FETCH_CHUNK_SIZE: int = int(os.getenv("EMAIL_FETCH_CHUNK_SIZE", 200))
+    EMAIL_HEADER_FIRST: bool = os.getenv("EMAIL_HEADER_FIRST", "true").lower() == "true"
+    EMAIL_PREVIEW_BYTES: int = int(os.getenv("EMAIL_PREVIEW_BYTES", 4096))
+    EMAIL_PARSE_WORKERS: int = int(os.getenv("EMAIL_PARSE_WORKERS", 0))
+    EMAIL_MAILBOX: str = os.getenv("EMAIL_MAILBOX", "inbox")
+    EMAIL_INITIAL_SYNC_DAYS: int = int(os.getenv("EMAIL_INITIAL_SYNC_DAYS", 7))
+    EMAIL_WATCH_ENABLED: bool = os.getenv("EMAIL_WATCH_ENABLED", "false").lower() == "true"
+    EMAIL_IDLE_TIMEOUT: int = int(os.getenv("EMAIL_IDLE_TIMEOUT", 300))
+    EMAIL_POLL_INTERVAL: float = float(os.getenv("EMAIL_POLL_INTERVAL", 5))
+    
+    # Outgoing mail; SMTP_SERVER defaults to smtp.gmail.com for Gmail, else EMAIL_SERVER
+    SMTP_SERVER: str = os.getenv("SMTP_SERVER")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", 465))
+    SMTP_USE_SSL: bool = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+    
+    # Fetched chunks buffered between ingest pipeline stages
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", 2))
+    
+    SENTIMENT_MODEL: str = os.getenv("SENTIMENT_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+    # "fp32" or "int8" (dynamic int8 quantization, CPU only; needs a torch
+    # that still ships torch.ao.quantization, see requirements.txt)
+    NLP_INFERENCE_MODE: str = os.getenv("NLP_INFERENCE_MODE", "fp32")
+    # torch intra-op threads for inference (0 = torch default)
+    NLP_TORCH_THREADS: int = int(os.getenv("NLP_TORCH_THREADS", 0))
+    # Load the NLP models in the background at startup instead of on first use
+    NLP_WARMUP_ON_STARTUP: bool = os.getenv("NLP_WARMUP_ON_STARTUP", "true").lower() == "true"
+    # Texts per padded forward pass (analyze_sentiment_batch, and the most a
+    # micro-batch holds)
+    NLP_BATCH_SIZE: int = int(os.getenv("NLP_BATCH_SIZE", 16))
+    # Long emails: "head_tail" scores one model window made of the start and
+    # end of the email, "chunked" averages windows over up to
+    # NLP_MAX_TOKENS_PER_EMAIL tokens. Either way no email costs more than
+    # that many tokens of inference.
+    NLP_SENTIMENT_STRATEGY: str = os.getenv("NLP_SENTIMENT_STRATEGY", "head_tail")
+    NLP_MAX_TOKENS_PER_EMAIL: int = int(os.getenv("NLP_MAX_TOKENS_PER_EMAIL", 1536))
+    # Route sentiment inference from all threads through one micro-batching
+    # worker, which dispatches a batch when full or NLP_MAX_WAIT_MS after its
+    # first request arrived
+    NLP_MICROBATCH: bool = os.getenv("NLP_MICROBATCH", "true").lower() == "true"
+    NLP_MAX_WAIT_MS: float = float(os.getenv("NLP_MAX_WAIT_MS", 5))
+    # Characters of a body scanned for phone numbers, emails and URLs, split
+    # between its start and end (0 = no limit)
+    NLP_ENTITY_SCAN_CHARS: int = int(os.getenv("NLP_ENTITY_SCAN_CHARS", 20000))
+    # Analysis results cached by normalized subject/body hash: in-memory LRU
+    # entries (0 = off) and an optional table shared across workers
+    ANALYSIS_CACHE_SIZE: int = int(os.getenv("ANALYSIS_CACHE_SIZE", 10000))
+    ANALYSIS_CACHE_DB: bool = os.getenv("ANALYSIS_CACHE_DB", "false").lower() == "true"
+    # Days a row stays in that table (0 = until the analysis version changes;
+    # rows of older versions are deleted once a new one is written)
+    ANALYSIS_CACHE_DB_MAX_AGE_DAYS: float = float(os.getenv("ANALYSIS_CACHE_DB_MAX_AGE_DAYS", 30))
+    
+    # Knowledge base context for drafts: "embedding" (vector index over a
+    # local sentence-embedding model, built at startup), "bm25" (inverted
+    # index ranked by BM25, saved to KB_BM25_INDEX_PATH and reloaded at
+    # startup) or "keyword" (substring match over the email category's
+    # articles, also used while an index builds or if it cannot be built)
+    KB_SEARCH_BACKEND: str = os.getenv("KB_SEARCH_BACKEND", "embedding")
+    KB_EMBEDDING_MODEL: str = os.getenv("KB_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Up to this many articles every search scores all of them; past it the
+    # index is clustered and a search scores the KB_INDEX_NPROBE nearest clusters
+    KB_INDEX_EXACT_MAX: int = int(os.getenv("KB_INDEX_EXACT_MAX", 5000))
+    KB_INDEX_NPROBE: int = int(os.getenv("KB_INDEX_NPROBE", 8))
+    # Articles less similar than this (cosine) to the email are left out
+    KB_MIN_SIMILARITY: float = float(os.getenv("KB_MIN_SIMILARITY", 0.2))
+    # Where the BM25 index is saved (empty = rebuilt at every startup)
+    KB_BM25_INDEX_PATH: str = os.getenv("KB_BM25_INDEX_PATH", "kb_bm25.index")
+    # Keyword search drafts from an in-memory snapshot of each category's
+    # articles, dropped on knowledge base writes and after this many seconds
+    # (so writes by other workers show up; 0 = only on writes)
+    KB_SNAPSHOT_TTL: float = float(os.getenv("KB_SNAPSHOT_TTL", 300))
     
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    # Optional OpenAI-compatible endpoint (proxy, local stand-in)
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL")
+    # Seconds before an LLM request is abandoned, and how many times a
+    # draft's request is retried after a rate limit (429), server error
+    # (5xx), timeout or connection error, with jittered exponential backoff
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", 30))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", 3))
+    # Drafts waiting on the LLM at once
+    DRAFT_CONCURRENCY: int = int(os.getenv("DRAFT_CONCURRENCY", 16))
+    # Failed drafts are retried up to DRAFT_MAX_ATTEMPTS attempts in all, the
+    # first retry DRAFT_RETRY_DELAY seconds after the failure, doubling after
+    # each; emails still without a draft are looked for at most that often
+    DRAFT_MAX_ATTEMPTS: int = int(os.getenv("DRAFT_MAX_ATTEMPTS", 5))
+    DRAFT_RETRY_DELAY: float = float(os.getenv("DRAFT_RETRY_DELAY", 60))
+    # Drafts are reused for emails with the same normalized subject and body,
+    # category, sentiment, extracted contact details and knowledge base
+    # context: up to this many (0 = off), for up to RESPONSE_CACHE_TTL seconds
+    # (0 = no expiry). With RESPONSE_CACHE_MAX_DISTANCE > 0 also for
+    # near-duplicates, whose 64-bit SimHash of subject and body words differs
+    # in at most that many bits. Numbers are ignored by the SimHash, so a
+    # near-duplicate's draft may quote another email's order number, ticket
+    # number or amount; review reused drafts before sending them.
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+    RESPONSE_CACHE_MAX_DISTANCE: int = int(os.getenv("RESPONSE_CACHE_MAX_DISTANCE", 0))
     
     class Config:
         case_sensitive = True
@@ -1,7 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, or_
 from app import models, schemas
+from app.services.bm25_index import bm25_index
+from app.services.kb_snapshot import kb_snapshot
+from app.services.knowledge_index import knowledge_index
 from datetime import datetime, timedelta
+from typing import Dict, List, Set
 
 def get_email(db: Session, email_id: int):
     return db.query(models.Email).filter(models.Email.id == email_id).first()
@@ -9,6 +13,50 @@ def get_email(db: Session, email_id: int):
 def get_email_by_message_id(db: Session, message_id: str):
     return db.query(models.Email).filter(models.Email.message_id == message_id).first()
 
+def get_existing_message_ids(db: Session, message_ids: List[str], chunk_size: int = 1000) -> Set[str]:
+    """
+    Return the subset of message_ids already stored, using one IN query per
+    chunk_size ids instead of one lookup per message
+    """
+    existing = set()
+    message_ids = list(dict.fromkeys(message_ids))
+    for start in range(0, len(message_ids), chunk_size):
+        chunk = message_ids[start:start + chunk_size]
+        rows = db.query(models.Email.message_id).filter(models.Email.message_id.in_(chunk)).all()
+        existing.update(message_id for message_id, in rows)
+    return existing
+
+def get_undrafted_message_ids(db: Session, max_attempts: int = 0, retry_delay: float = 0) -> List[str]:
+    """
+    Message ids of stored emails still without an AI response (drafting
+    failed, or was dropped at shutdown), oldest first. Emails with
+    ``max_attempts`` failed attempts (0 = no limit) are left out, and so
+    are those whose last failure is less than ``retry_delay`` seconds ago,
+    doubled for each earlier failure.
+    """
+    query = db.query(models.Email.message_id, models.Email.draft_attempts, models.Email.draft_failed_at).filter(
+        models.Email.is_processed.isnot(True), models.Email.ai_response.is_(None)
+    )
+    if max_attempts > 0:
+        query = query.filter(or_(models.Email.draft_attempts.is_(None), models.Email.draft_attempts < max_attempts))
+    now = datetime.utcnow()
+    return [
+        message_id for message_id, attempts, failed_at in query.order_by(models.Email.id)
+        if not attempts or failed_at is None
+        or failed_at + timedelta(seconds=retry_delay * 2 ** (attempts - 1)) <= now
+    ]
+
+def record_draft_failure(db: Session, message_id: str):
+    """
+    Count a failed attempt at drafting an email's AI response
+    """
+    db.query(models.Email).filter(models.Email.message_id == message_id).update(
+        {models.Email.draft_attempts: func.coalesce(models.Email.draft_attempts, 0) + 1,
+         models.Email.draft_failed_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.commit()
+
 def get_emails(db: Session, skip: int = 0, limit: int = 100, 
                urgency: int = None, sentiment: str = None, 
                category: str = None, processed: bool = None):
@@ -32,6 +80,7 @@ def create_email(db: Session, email: schemas.EmailCreate):
         recipient=email.recipient,
         subject=email.subject,
         body=email.body,
+        clean_body=email.clean_body,
         date=email.date,
         sentiment=email.sentiment,
         sentiment_score=email.sentiment_score,
@@ -44,6 +93,48 @@ def create_email(db: Session, email: schemas.EmailCreate):
     db.refresh(db_email)
     return db_email
 
+def create_emails_bulk(db: Session, emails: List[schemas.EmailCreate], batch_size: int = 500) -> Dict[str, int]:
+    """
+    Insert many emails with one multi-row INSERT ... ON CONFLICT (message_id)
+    DO NOTHING per batch_size rows and a single commit, so concurrent ingests
+    can insert the same message safely. Returns {message_id: id} for the rows
+    actually inserted; already stored message ids are left out.
+    """
+    if not emails:
+        return {}
+    
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No portable upsert: fall back to the per-row path
+        existing = get_existing_message_ids(db, [email.message_id for email in emails])
+        created = {}
+        for email in emails:
+            if email.message_id not in existing and email.message_id not in created:
+                created[email.message_id] = create_email(db, email).id
+        return created
+    
+    created = {}
+    try:
+        for start in range(0, len(emails), batch_size):
+            rows = [email.dict() for email in emails[start:start + batch_size]]
+            stmt = (
+                insert(models.Email)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["message_id"])
+                .returning(models.Email.id, models.Email.message_id)
+            )
+            for email_id, message_id in db.execute(stmt):
+                created[message_id] = email_id
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return created
+
 def update_email(db: Session, email_id: int, email_update: schemas.EmailUpdate):
     db_email = db.query(models.Email).filter(models.Email.id == email_id).first()
     if db_email:
@@ -108,10 +199,119 @@ def create_knowledge_base_item(db: Session, kb_item: schemas.KnowledgeBaseCreate
     db.add(db_kb)
     db.commit()
     db.refresh(db_kb)
+    _index_knowledge_base_items([db_kb])
     return db_kb
 
+def update_knowledge_base_item(db: Session, item_id: int, kb_update: schemas.KnowledgeBaseUpdate):
+    db_kb = db.query(models.KnowledgeBase).filter(models.KnowledgeBase.id == item_id).first()
+    if db_kb:
+        for key, value in kb_update.dict(exclude_unset=True).items():
+            setattr(db_kb, key, value)
+        db.commit()
+        db.refresh(db_kb)
+        _index_knowledge_base_items([db_kb])
+    return db_kb
+
+def _index_knowledge_base_items(items: List[models.KnowledgeBase]):
+    # Search indexes that are not built are left alone
+    knowledge_index.add(items)
+    bm25_index.add(items)
+    kb_snapshot.invalidate()
+
 def get_knowledge_base_items(db: Session, skip: int = 0, limit: int = 100, category: str = None):
     query = db.query(models.KnowledgeBase)
     if category:
         query = query.filter(models.KnowledgeBase.category == category)
     return query.order_by(desc(models.KnowledgeBase.updated_at)).offset(skip).limit(limit).all()
+
+def iter_knowledge_base_items(db: Session, batch_size: int = 1000, updated_since: datetime = None):
+    """
+    Yield every knowledge base item (or those updated at or after
+    updated_since), batch_size rows per query (keyset pagination on id)
+    """
+    query = db.query(models.KnowledgeBase)
+    if updated_since is not None:
+        query = query.filter(models.KnowledgeBase.updated_at >= updated_since)
+    last_id = 0
+    while True:
+        batch = query.filter(models.KnowledgeBase.id > last_id).order_by(
+            models.KnowledgeBase.id
+        ).limit(batch_size).all()
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+def count_knowledge_base_items(db: Session) -> int:
+    return db.query(models.KnowledgeBase).count()
+
+def get_sync_state(db: Session, mailbox: str):
+    return db.query(models.MailboxSyncState).filter(models.MailboxSyncState.mailbox == mailbox).first()
+
+def update_sync_state(db: Session, mailbox: str, uidvalidity: int, last_uid: int):
+    db_state = get_sync_state(db, mailbox)
+    if db_state is None:
+        db_state = models.MailboxSyncState(mailbox=mailbox)
+        db.add(db_state)
+    db_state.uidvalidity = uidvalidity
+    db_state.last_uid = last_uid
+    db.commit()
+    db.refresh(db_state)
+    return db_state
+
+def get_analysis_cache_entries(db: Session, keys: List[str], chunk_size: int = 1000) -> Dict[str, dict]:
+    """
+    Return {key: result} for the cached analysis results among ``keys``
+    """
+    found = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        rows = db.query(models.AnalysisCacheEntry.key, models.AnalysisCacheEntry.result).filter(
+            models.AnalysisCacheEntry.key.in_(chunk)
+        )
+        found.update(rows)
+    return found
+
+def delete_stale_analysis_cache_entries(db: Session, version: str, max_age_days: float = 0) -> int:
+    """
+    Delete cached analysis results of other versions, and those older than
+    ``max_age_days`` (0 = any age); return how many rows were deleted
+    """
+    stale = models.AnalysisCacheEntry.version != version
+    if max_age_days > 0:
+        stale = stale | (models.AnalysisCacheEntry.created_at < datetime.utcnow() - timedelta(days=max_age_days))
+    deleted = db.query(models.AnalysisCacheEntry).filter(stale).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def save_analysis_cache_entries(db: Session, entries: Dict[str, dict], version: str, batch_size: int = 500):
+    """
+    Store analysis results by key, leaving keys that are already stored
+    (e.g. written by a concurrent ingest) as they are
+    """
+    if not entries:
+        return
+    
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+    
+    try:
+        if insert is None:
+            existing = get_analysis_cache_entries(db, list(entries))
+            db.add_all(models.AnalysisCacheEntry(key=key, version=version, result=result)
+                       for key, result in entries.items() if key not in existing)
+        else:
+            rows = [{"key": key, "version": version, "result": result, "created_at": datetime.utcnow()}
+                    for key, result in entries.items()]
+            for start in range(0, len(rows), batch_size):
+                stmt = insert(models.AnalysisCacheEntry).values(rows[start:start + batch_size])
+                db.execute(stmt.on_conflict_do_nothing(index_elements=["key"]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -0,0 +1,203 @@
+"""
+AI response drafting for stored emails, concurrently on an asyncio loop
+"""
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app import schemas, crud
+from app.database import SessionLocal
+from app.config import settings
+from app.services.ai_service import (
+    active_knowledge_index, create_async_client, generate_response_async, search_knowledge_base
+)
+from app.services.kb_snapshot import kb_snapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Threads for the drafts' DB work: short queries next to the LLM wait, so a
+# few keep up with many drafts in flight and stay well inside the pool
+_DB_WORKERS = 4
+
+def prepare_draft(db: Session, message_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The generate_response arguments for an email, plus its id under
+    "email_id"; None if there is no such email or it already has a response
+    """
+    email = crud.get_email_by_message_id(db, message_id)
+    if not email or email.ai_response is not None or email.is_processed:
+        return None
+
+    # Knowledge base items for keyword search, from the per-category
+    # snapshot; a ready index needs none
+    knowledge_items = None
+    if active_knowledge_index() is None:
+        knowledge_items = kb_snapshot.get(
+            email.category, lambda: crud.get_knowledge_base_items(db, category=email.category)
+        )
+
+    # Search for relevant knowledge
+    # Quoted thread and signature only cost tokens
+    body = email.clean_body or email.body
+    query = f"{email.subject} {body[:100]}"
+    knowledge_context = search_knowledge_base(query, knowledge_items, category=email.category)
+
+    return {
+        "email_id": email.id,
+        "email_subject": email.subject,
+        "email_body": body,
+        "sentiment": email.sentiment,
+        "extracted_info": email.extracted_info,
+        "knowledge_context": knowledge_context,
+        "category": email.category,
+    }
+
+def save_draft(db: Session, email_id: int, ai_response: str):
+    """
+    Store an email's AI response and mark it processed
+    """
+    crud.update_email(db, email_id, schemas.EmailUpdate(ai_response=ai_response, is_processed=True))
+
+def _in_own_session(func, *args):
+    db = SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+class DraftEngine:
+    """
+    Drafts emails as coroutines on an event loop in a background thread,
+    through the async OpenAI client, with at most ``concurrency`` drafts
+    in progress; the rest wait their turn in submission order.
+
+    A draft reads its email and knowledge base context in one DB session
+    and writes the response in another, both on a small thread pool, so
+    no session (or pooled connection) is held while the LLM is working. A
+    draft whose request still fails after its retries is logged and
+    counted against the email, which is left without a response;
+    ingest.schedule_drafts queues it again later, with backoff, for up to
+    DRAFT_MAX_ATTEMPTS attempts. An email already queued is not queued
+    twice, and one that has a response by the time its turn comes is not
+    drafted again.
+    """
+
+    def __init__(self, concurrency: int, name: str = "draft-engine"):
+        self.concurrency = max(1, concurrency)
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._client = None
+        self._semaphore = None
+        self._pending = set()
+        self._queued_ids = set()  # message ids of the pending drafts
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "drafted": 0, "failed": 0, "retries": 0}
+        self._in_flight = 0
+
+    def submit(self, message_ids: List[str]) -> List[Future]:
+        """
+        Queue drafts for stored emails; each future resolves once its draft
+        is saved (or has failed)
+        """
+        if not message_ids:
+            return []
+        loop = self._ensure_started()
+        queued = []
+        with self._lock:
+            for message_id in dict.fromkeys(message_ids):
+                if message_id in self._queued_ids:
+                    continue
+                self._queued_ids.add(message_id)
+                future = asyncio.run_coroutine_threadsafe(self._draft(message_id), loop)
+                self._pending.add(future)
+                queued.append((message_id, future))
+            self._counts["submitted"] += len(queued)
+        # Outside the lock: a future already done runs its callback right away
+        for message_id, future in queued:
+            future.add_done_callback(lambda f, message_id=message_id: self._done(f, message_id))
+        return [future for _, future in queued]
+
+    def _done(self, future: Future, message_id: str):
+        with self._lock:
+            self._pending.discard(future)
+            self._queued_ids.discard(message_id)
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._executor = ThreadPoolExecutor(max_workers=min(self.concurrency, _DB_WORKERS),
+                                                    thread_name_prefix=f"{self.name}-db")
+                self._loop = asyncio.new_event_loop()
+                self._loop.set_default_executor(self._executor)
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._client = create_async_client()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    async def _draft(self, message_id: str):
+        async with self._semaphore:
+            self._in_flight += 1
+            loop = asyncio.get_running_loop()
+            try:
+                inputs = await loop.run_in_executor(None, _in_own_session, prepare_draft, message_id)
+                if inputs is None:
+                    return
+                email_id = inputs.pop("email_id")
+                ai_response = await generate_response_async(self._client, **inputs, on_retry=self._retried)
+                await loop.run_in_executor(None, _in_own_session, save_draft, email_id, ai_response)
+                self._counts["drafted"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error drafting response for {message_id}: {e}")
+                self._counts["failed"] += 1
+                try:
+                    await loop.run_in_executor(None, _in_own_session, crud.record_draft_failure, message_id)
+                except Exception as e:
+                    logger.error(f"Error recording failed draft for {message_id}: {e}")
+            finally:
+                self._in_flight -= 1
+
+    def _retried(self, error: Exception):
+        self._counts["retries"] += 1
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Drop queued and in-progress drafts and stop the loop; emails left
+        without a draft are queued again at the next startup
+        """
+        with self._lock:
+            loop, thread, client, executor = self._loop, self._thread, self._client, self._executor
+            pending = list(self._pending)
+            self._loop = self._thread = self._client = self._executor = None
+        if loop is None:
+            return
+        for future in pending:
+            future.cancel()
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"Error closing the drafting client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update(
+                concurrency=self.concurrency,
+                running=self._thread is not None and self._thread.is_alive(),
+                in_flight=self._in_flight,
+                queued=len(self._pending) - self._in_flight,
+            )
+        return stats
+
+draft_engine = DraftEngine(settings.DRAFT_CONCURRENCY)
@@ -0,0 +1,367 @@
+"""
+Email ingestion shared by the /fetch-emails/ endpoint and the mailbox watcher
+"""
+import imaplib
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Tuple
+from sqlalchemy.orm import Session
+from app import schemas, crud
+from app.database import SessionLocal
+from app.config import settings
+from app.services.email_service import iter_email_chunks, parse_emails, filter_support_emails, categorize_email
+from app.services.nlp_service import analyze_sentiment_batch, analysis_version, extract_entities, detect_urgency
+from app.services.analysis_cache import analysis_cache
+from app.services.keywords import scan_keywords
+from app.services.text_cleaning import split_body
+from app.drafting import draft_engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-stage counters reported by sync_mailbox
+INGEST_STAGES = ("parsed", "support", "new", "analyzed", "stored")
+
+# Serializes mailbox syncs so the endpoint and the watcher never ingest the
+# same UID range at the same time
+_sync_lock = threading.Lock()
+
+# When schedule_drafts next looks for earlier emails still without a draft
+_next_backlog_check = 0.0
+
+def sync_mailbox(db: Session, mail: imaplib.IMAP4 = None, stats: Dict = None,
+                 errors: List[str] = None) -> List[str]:
+    """
+    Fetch emails received since the persisted checkpoint, analyze and store
+    them. Returns the message ids of the newly stored emails.
+
+    Messages stream through fetch -> parse -> filter -> analyze -> persist
+    stages connected by bounded queues, one fetch chunk at a time, so memory
+    stays flat with backlog size and network, CPU and DB work overlap. The
+    checkpoint is advanced after each chunk is persisted.
+
+    ``stats`` (if given) is updated live with the fetch byte counts and the
+    number of emails that got through each stage, for progress reporting.
+    Fetch errors that end the sync early are appended to ``errors``.
+
+    An email that fails to parse, analyze or store is logged, counted under
+    ``stats["failed"]``, appended to ``errors`` and skipped, so one bad
+    message cannot hold the checkpoint back.
+    """
+    with _sync_lock:
+        mailbox = settings.EMAIL_MAILBOX
+        sync_state = crud.get_sync_state(db, mailbox)
+        checkpoint = None
+        if sync_state:
+            checkpoint = {"uidvalidity": sync_state.uidvalidity, "last_uid": sync_state.last_uid}
+        
+        new_message_ids = []
+        seen_message_ids = set()
+        stats = stats if stats is not None else {}
+        for stage in INGEST_STAGES + ("failed",):
+            stats.setdefault(stage, 0)
+        dedupe_db = SessionLocal()
+        
+        def parse(chunk):
+            raw_messages, checkpoint = chunk
+            emails = parse_emails(raw_messages, errors=errors)
+            stats["parsed"] += len(emails)
+            stats["failed"] += len(raw_messages) - len(emails)
+            return emails, checkpoint
+        
+        def filter_(batch):
+            emails, checkpoint = batch
+            emails = filter_support_emails(emails)
+            stats["support"] += len(emails)
+            # Skip emails already stored, with one query for the whole batch
+            existing = crud.get_existing_message_ids(dedupe_db, [e["message_id"] for e in emails])
+            fresh = []
+            for email_data in emails:
+                message_id = email_data["message_id"]
+                if message_id in existing or message_id in seen_message_ids:
+                    continue
+                seen_message_ids.add(message_id)
+                fresh.append(email_data)
+            stats["new"] += len(fresh)
+            return fresh, checkpoint
+        
+        def analyze(batch):
+            emails, checkpoint = batch
+            db_emails = analyze_emails(emails, errors=errors)
+            stats["analyzed"] += len(db_emails)
+            stats["failed"] += len(emails) - len(db_emails)
+            return db_emails, checkpoint
+        
+        def persist(batch):
+            db_emails, checkpoint = batch
+            created, failed = _store_emails(db, db_emails, errors)
+            new_message_ids.extend(created)
+            stats["stored"] += len(created)
+            stats["failed"] += failed
+            crud.update_sync_state(db, mailbox, checkpoint["uidvalidity"], checkpoint["last_uid"])
+        
+        try:
+            _run_stages(
+                iter_email_chunks(checkpoint=checkpoint, mailbox=mailbox, mail=mail, stats=stats, errors=errors),
+                [parse, filter_, analyze, persist],
+                settings.INGEST_QUEUE_SIZE
+            )
+        finally:
+            dedupe_db.close()
+        if stats.get("messages"):
+            logger.info(
+                f"Fetched {stats['messages']} messages, "
+                f"{stats['skipped_before_body']} skipped before body download, "
+                f"{stats['bytes_downloaded']} bytes downloaded, {stats['bytes_saved']} bytes saved"
+            )
+        return new_message_ids
+
+def _skip_email(email: str, step: str, error: Exception, errors: List[str] = None):
+    logger.error(f"Skipping email {email}, {step} failed: {error}")
+    if errors is not None:
+        errors.append(f"Skipped email {email}, {step} failed: {error}")
+
+def analyze_emails(emails: List[dict], errors: List[str] = None) -> List[schemas.EmailCreate]:
+    """
+    Run the NLP analysis for a batch of parsed emails, with one batched
+    sentiment pass for the whole batch. Emails whose normalized subject and
+    body were analyzed before are served from the analysis cache.
+    
+    Analysis runs on the cleaned body (no quoted thread, footers or
+    signature); entities are also taken from the signature.
+
+    Emails that fail (e.g. a message without a To: header) are logged,
+    appended to ``errors`` if given and left out of the result.
+    """
+    prepared = []
+    for email_data in emails:
+        try:
+            if "clean_body" not in email_data:
+                email_data["clean_body"], email_data["signature"] = split_body(email_data["body"])
+        except Exception as e:
+            _skip_email(email_data.get("message_id"), "cleaning", e, errors)
+            continue
+        prepared.append(email_data)
+    emails = prepared
+    
+    try:
+        results = _analyze_cached(emails)
+    except Exception as e:
+        # Find the email that broke the batch: analyze them one at a time
+        logger.warning(f"Batch analysis of {len(emails)} emails failed, analyzing one by one: {e}")
+        results = []
+        for email_data in emails:
+            try:
+                results.append(_analyze_cached([email_data])[0])
+            except Exception as e:
+                _skip_email(email_data.get("message_id"), "analysis", e, errors)
+                results.append(None)
+    
+    db_emails = []
+    for email_data, result in zip(emails, results):
+        if result is None:
+            continue
+        try:
+            db_emails.append(schemas.EmailCreate(
+                message_id=email_data["message_id"],
+                sender=email_data["sender"],
+                recipient=email_data["recipient"],
+                subject=email_data["subject"],
+                body=email_data["body"],
+                clean_body=email_data["clean_body"],
+                date=email_data["date"],
+                **result
+            ))
+        except Exception as e:
+            _skip_email(email_data.get("message_id"), "validation", e, errors)
+    return db_emails
+
+def _analyze_cached(emails: List[dict]) -> List[dict]:
+    """
+    _analyze, serving the emails analyzed before from the analysis cache
+    """
+    if not analysis_cache.enabled:
+        return _analyze(emails)
+    version = analysis_version()
+    keys = [
+        analysis_cache.key(version, e["subject"], e["clean_body"] + "\n" + e.get("signature", ""))
+        for e in emails
+    ]
+    cached = analysis_cache.get_many(keys)
+    # Analyze each distinct uncached email once
+    pending = {}
+    for key, email_data in zip(keys, emails):
+        if key not in cached and key not in pending:
+            pending[key] = email_data
+    computed = dict(zip(pending, _analyze(list(pending.values()))))
+    analysis_cache.put_many(computed, version)
+    cached.update(computed)
+    return [cached[key] for key in keys]
+
+def _analyze(emails: List[dict]) -> List[dict]:
+    """
+    Sentiment, urgency, category and entities for each email, as the
+    EmailCreate fields they fill
+    """
+    if not emails:
+        return []
+    # One keyword pass per email serves every keyword heuristic
+    scans = [
+        email_data.get("keyword_scan") or scan_keywords(email_data["clean_body"], email_data["subject"])
+        for email_data in emails
+    ]
+    sentiments = analyze_sentiment_batch([email_data["clean_body"] for email_data in emails], scans=scans)
+    
+    results = []
+    for email_data, scan, (sentiment, sentiment_score) in zip(emails, scans, sentiments):
+        body = email_data["clean_body"]
+        signature = email_data.get("signature")
+        # Contact details usually live in the signature
+        entities = extract_entities(body + "\n" + signature if signature else body, scan)
+        results.append({
+            "sentiment": sentiment,
+            "sentiment_score": sentiment_score,
+            "urgency": detect_urgency(body, scan),
+            "category": categorize_email(email_data["subject"], body, scan),
+            "extracted_info": entities,
+        })
+    return results
+
+def _store_emails(db: Session, emails: List[schemas.EmailCreate],
+                  errors: List[str] = None) -> Tuple[Dict[str, int], int]:
+    """
+    Insert a chunk's emails in bulk; if that fails, one at a time, skipping
+    the ones that still fail. Returns {message_id: id} of the inserted
+    emails and how many were skipped.
+    """
+    try:
+        return crud.create_emails_bulk(db, emails), 0
+    except Exception as e:
+        logger.warning(f"Storing {len(emails)} emails failed, storing one by one: {e}")
+    created = {}
+    failed = 0
+    for email in emails:
+        try:
+            created.update(crud.create_emails_bulk(db, [email]))
+        except Exception as e:
+            db.rollback()
+            _skip_email(email.message_id, "storing", e, errors)
+            failed += 1
+    return created, failed
+
+_STAGE_DONE = object()
+
+def _run_stages(source: Iterable, stages: List[Callable], queue_size: int):
+    """
+    Run ``stages`` in their own threads, each consuming the previous stage's
+    output through a queue of at most ``queue_size`` items. The first error
+    stops every stage and is re-raised here.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stop = threading.Event()
+    errors = []
+    
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _STAGE_DONE
+    
+    def feed():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            close = getattr(source, "close", None)
+            if close:
+                close()
+            put(queues[0], _STAGE_DONE)
+    
+    def work(stage, inbox, outbox):
+        try:
+            while True:
+                item = get(inbox)
+                if item is _STAGE_DONE:
+                    break
+                result = stage(item)
+                if outbox is not None and not put(outbox, result):
+                    break
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if outbox is not None:
+                put(outbox, _STAGE_DONE)
+    
+    threads = [threading.Thread(target=feed, name="ingest-fetch")]
+    for i, stage in enumerate(stages):
+        outbox = queues[i + 1] if i + 1 < len(stages) else None
+        threads.append(threading.Thread(target=work, args=(stage, queues[i], outbox),
+                                        name=f"ingest-{stage.__name__.strip('_')}"))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def ingest_new_mail(mail: imaplib.IMAP4):
+    """
+    Mailbox watcher callback: store new mail and queue drafts for it
+    """
+    db = SessionLocal()
+    try:
+        new_message_ids = sync_mailbox(db, mail=mail)
+    finally:
+        db.close()
+    if new_message_ids:
+        logger.info(f"Ingested {len(new_message_ids)} new emails")
+    schedule_drafts(new_message_ids)
+
+def schedule_drafts(message_ids: List[str]):
+    """
+    Queue AI response drafts for stored emails on the drafting engine, and
+    for earlier emails still without one (their draft failed, or was
+    dropped at shutdown) that are due a retry. Those are looked for at most
+    every DRAFT_RETRY_DELAY seconds. Without OPENAI_API_KEY nothing is
+    queued; the emails stay undrafted until a key is set.
+    """
+    global _next_backlog_check
+    if not settings.OPENAI_API_KEY:
+        if message_ids:
+            logger.warning(f"OPENAI_API_KEY not set, not drafting {len(message_ids)} new emails")
+        return
+    undrafted = []
+    now = time.monotonic()
+    if now >= _next_backlog_check:
+        _next_backlog_check = now + settings.DRAFT_RETRY_DELAY
+        db = SessionLocal()
+        try:
+            undrafted = crud.get_undrafted_message_ids(db, settings.DRAFT_MAX_ATTEMPTS, settings.DRAFT_RETRY_DELAY)
+        finally:
+            db.close()
+    draft_engine.submit(list(dict.fromkeys([*message_ids, *undrafted])))
+
+def shutdown_drafts():
+    """
+    Drop queued drafts on shutdown; emails left without one are queued
+    again by the next schedule_drafts (at startup or after an ingest)
+    """
+    draft_engine.stop()
@@ -0,0 +1,126 @@
+"""
+In-process registry of background ingest jobs
+"""
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Job:
+    """
+    State of one background job, updated live by the worker thread
+    """
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued, running, succeeded, failed
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.counts: Dict[str, int] = {}
+        self.errors: List[str] = []
+        self._started = None
+        self._finished = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict:
+        elapsed = None
+        if self._started is not None:
+            elapsed = (self._finished or time.monotonic()) - self._started
+        stored = self.counts.get("stored", 0)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "counts": dict(self.counts),
+            "throughput": round(stored / elapsed, 2) if elapsed else None,
+            "errors": list(self.errors),
+        }
+
+class JobRegistry:
+    """
+    Runs jobs on daemon threads. At most one job per kind runs at a time:
+    submitting while one is running returns the running job instead.
+    """
+
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, target: Callable[[Job], None]) -> Tuple[Job, bool]:
+        """
+        Start ``target(job)`` in the background. Returns the job and whether
+        it was newly created (False when attaching to a running one).
+        """
+        with self._lock:
+            running = self._running.get(kind)
+            if running is not None and not running.done:
+                return running, False
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._running[kind] = job
+            while len(self._jobs) > self.max_jobs:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.done:
+                    break
+                del self._jobs[oldest_id]
+        threading.Thread(target=self._run, args=(job, target), name=f"job-{kind}", daemon=True).start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, target: Callable[[Job], None]):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job._started = time.monotonic()
+        try:
+            target(job)
+            job.status = "failed" if job.errors else "succeeded"
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {e}")
+            job.errors.append(str(e))
+            job.status = "failed"
+        finally:
+            job._finished = time.monotonic()
+            job.finished_at = datetime.utcnow()
+            with self._lock:
+                if self._running.get(job.kind) is job:
+                    del self._running[job.kind]
+
+jobs = JobRegistry()
+
+def _ingest(job: Job):
+    # Imported here so the registry itself stays free of IMAP/NLP imports
+    from app.database import SessionLocal
+    from app.ingest import sync_mailbox, schedule_drafts
+    
+    db = SessionLocal()
+    try:
+        new_message_ids = sync_mailbox(db, stats=job.counts, errors=job.errors)
+    finally:
+        db.close()
+    schedule_drafts(new_message_ids)
+
+def start_ingest() -> Tuple[Job, bool]:
+    """
+    Start a mailbox ingest in the background, or attach to the one running
+    """
+    return jobs.submit("ingest", _ingest)
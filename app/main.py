@@ -1,20 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 from app import models, schemas, crud
-from app.database import get_db, engine
-from app.services.email_service import fetch_emails, categorize_email
-from app.services.nlp_service import analyze_sentiment, extract_entities, detect_urgency
-from app.services.ai_service import generate_response, search_knowledge_base
+from app.database import get_db, engine, add_missing_columns, SessionLocal
+from app.ingest import ingest_new_mail, schedule_drafts, shutdown_drafts
+from app.drafting import draft_engine
+from app.jobs import jobs, start_ingest
+from app.services.mail_watcher import MailboxWatcher
+from app.services.email_service import shutdown_parse_pool
+from app.services import nlp_service
+from app.services.analysis_cache import analysis_cache
+from app.services.response_cache import response_cache
+from app.services.knowledge_index import knowledge_index
+from app.services.bm25_index import bm25_index
+from app.services.kb_snapshot import kb_snapshot
+from app.services.ai_service import active_knowledge_index
 from app.services.response_service import send_email_response
 from app.config import settings
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_tables()
+    queue_undrafted_emails()
+    warm_up_models()
+    build_knowledge_index()
+    start_mailbox_watcher()
+    try:
+        yield
+    finally:
+        stop_background_workers()
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan)
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+# Long-lived IMAP session feeding new mail into the ingest path
+mailbox_watcher = MailboxWatcher(ingest_new_mail)
+
+# Set once the database schema exists
+schema_ready = threading.Event()
 
 # CORS middleware
 app.add_middleware(
@@ -29,77 +56,92 @@ app.add_middleware(
 def read_root():
     return {"message": "Email Support Automation System"}
 
-@app.post("/fetch-emails/", response_model=schemas.StatusResponse)
-def fetch_and_process_emails(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+@app.get("/ready")
+def read_ready():
+    # Requests are served before the models are warm (they load on first
+    # use), but with warmup enabled load balancers should wait for a 200 here
+    models_state = nlp_service.model_status()
+    models_loaded = all(model["status"] in ("ready", "fallback") for model in models_state.values())
+    ready = schema_ready.is_set() and (models_loaded or not settings.NLP_WARMUP_ON_STARTUP)
+    body = {"status": "ready" if ready else "starting", "database": schema_ready.is_set(), "models": models_state}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+def create_tables():
+    # Create database tables
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(models.Base.metadata)
+    schema_ready.set()
+
+def queue_undrafted_emails():
+    # Emails whose draft failed, or was dropped at the last shutdown
+    schedule_drafts([])
+
+def warm_up_models():
+    if settings.NLP_WARMUP_ON_STARTUP:
+        threading.Thread(target=nlp_service.warmup, name="nlp-warmup", daemon=True).start()
+
+def build_knowledge_index():
+    if settings.KB_SEARCH_BACKEND in ("embedding", "bm25"):
+        threading.Thread(target=_build_knowledge_index, name="kb-index", daemon=True).start()
+
+def _build_knowledge_index():
+    db = SessionLocal()
     try:
-        # Fetch emails from email server
-        raw_emails = fetch_emails()
-        
-        processed_count = 0
-        for email_data in raw_emails:
-            # Check if email already exists
-            existing_email = crud.get_email_by_message_id(db, email_data["message_id"])
-            if existing_email:
-                continue
-                
-            # Process email with NLP
-            sentiment, sentiment_score = analyze_sentiment(email_data["body"])
-            entities = extract_entities(email_data["body"])
-            urgency = detect_urgency(email_data["body"])
-            category = categorize_email(email_data["subject"], email_data["body"])
-            
-            # Create email in database
-            db_email = schemas.EmailCreate(
-                message_id=email_data["message_id"],
-                sender=email_data["sender"],
-                recipient=email_data["recipient"],
-                subject=email_data["subject"],
-                body=email_data["body"],
-                date=email_data["date"],
-                sentiment=sentiment,
-                sentiment_score=sentiment_score,
-                urgency=urgency,
-                category=category,
-                extracted_info=entities
-            )
-            
-            crud.create_email(db, db_email)
-            processed_count += 1
-            
-            # Add background task to generate AI response
-            background_tasks.add_task(generate_ai_response_for_email, db, email_data["message_id"])
-            
-        return {"status": "success", "message": f"Processed {processed_count} new emails", "count": processed_count}
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-def generate_ai_response_for_email(db: Session, message_id: str):
-    """
-    Background task to generate AI response for an email
-    """
-    email = crud.get_email_by_message_id(db, message_id)
-    if not email:
-        return
-    
-    # Get knowledge base items for context
-    knowledge_items = crud.get_knowledge_base_items(db, category=email.category)
-    
-    # Search for relevant knowledge
-    query = f"{email.subject} {email.body[:100]}"
-    knowledge_context = search_knowledge_base(query, knowledge_items)
-    
-    # Generate AI response
-    ai_response = generate_response(
-        email.subject, 
-        email.body, 
-        email.sentiment, 
-        email.extracted_info,
-        knowledge_context
-    )
-    
-    # Update email with AI response
-    crud.update_email(db, email.id, schemas.EmailUpdate(ai_response=ai_response, is_processed=True))
+        if settings.KB_SEARCH_BACKEND == "embedding":
+            knowledge_index.build(crud.iter_knowledge_base_items(db))
+            return
+        # Resume from the saved BM25 index, applying the articles written
+        # since it was saved; rebuild if it still does not match the table
+        if bm25_index.load(settings.KB_BM25_INDEX_PATH):
+            bm25_index.build(crud.iter_knowledge_base_items(db, updated_since=bm25_index.watermark), incremental=True)
+            if len(bm25_index) != crud.count_knowledge_base_items(db):
+                bm25_index.build(crud.iter_knowledge_base_items(db))
+        else:
+            bm25_index.build(crud.iter_knowledge_base_items(db))
+        bm25_index.save(settings.KB_BM25_INDEX_PATH)
+    finally:
+        db.close()
+
+def start_mailbox_watcher():
+    if settings.EMAIL_WATCH_ENABLED:
+        mailbox_watcher.start()
+
+def stop_background_workers():
+    mailbox_watcher.stop()
+    shutdown_drafts()
+    shutdown_parse_pool()
+    nlp_service.shutdown()
+    bm25_index.save(settings.KB_BM25_INDEX_PATH)
+
+@app.post("/fetch-emails/", response_model=schemas.StatusResponse, status_code=202)
+def fetch_and_process_emails():
+    # Ingest runs in the background; a second call while it runs attaches to it
+    job, created = start_ingest()
+    message = "Ingest job started" if created else "Ingest job already running"
+    return {"status": job.status, "message": message, "count": job.counts.get("stored", 0), "job_id": job.id}
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+def read_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/analysis-cache/", response_model=schemas.AnalysisCacheStats)
+def read_analysis_cache_stats():
+    return analysis_cache.stats()
+
+@app.get("/response-cache/", response_model=schemas.ResponseCacheStats)
+def read_response_cache_stats():
+    return response_cache.stats()
+
+@app.get("/inference/", response_model=Dict[str, schemas.BatcherStats])
+def read_inference_stats():
+    return nlp_service.inference_stats()
+
+@app.get("/drafts/", response_model=schemas.DraftEngineStats)
+def read_draft_engine_stats():
+    return draft_engine.stats()
 
 @app.get("/emails/", response_model=List[schemas.Email])
 def read_emails(skip: int = 0, limit: int = 100, 
@@ -157,6 +199,30 @@ def create_knowledge_item(kb_item: schemas.KnowledgeBaseCreate, db: Session = De
 def read_knowledge_items(skip: int = 0, limit: int = 100, category: str = None, db: Session = Depends(get_db)):
     return crud.get_knowledge_base_items(db, skip=skip, limit=limit, category=category)
 
+@app.put("/knowledge-base/{item_id}", response_model=schemas.KnowledgeBase)
+def update_knowledge_item(item_id: int, kb_update: schemas.KnowledgeBaseUpdate, db: Session = Depends(get_db)):
+    db_kb = crud.update_knowledge_base_item(db, item_id, kb_update)
+    if db_kb is None:
+        raise HTTPException(status_code=404, detail="Knowledge base item not found")
+    return db_kb
+
+@app.get("/knowledge-base/search/", response_model=List[schemas.KnowledgeSearchHit])
+def search_knowledge_items(q: str, category: str = None, k: int = Query(3, ge=1, le=50)):
+    index = active_knowledge_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Knowledge base index is not ready")
+    return [{"id": item_id, "score": score, "snippet": index.snippet_for(item_id)}
+            for item_id, score in index.query(q, k, category=category)]
+
+@app.get("/knowledge-base/index/", response_model=schemas.KnowledgeIndexStats)
+def read_knowledge_index_stats():
+    index = bm25_index if settings.KB_SEARCH_BACKEND == "bm25" else knowledge_index
+    return {"backend": settings.KB_SEARCH_BACKEND, **index.stats()}
+
+@app.get("/knowledge-base/snapshot/", response_model=schemas.KnowledgeSnapshotStats)
+def read_knowledge_snapshot_stats():
+    return kb_snapshot.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, JSON, Text, Float
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -13,6 +13,7 @@ class Email(Base):
     recipient = Column(String)
     subject = Column(String)
     body = Column(Text)
+    clean_body = Column(Text)  # Body without quoted thread, footers and signature
     date = Column(DateTime)
     sentiment = Column(String)  # positive, neutral, negative
     sentiment_score = Column(Float)  # Confidence score
@@ -21,6 +22,8 @@ class Email(Base):
     extracted_info = Column(JSON)  # JSON with extracted entities
     is_processed = Column(Boolean, default=False)
     ai_response = Column(Text)
+    draft_attempts = Column(Integer, default=0)  # failed AI drafting attempts
+    draft_failed_at = Column(DateTime)  # when the last one failed
     is_response_sent = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -35,3 +38,20 @@ class KnowledgeBase(Base):
     tags = Column(JSON)  # List of tags
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MailboxSyncState(Base):
+    __tablename__ = "mailbox_sync_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mailbox = Column(String, unique=True, index=True)
+    uidvalidity = Column(BigInteger)
+    last_uid = Column(BigInteger, default=0)  # Highest UID already fetched
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of version + normalized subject and body
+    version = Column(String, index=True)  # nlp_service.analysis_version() that produced it
+    result = Column(JSON)  # sentiment, sentiment_score, urgency, category, extracted_info
+    created_at = Column(DateTime, default=datetime.utcnow)
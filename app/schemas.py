@@ -11,6 +11,7 @@ class EmailBase(BaseModel):
     date: datetime
 
 class EmailCreate(EmailBase):
+    clean_body: Optional[str] = None
     sentiment: Optional[str] = None
     sentiment_score: Optional[float] = None
     urgency: Optional[int] = None
@@ -19,6 +20,7 @@ class EmailCreate(EmailBase):
 
 class Email(EmailBase):
     id: int
+    clean_body: Optional[str] = None
     sentiment: Optional[str]
     sentiment_score: Optional[float]
     urgency: Optional[int]
@@ -35,12 +37,78 @@ class Email(EmailBase):
 
 class EmailUpdate(BaseModel):
     ai_response: Optional[str]
+    is_processed: Optional[bool]
     is_response_sent: Optional[bool]
 
 class StatusResponse(BaseModel):
     status: str
     message: str
     count: Optional[int] = 0
+    job_id: Optional[str] = None
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    counts: Dict[str, int] = {}
+    throughput: Optional[float] = None  # stored emails per second
+    errors: List[str] = []
+
+class AnalysisCacheStats(BaseModel):
+    memory_hits: int
+    db_hits: int
+    batch_hits: int  # repeats of an email analyzed in the same batch
+    misses: int
+    lookups: int
+    hit_rate: Optional[float] = None
+    memory_entries: int
+    memory_capacity: int
+    db_enabled: bool
+    db_pruned_rows: int  # stale rows deleted from the table
+
+class DraftEngineStats(BaseModel):
+    concurrency: int
+    running: bool
+    submitted: int
+    drafted: int
+    failed: int  # still failing after OPENAI_MAX_RETRIES retries
+    retries: int
+    in_flight: int
+    queued: int
+
+class ResponseCacheStats(BaseModel):
+    hits: int
+    similar_hits: int  # near-duplicates within max_distance
+    shared_hits: int  # identical emails that waited for a draft in progress
+    misses: int
+    lookups: int
+    hit_rate: Optional[float] = None
+    stores: int
+    evictions: int
+    expirations: int
+    entries: int
+    capacity: int
+    ttl_seconds: float
+    max_distance: int
+    saved_tokens: int  # LLM tokens the reused drafts originally cost
+    saved_seconds: float  # and the LLM time they took
+
+class BatcherStats(BaseModel):
+    requests: int
+    batches: int
+    errors: int
+    running: bool
+    queue_depth: int
+    max_batch_size: int
+    max_wait_ms: float
+    mean_batch_size: Optional[float] = None
+    busy_seconds: float
+    batch_size_histogram: Dict[str, int] = {}
+    queue_depth_histogram: Dict[str, int] = {}  # items waiting when each batch was dispatched
 
 class KnowledgeBaseCreate(BaseModel):
     title: str
@@ -48,6 +116,12 @@ class KnowledgeBaseCreate(BaseModel):
     category: str
     tags: Optional[List[str]] = []
 
+class KnowledgeBaseUpdate(BaseModel):
+    title: Optional[str]
+    content: Optional[str]
+    category: Optional[str]
+    tags: Optional[List[str]]
+
 class KnowledgeBase(KnowledgeBaseCreate):
     id: int
     created_at: datetime
@@ -56,6 +130,36 @@ class KnowledgeBase(KnowledgeBaseCreate):
     class Config:
         orm_mode = True
 
+class KnowledgeIndexStats(BaseModel):
+    backend: str  # KB_SEARCH_BACKEND
+    status: str  # not_loaded, building, ready, unavailable
+    build_seconds: Optional[float] = None
+    error: Optional[str] = None
+    items: int
+    # embedding
+    model: Optional[str] = None
+    rows: Optional[int] = None
+    dim: Optional[int] = None
+    clusters: Optional[int] = None  # 0 while every search scores all articles
+    unclustered_rows: Optional[int] = None
+    # bm25
+    loaded_from: Optional[str] = None  # saved index it started from, if any
+    terms: Optional[int] = None
+    postings: Optional[int] = None
+
+class KnowledgeSnapshotStats(BaseModel):
+    categories: int
+    items: int
+    hits: int
+    loads: int  # knowledge base queries made to fill the snapshot
+    invalidations: int
+    ttl_seconds: float
+
+class KnowledgeSearchHit(BaseModel):
+    id: int
+    score: float
+    snippet: str
+
 class AnalyticsResponse(BaseModel):
     total_emails: int
     processed_emails: int
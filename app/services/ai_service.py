@@ -1,31 +1,55 @@
-from openai import OpenAI
-from typing import List, Dict, Any
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, List, Dict, Any
 import logging
 from app.config import settings
+from app.services.bm25_index import bm25_index
+from app.services.kb_snapshot import KnowledgeItem, prepare
+from app.services.knowledge_index import knowledge_index
+from app.services.response_cache import response_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
+# OpenAI client, created on first use (importing openai takes about a second)
 client = None
-if settings.OPENAI_API_KEY:
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+_client_lock = threading.Lock()
 
-def generate_response(email_subject: str, email_body: str, sentiment: str, 
-                     extracted_info: Dict[str, Any], knowledge_context: List[str] = None) -> str:
+def get_client():
+    global client
+    if client is None and settings.OPENAI_API_KEY:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
+    return client
+
+# Retry backoff for the drafting engine: up to BASE * 2**attempt seconds,
+# with full jitter, never more than MAX
+_RETRY_BASE_DELAY = 0.5
+_RETRY_MAX_DELAY = 20.0
+
+def create_async_client():
     """
-    Generate AI response for an email
+    Async OpenAI client for the drafting engine, with OPENAI_TIMEOUT per
+    request; it does not retry by itself, generate_response_async does
     """
-    if not settings.OPENAI_API_KEY or not client:
-        return "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
+    if not settings.OPENAI_API_KEY:
+        return None
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None,
+                       timeout=settings.OPENAI_TIMEOUT, max_retries=0)
+
+def _draft_messages(email_subject: str, email_body: str, sentiment: str,
+                    extracted_info: Dict[str, Any], knowledge_context: List[str] = None) -> List[Dict[str, str]]:
+    # Prepare context from knowledge base
+    context = ""
+    if knowledge_context:
+        context = "Relevant information:\n" + "\n".join([f"- {item}" for item in knowledge_context])
     
-    try:
-        # Prepare context from knowledge base
-        context = ""
-        if knowledge_context:
-            context = "Relevant information:\n" + "\n".join([f"- {item}" for item in knowledge_context])
-        
-        prompt = f"""
+    prompt = f"""
         You are a customer support agent. Draft a professional and empathetic response to the following email.
         Consider the customer's sentiment: {sentiment}
         
@@ -41,38 +65,156 @@ def generate_response(email_subject: str, email_body: str, sentiment: str,
         If you need more information from the customer, politely ask for it.
         Keep the response concise but thorough.
         """
-        
+    
+    return [
+        {"role": "system", "content": "You are a helpful customer support agent."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_response(email_subject: str, email_body: str, sentiment: str, 
+                     extracted_info: Dict[str, Any], knowledge_context: List[str] = None,
+                     category: str = None) -> str:
+    """
+    Generate AI response for an email, or reuse the one made for an
+    identical (or near-identical) email, see response_cache
+    """
+    client = get_client()
+    if not settings.OPENAI_API_KEY or not client:
+        return "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
+    
+    key = response_cache.key(email_subject, email_body, category, sentiment, extracted_info, knowledge_context)
+    cached = response_cache.get(key)
+    pending = response_cache.claim(key) if cached is None else None
+    if pending is not None:
+        # An identical email is being drafted right now; wait for its draft
+        cached = pending.result()
+    if cached is not None:
+        return cached
+    
+    draft, tokens, start = None, 0, time.perf_counter()
+    try:
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful customer support agent."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=_draft_messages(email_subject, email_body, sentiment, extracted_info, knowledge_context),
             max_tokens=500,
             temperature=0.7
         )
         
-        return response.choices[0].message.content.strip()
+        draft, tokens = response.choices[0].message.content.strip(), _total_tokens(response)
+        return draft
     
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         return f"Error generating response: {str(e)}"
+    
+    finally:
+        if pending is None:
+            response_cache.release(key, draft, tokens, time.perf_counter() - start)
 
-def search_knowledge_base(query: str, knowledge_items: List[Any]) -> List[str]:
+async def generate_response_async(client, email_subject: str, email_body: str, sentiment: str,
+                                  extracted_info: Dict[str, Any], knowledge_context: List[str] = None,
+                                  category: str = None, on_retry: Callable[[Exception], None] = None) -> str:
     """
-    Simple search through knowledge base items
+    generate_response on an async client (see create_async_client).
+    Rate limits (429), server errors (5xx), timeouts and connection errors
+    are retried up to OPENAI_MAX_RETRIES times after a jittered exponential
+    backoff, or the server's Retry-After; the last error is raised.
+    Without an API key RuntimeError is raised, so no placeholder is ever
+    saved as a draft.
     """
+    if not settings.OPENAI_API_KEY or client is None:
+        raise RuntimeError("OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.")
+    
+    key = response_cache.key(email_subject, email_body, category, sentiment, extracted_info, knowledge_context)
+    cached = response_cache.get(key)
+    pending = response_cache.claim(key) if cached is None else None
+    if pending is not None:
+        # An identical email is being drafted right now; wait for its draft
+        # (shielded, so a cancelled waiter does not cancel it for the others)
+        cached = await asyncio.shield(asyncio.wrap_future(pending))
+    if cached is not None:
+        return cached
+    
+    messages = _draft_messages(email_subject, email_body, sentiment, extracted_info, knowledge_context)
+    draft, tokens, start = None, 0, time.perf_counter()
+    attempt = 0
+    try:
+        while True:
+            try:
+                response = await client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7
+                )
+                draft, tokens = response.choices[0].message.content.strip(), _total_tokens(response)
+                return draft
+            except Exception as e:
+                if attempt >= settings.OPENAI_MAX_RETRIES or not _retryable(e):
+                    raise
+                delay = _retry_delay(e, attempt)
+                attempt += 1
+                logger.warning(f"AI response attempt {attempt} failed ({e}), retrying in {delay:.2f}s")
+                if on_retry is not None:
+                    on_retry(e)
+                await asyncio.sleep(delay)
+    finally:
+        if pending is None:
+            response_cache.release(key, draft, tokens, time.perf_counter() - start)
+
+def _total_tokens(response) -> int:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) or 0
+
+def _retryable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError)):  # includes APITimeoutError
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    delay = random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2 ** attempt))
+    response = getattr(error, "response", None)
+    try:
+        retry_after = float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return delay
+    return max(delay, min(_RETRY_MAX_DELAY, retry_after))
+
+def active_knowledge_index():
+    """
+    The knowledge base index KB_SEARCH_BACKEND selects, or None while it is
+    not ready (or the backend is "keyword")
+    """
+    index = {"embedding": knowledge_index, "bm25": bm25_index}.get(settings.KB_SEARCH_BACKEND)
+    return index if index is not None and index.ready() else None
+
+def search_knowledge_base(query: str, knowledge_items: List[Any] = None, category: str = None,
+                          top_k: int = 3) -> List[str]:
+    """
+    Knowledge base snippets relevant to the query, ranked by the
+    configured index once it is ready, else by keyword matching over
+    knowledge_items
+    """
+    index = active_knowledge_index()
+    if index is not None:
+        return index.search(query, top_k, category=category)
+    
     if not knowledge_items:
         return []
     
-    # Simple keyword matching for now
-    # In a production system, you'd use embeddings and vector search
-    query_lower = query.lower()
+    # Simple keyword matching, while the index is not available. Items
+    # from the knowledge base snapshot come with their text lowercased.
+    keywords = set(query.lower().split())
     relevant_items = []
     
     for item in knowledge_items:
-        content = f"{item.title} {item.content}".lower()
-        if any(keyword in content for keyword in query_lower.split()):
-            relevant_items.append(f"{item.title}: {item.content[:200]}...")
+        if not isinstance(item, KnowledgeItem):
+            item = prepare(item)
+        # A whole-word hit is a set lookup; otherwise look for substrings
+        if not keywords.isdisjoint(item.tokens) or any(keyword in item.text for keyword in keywords):
+            relevant_items.append(item.snippet)
+            if len(relevant_items) == top_k:
+                break
     
-    return relevant_items[:3]  # Return top 3 most relevant items
+    return relevant_items
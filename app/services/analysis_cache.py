@@ -0,0 +1,159 @@
+"""
+Cache of per-email NLP analysis results keyed by a hash of the normalized
+subject and body, so floods of identical mail (auto-replies, form
+submissions, outage reports) are analyzed once
+"""
+import hashlib
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+# Seconds between deletions of expired rows from the table
+_PRUNE_INTERVAL = 3600
+
+def normalize(text: str) -> str:
+    """
+    Collapse whitespace runs and strip, so bodies that differ only in line
+    wrapping or trailing blanks share a cache entry
+    """
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+class AnalysisCache:
+    """
+    Two-tier cache of analysis results: a bounded in-memory LRU in front of
+    an optional database table shared by all workers and restarts.
+
+    Keys include ``version`` (nlp_service.analysis_version()), so results
+    from another sentiment model, inference mode or heuristics revision are
+    never returned. Results are plain dicts, safe to store as JSON.
+
+    The first write with a version deletes the table's rows of every other
+    version, which can never be read again; rows older than
+    ANALYSIS_CACHE_DB_MAX_AGE_DAYS are deleted then and at most hourly
+    after that.
+    """
+
+    def __init__(self, max_entries: int = None, use_db: bool = None):
+        self.max_entries = settings.ANALYSIS_CACHE_SIZE if max_entries is None else max_entries
+        self.use_db = settings.ANALYSIS_CACHE_DB if use_db is None else use_db
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "db_hits": 0, "batch_hits": 0, "misses": 0}
+        self._pruned_version = None
+        self._next_prune = 0.0
+        self._pruned_rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.use_db
+
+    @staticmethod
+    def key(version: str, subject: str, body: str) -> str:
+        content = "\0".join((version, normalize(subject), normalize(body)))
+        return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        """
+        Return {key: result} for the cached keys. A key repeated in ``keys``
+        counts as one lookup plus batch hits, since the caller computes it
+        once for all of them.
+        """
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for key in unique:
+                result = self._entries.get(key)
+                if result is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = result
+        memory_hits = len(found)
+
+        missing = [key for key in unique if key not in found]
+        if missing and self.use_db:
+            db = SessionLocal()
+            try:
+                stored = crud.get_analysis_cache_entries(db, missing)
+            except Exception as e:
+                logger.error(f"Error reading analysis cache: {e}")
+                stored = {}
+            finally:
+                db.close()
+            found.update(stored)
+            self._remember(stored)
+
+        with self._lock:
+            self._counts["memory_hits"] += memory_hits
+            self._counts["db_hits"] += len(found) - memory_hits
+            self._counts["misses"] += len(unique) - len(found)
+            self._counts["batch_hits"] += len(keys) - len(unique)
+        return found
+
+    def put_many(self, results: Dict[str, dict], version: str):
+        if not results:
+            return
+        self._remember(results)
+        if self.use_db:
+            db = SessionLocal()
+            try:
+                self._prune(db, version)
+                crud.save_analysis_cache_entries(db, results, version)
+            except Exception as e:
+                logger.error(f"Error writing analysis cache: {e}")
+            finally:
+                db.close()
+
+    def _prune(self, db, version: str):
+        with self._lock:
+            if version == self._pruned_version and time.monotonic() < self._next_prune:
+                return
+            self._pruned_version = version
+            self._next_prune = time.monotonic() + _PRUNE_INTERVAL
+        deleted = crud.delete_stale_analysis_cache_entries(db, version, settings.ANALYSIS_CACHE_DB_MAX_AGE_DAYS)
+        if deleted:
+            logger.info(f"Deleted {deleted} stale analysis cache rows")
+        with self._lock:
+            self._pruned_rows += deleted
+
+    def _remember(self, results: Dict[str, dict]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, result in results.items():
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+            pruned_rows = self._pruned_rows
+        lookups = sum(counts.values())
+        hits = lookups - counts["misses"]
+        return {
+            **counts,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "memory_entries": entries,
+            "memory_capacity": self.max_entries,
+            "db_enabled": self.use_db,
+            "db_pruned_rows": pruned_rows,
+        }
+
+# Shared by every ingest path in this process
+analysis_cache = AnalysisCache()
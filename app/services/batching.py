@@ -0,0 +1,159 @@
+import queue
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+def _bucket(n: int) -> str:
+    # Power-of-two histogram bins: 0, 1, 2, 3-4, 5-8, 9-16, ...
+    if n <= 2:
+        return str(n)
+    upper = 1 << (n - 1).bit_length()
+    return f"{upper // 2 + 1}-{upper}"
+
+def _histogram(counts: Counter) -> Dict[str, int]:
+    buckets = Counter()
+    for n, count in counts.items():
+        buckets[_bucket(n)] += count
+    return {label: buckets[label] for label in sorted(buckets, key=lambda label: int(label.split("-")[0]))}
+
+class MicroBatcher:
+    """
+    In-process inference server: callers from any thread submit single
+    items and get futures back, and one worker thread coalesces queued items
+    into batches for ``predict(items) -> results``.
+
+    A batch is dispatched once it holds ``max_batch_size`` items or
+    ``max_wait_ms`` after its first item arrived, whichever comes first, so
+    batch size follows the load: a lone caller waits at most max_wait_ms,
+    many concurrent callers share full batches. If a batch fails its items
+    are retried one by one, so one bad input only fails its own future.
+    """
+
+    def __init__(self, predict: Callable[[List[Any]], List[Any]], max_batch_size: int,
+                 max_wait_ms: float, name: str = "micro-batcher"):
+        self.predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._counts = {"requests": 0, "batches": 0, "errors": 0}
+        self._busy_seconds = 0.0
+
+    def submit(self, item) -> Future:
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: List[Any]) -> List[Future]:
+        """
+        Queue ``items`` in order; consecutive items tend to share a batch
+        """
+        self._ensure_started()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return futures
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Finish the queued work and stop the worker
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Past the deadline, still take what is already queued
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._queue_depths[self._queue.qsize()] += 1
+                self._counts["requests"] += len(batch)
+                self._counts["batches"] += 1
+            start = time.perf_counter()
+            self._dispatch(batch)
+            with self._lock:
+                self._busy_seconds += time.perf_counter() - start
+
+    def _dispatch(self, batch):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.predict([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+                return
+            logger.error(f"{self.name}: batch of {len(batch)} failed, retrying per item: {e}")
+            for item, future in batch:
+                try:
+                    future.set_result(self.predict([item])[0])
+                except Exception as item_error:
+                    self._fail(future, item_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _fail(self, future: Future, error: Exception):
+        with self._lock:
+            self._counts["errors"] += 1
+        future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            batch_sizes = Counter(self._batch_sizes)
+            queue_depths = Counter(self._queue_depths)
+            busy_seconds = self._busy_seconds
+        return {
+            **counts,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_batch_size": round(counts["requests"] / counts["batches"], 2) if counts["batches"] else None,
+            "busy_seconds": round(busy_seconds, 3),
+            "batch_size_histogram": _histogram(batch_sizes),
+            # Items still waiting each time a batch was dispatched
+            "queue_depth_histogram": _histogram(queue_depths),
+        }
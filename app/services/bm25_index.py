@@ -0,0 +1,275 @@
+"""
+BM25 keyword search over the knowledge base, for deployments without an
+embedding model
+"""
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+import logging
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+from app.services.knowledge_index import snippet
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization or the saved layout changes; older saved indexes
+# are then rebuilt
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r'\w+')
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in is it my no not of on or our so that the "
+    "their this to was we what when where which will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+class BM25Index:
+    """
+    Inverted index over knowledge base title, tags and content, ranked by
+    Okapi BM25 (title and tag terms count twice).
+
+    Each term maps to a posting list of (article row, term frequency) in two
+    flat arrays, so a query only touches the posting lists of its terms and
+    is scored with a few numpy operations per term. An article written
+    again replaces its postings. The index is saved to a file and reloaded
+    at startup, applying only the articles written since it was saved.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._state = {"status": "not_loaded", "build_seconds": None, "loaded_from": None, "error": None}
+        self._dirty = False
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._row_of: Dict[int, int] = {}
+        self._item_ids = array("q")
+        self._doc_len = array("I")
+        self._categories = array("i")
+        self._category_codes: Dict[str, int] = {}
+        self._terms: List[Tuple[str, ...]] = []  # distinct terms per row, to drop its postings on update
+        self._snippets: List[str] = []
+        self._total_len = 0
+        self.watermark = None  # latest updated_at indexed
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def ready(self) -> bool:
+        return self._state["status"] == "ready"
+
+    def build(self, items: Iterable[Any], incremental: bool = False):
+        """
+        Index ``items``: all articles, or with ``incremental`` those written
+        since the index was loaded. Articles written meanwhile are added as
+        usual; search serves from the index once every article is in.
+        """
+        start = time.perf_counter()
+        if not incremental:
+            with self._lock:
+                self._reset()
+        self._state.update(status="building", error=None)
+        try:
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) >= 1000:
+                    self._add(batch)
+                    batch = []
+            self._add(batch)
+        except Exception as e:
+            logger.warning(f"Could not build the BM25 knowledge base index, using keyword search: {e}")
+            self._state.update(status="unavailable", error=str(e))
+            return
+        self._state.update(status="ready", build_seconds=round(time.perf_counter() - start, 3))
+        logger.info(f"BM25 knowledge base index ready: {len(self)} articles")
+
+    def add(self, items: List[Any]):
+        """
+        Index new or changed articles. A no-op until the index is built or
+        loaded; failures are logged, never raised to the writer.
+        """
+        if self._state["status"] not in ("building", "ready"):
+            return
+        try:
+            self._add(items)
+        except Exception as e:
+            logger.error(f"Error indexing knowledge base articles: {e}")
+
+    def query(self, query: str, k: int = 3, category: str = None) -> List[Tuple[int, float]]:
+        """
+        The ``k`` best (article id, BM25 score) pairs for ``query``, best
+        first, optionally only within ``category``
+        """
+        import numpy as np
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._row_of or (category is not None and category not in self._category_codes):
+                return []
+            n = len(self._row_of)
+            avg_len = self._total_len / n
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+            rows, scores = [], []
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                term_rows = np.frombuffer(postings[0], dtype=np.uint32)
+                tf = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                idf = math.log(1 + (n - len(term_rows) + 0.5) / (len(term_rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_len[term_rows] / avg_len)
+                rows.append(term_rows.copy())
+                scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            if not rows:
+                return []
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            if len(terms) > 1:
+                # Sum per article in one pass over the postings (the dense
+                # totals array is a memset, cheap next to scoring them)
+                totals = np.bincount(rows, weights=scores)
+                rows = np.flatnonzero(totals)
+                scores = totals[rows]
+            if category is not None:
+                keep = np.frombuffer(self._categories, dtype=np.int32)[rows] == self._category_codes[category]
+                rows, scores = rows[keep], scores[keep]
+            if len(rows) > k:
+                top = np.argpartition(scores, -k)[-k:]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(self._item_ids[rows[i]], float(scores[i])) for i in order]
+
+    def search(self, query: str, k: int = 3, category: str = None) -> List[str]:
+        """
+        Snippets of the ``k`` best matching articles
+        """
+        return [self.snippet_for(item_id) for item_id, _ in self.query(query, k, category)]
+
+    def snippet_for(self, item_id: int) -> str:
+        return self._snippets[self._row_of[item_id]]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._state)
+        stats.update(items=len(self), terms=len(self._postings),
+                     postings=sum(len(postings[0]) for postings in list(self._postings.values())))
+        return stats
+
+    def save(self, path: str):
+        """
+        Write the index to ``path`` (atomically), if it changed since it was
+        built, loaded or last saved
+        """
+        if not path or not self._dirty or not self.ready():
+            return
+        with self._lock:
+            data = {
+                "version": INDEX_VERSION, "k1": self.k1, "b": self.b, "postings": self._postings,
+                "row_of": self._row_of, "item_ids": self._item_ids, "doc_len": self._doc_len,
+                "categories": self._categories, "category_codes": self._category_codes, "terms": self._terms,
+                "snippets": self._snippets, "total_len": self._total_len, "watermark": self.watermark,
+            }
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._dirty = False
+        logger.info(f"Saved BM25 knowledge base index to {path}")
+
+    def load(self, path: str) -> bool:
+        """
+        Load an index saved by save(). Returns False (nothing loaded) if
+        there is none or it was saved by an incompatible version.
+        """
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load the BM25 index from {path}, rebuilding it: {e}")
+            return False
+        if data.get("version") != INDEX_VERSION or (data["k1"], data["b"]) != (self.k1, self.b):
+            return False
+        with self._lock:
+            self._postings = data["postings"]
+            self._row_of = data["row_of"]
+            self._item_ids = data["item_ids"]
+            self._doc_len = data["doc_len"]
+            self._categories = data["categories"]
+            self._category_codes = data["category_codes"]
+            self._terms = data["terms"]
+            self._snippets = data["snippets"]
+            self._total_len = data["total_len"]
+            self.watermark = data["watermark"]
+            self._dirty = False
+        self._state.update(status="building", loaded_from=path)
+        return True
+
+    def _add(self, items: List[Any]):
+        if not items:
+            return
+        documents = []
+        for item in items:
+            counts: Dict[str, int] = {}
+            for weight, text in ((2, item.title), (2, " ".join(item.tags or [])), (1, item.content)):
+                for token in tokenize(text or ""):
+                    counts[token] = counts.get(token, 0) + weight
+            documents.append((item, counts))
+        with self._lock:
+            for item, counts in documents:
+                self._index(item, counts)
+            self._dirty = True
+
+    def _index(self, item: Any, counts: Dict[str, int]):
+        row = self._row_of.get(item.id)
+        if row is None:
+            row = len(self._item_ids)
+            self._row_of[item.id] = row
+            self._item_ids.append(item.id)
+            self._doc_len.append(0)
+            self._categories.append(0)
+            self._terms.append(())
+            self._snippets.append("")
+        else:
+            self._remove_postings(row)
+
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[sys.intern(term)] = (array("I"), array("I"))
+            postings[0].append(row)
+            postings[1].append(tf)
+        length = sum(counts.values())
+        self._total_len += length - self._doc_len[row]
+        self._doc_len[row] = length
+        self._categories[row] = self._category_codes.setdefault(item.category, len(self._category_codes))
+        self._terms[row] = tuple(sys.intern(term) for term in counts)
+        self._snippets[row] = snippet(item)
+        updated_at = getattr(item, "updated_at", None)
+        if isinstance(updated_at, datetime) and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def _remove_postings(self, row: int):
+        import numpy as np
+        for term in self._terms[row]:
+            rows, tfs = self._postings[term]
+            keep = np.frombuffer(rows, dtype=np.uint32) != row
+            if not keep.any():
+                del self._postings[term]
+                continue
+            kept_rows, kept_tfs = array("I"), array("I")
+            kept_rows.frombytes(np.frombuffer(rows, dtype=np.uint32)[keep].tobytes())
+            kept_tfs.frombytes(np.frombuffer(tfs, dtype=np.uint32)[keep].tobytes())
+            self._postings[term] = (kept_rows, kept_tfs)
+
+bm25_index = BM25Index()
@@ -1,147 +1,699 @@
 import imaplib
 import email
-from email.header import decode_header
+import binascii
+import codecs
+import quopri
+import multiprocessing
+import threading
+from email.header import decode_header, make_header
 import re
+import select
+import ssl
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple
 import logging
 from app.config import settings
+from app.services.keywords import CATEGORY_KEYWORDS, SUPPORT_KEYWORDS, KeywordScan, scan_keywords
+from app.services.text_cleaning import split_body
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def fetch_emails() -> List[Dict]:
+def fetch_emails(checkpoint: Optional[Dict] = None, mailbox: str = None,
+                 chunk_size: int = None, mail: imaplib.IMAP4 = None,
+                 stats: Dict = None) -> Tuple[List[Dict], Dict]:
     """
-    Fetch unread emails from IMAP server
+    Fetch new emails from IMAP server
+
+    Collects everything yielded by iter_email_chunks into one list. Use
+    iter_email_chunks directly to process large backlogs incrementally.
+
+    Returns the support emails found and the checkpoint to persist for the
+    next run. The checkpoint only advances past chunks that were fetched.
     """
     emails = []
+    checkpoint = dict(checkpoint or {"uidvalidity": None, "last_uid": 0})
+    for raw_messages, checkpoint in iter_email_chunks(checkpoint, mailbox, chunk_size, mail, stats):
+        emails.extend(filter_support_emails(parse_emails(raw_messages)))
+    return emails, checkpoint
+
+def iter_email_chunks(checkpoint: Optional[Dict] = None, mailbox: str = None,
+                      chunk_size: int = None, mail: imaplib.IMAP4 = None,
+                      stats: Dict = None, errors: List[str] = None) -> Iterator[Tuple[List[Tuple[int, bytes]], Dict]]:
+    """
+    Stream new messages from IMAP server one UID FETCH chunk at a time
+
+    ``checkpoint`` is the ``{"uidvalidity", "last_uid"}`` dict returned by the
+    previous run. When it is still valid only ``UID last_uid+1:*`` is searched,
+    otherwise the mailbox is resynced from EMAIL_INITIAL_SYNC_DAYS back.
+    Messages are downloaded with one UID FETCH per chunk of ``chunk_size``
+    UIDs instead of one round trip per message.
+
+    With EMAIL_HEADER_FIRST each chunk is fetched in two phases: headers,
+    BODYSTRUCTURE and a short text preview first, so non-support mail is
+    dropped before its body is downloaded, then only the text/plain part of
+    the remaining messages. Attachments are never downloaded and messages
+    are not marked as read. ``stats`` (if given) is updated with message and
+    byte counts, including ``bytes_saved`` versus full RFC822 downloads.
+
+    Yields ``(raw_messages, checkpoint)`` per chunk, where raw_messages is a
+    list of ``(uid, rfc822_bytes)`` and checkpoint covers everything up to
+    and including the chunk. An empty chunk is yielded when there is nothing
+    new, so a successful sync always reports its checkpoint.
+
+    Pass an authenticated ``mail`` connection to reuse a long-lived session;
+    it is left open and connection errors are raised so the owner can
+    reconnect. Otherwise a connection is opened for the duration of the
+    iteration and errors end it early; they are logged and appended to
+    ``errors`` if given.
+    """
+    mailbox = mailbox or settings.EMAIL_MAILBOX
+    chunk_size = chunk_size or settings.EMAIL_FETCH_CHUNK_SIZE
+    checkpoint = dict(checkpoint or {"uidvalidity": None, "last_uid": 0})
+    own_session = mail is None
+    stats = stats if stats is not None else {}
+    for key in ("messages", "skipped_before_body", "bytes_total", "bytes_downloaded", "bytes_saved"):
+        stats.setdefault(key, 0)
     
     try:
         # Connect to IMAP server
-        logger.info(f"Connecting to {settings.EMAIL_SERVER}:{settings.EMAIL_PORT}")
-        mail = imaplib.IMAP4_SSL(settings.EMAIL_SERVER, settings.EMAIL_PORT)
+        if own_session:
+            mail = connect()
         
-        # Login
-        logger.info(f"Logging in as {settings.EMAIL_USER}")
-        mail.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
+        # Select mailbox
+        mail.select(mailbox)
+        uidvalidity = _response_int(mail, "UIDVALIDITY")
+        uidnext = _response_int(mail, "UIDNEXT")
         
-        # Select inbox
-        mail.select("inbox")
+        if uidvalidity is not None and uidvalidity == checkpoint["uidvalidity"]:
+            last_uid = checkpoint["last_uid"] or 0
+            if uidnext is not None and uidnext <= last_uid + 1:
+                logger.info(f"No new emails in {mailbox} since UID {last_uid}")
+                uids = []
+            else:
+                status, messages = mail.uid("search", None, f"UID {last_uid + 1}:*")
+                if status != "OK":
+                    raise imaplib.IMAP4.error(f"SEARCH failed: {messages}")
+                # "n:*" always matches the highest UID, even when it is <= n
+                uids = sorted(uid for uid in map(int, messages[0].split()) if uid > last_uid)
+        else:
+            logger.info(f"UIDVALIDITY of {mailbox} changed to {uidvalidity}, resyncing")
+            checkpoint = {"uidvalidity": uidvalidity, "last_uid": 0}
+            if settings.EMAIL_INITIAL_SYNC_DAYS > 0:
+                date_since = (datetime.now() - timedelta(days=settings.EMAIL_INITIAL_SYNC_DAYS)).strftime("%d-%b-%Y")
+                criteria = f"(SINCE {date_since})"
+            else:
+                criteria = "ALL"
+            status, messages = mail.uid("search", None, criteria)
+            if status != "OK":
+                raise imaplib.IMAP4.error(f"SEARCH failed: {messages}")
+            uids = sorted(map(int, messages[0].split()))
         
-        # Search for unread emails from last 24 hours
-        date_since = (datetime.now() - timedelta(days=1)).strftime("%d-%b-%Y")
-        status, messages = mail.search(None, f'(UNSEEN SINCE {date_since})')
+        logger.info(f"Found {len(uids)} new emails")
+        if not uids:
+            yield [], dict(checkpoint)
         
-        if status == "OK":
-            email_ids = messages[0].split()
-            logger.info(f"Found {len(email_ids)} unread emails")
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            if settings.EMAIL_HEADER_FIRST:
+                raw_messages = _fetch_chunk_header_first(mail, chunk, stats)
+            else:
+                raw_messages = _fetch_chunk_rfc822(mail, chunk, stats)
+            stats["bytes_saved"] = stats["bytes_total"] - stats["bytes_downloaded"]
             
-            for num in email_ids:
-                status, data = mail.fetch(num, '(RFC822)')
-                
-                if status == "OK":
-                    msg = email.message_from_bytes(data[0][1])
-                    
-                    # Decode subject
-                    subject, encoding = decode_header(msg["Subject"])[0]
-                    if isinstance(subject, bytes):
-                        subject = subject.decode(encoding if encoding else "utf-8")
-                    
-                    # Decode sender
-                    sender, encoding = decode_header(msg.get("From"))[0]
-                    if isinstance(sender, bytes):
-                        sender = sender.decode(encoding if encoding else "utf-8")
-                    
-                    # Extract email address from sender
-                    email_match = re.search(r'<(.+?)>', sender)
-                    if email_match:
-                        sender_email = email_match.group(1)
-                    else:
-                        sender_email = sender
-                    
-                    # Get email body
-                    body = ""
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            content_type = part.get_content_type()
-                            content_disposition = str(part.get("Content-Disposition"))
-                            
-                            if content_type == "text/plain" and "attachment" not in content_disposition:
-                                try:
-                                    body = part.get_payload(decode=True).decode()
-                                except:
-                                    body = part.get_payload(decode=True).decode('latin-1')
-                                break
-                    else:
-                        try:
-                            body = msg.get_payload(decode=True).decode()
-                        except:
-                            body = msg.get_payload(decode=True).decode('latin-1')
-                    
-                    # Parse date
-                    date_str = msg["Date"]
-                    try:
-                        date_tuple = email.utils.parsedate_tz(date_str)
-                        if date_tuple:
-                            date = datetime.fromtimestamp(email.utils.mktime_tz(date_tuple))
-                        else:
-                            date = datetime.now()
-                    except:
-                        date = datetime.now()
-                    
-                    email_data = {
-                        "message_id": msg["Message-ID"] or f"{datetime.now().timestamp()}-{sender_email}",
-                        "sender": sender_email,
-                        "recipient": msg["To"],
-                        "subject": subject or "No Subject",
-                        "body": body or "",
-                        "date": date
-                    }
-                    
-                    # Filter for support-related emails
-                    if is_support_email(subject, body):
-                        emails.append(email_data)
-                    else:
-                        logger.info(f"Skipping non-support email: {subject}")
-        
-        mail.close()
-        mail.logout()
+            checkpoint["last_uid"] = chunk[-1]
+            yield raw_messages, dict(checkpoint)
         
+    except (imaplib.IMAP4.abort, OSError) as e:
+        if not own_session:
+            raise
+        logger.error(f"Error fetching emails: {e}")
+        if errors is not None:
+            errors.append(f"Error fetching emails: {e}")
     except Exception as e:
         logger.error(f"Error fetching emails: {e}")
+        if errors is not None:
+            errors.append(f"Error fetching emails: {e}")
+    finally:
+        if own_session and mail is not None:
+            try:
+                mail.close()
+                mail.logout()
+            except Exception:
+                pass
+
+def _fetch_chunk_rfc822(mail: imaplib.IMAP4, chunk: List[int], stats: Dict) -> List[Tuple[int, bytes]]:
+    data = _uid_fetch(mail, chunk, "(RFC822)")
+    raw_messages = []
+    for uid, literals, _ in _parse_fetch_response(data):
+        if "RFC822" in literals:
+            raw = literals["RFC822"]
+            raw_messages.append((uid, raw))
+            stats["messages"] += 1
+            stats["bytes_total"] += len(raw)
+            stats["bytes_downloaded"] += len(raw)
+    return raw_messages
+
+def _fetch_chunk_header_first(mail: imaplib.IMAP4, chunk: List[int], stats: Dict) -> List[Tuple[int, bytes]]:
+    preview_bytes = settings.EMAIL_PREVIEW_BYTES
+    data = _uid_fetch(mail, chunk, f"(RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER] BODY.PEEK[1]<0.{preview_bytes}>)")
     
+    raw_messages = []
+    headers = {}
+    pending = {}  # body section -> [(uid, text part)]; "" means the whole message
+    for uid, literals, meta in _parse_fetch_response(data):
+        size = re.search(rb'RFC822\.SIZE (\d+)', meta)
+        stats["messages"] += 1
+        stats["bytes_total"] += int(size.group(1)) if size else 0
+        stats["bytes_downloaded"] += sum(len(value) for value in literals.values())
+        
+        header = literals.get("BODY[HEADER]")
+        structure = _parse_bodystructure(meta)
+        if header is None or structure is None:
+            pending.setdefault("", []).append((uid, None))
+            continue
+        headers[uid] = header
+        part = _find_text_part(structure)
+        if part is None:
+            # No text body at all: the support filter only has the subject
+            raw_messages.append((uid, _text_part_message(header, None, b"")))
+            continue
+        
+        preview = literals.get("BODY[1]<0>")
+        if part["section"] != "1" or preview is None:
+            # Preview is not the text part, decide once the body is here
+            pending.setdefault(part["section"], []).append((uid, part))
+            continue
+        
+        subject, preview_text = _decode_preview(header, part, preview)
+        if not is_support_email(subject, preview_text):
+            logger.info(f"Skipping non-support email: {subject}")
+            stats["skipped_before_body"] += 1
+            continue
+        if len(preview) >= part["size"]:
+            raw_messages.append((uid, _text_part_message(header, part, preview)))
+        else:
+            pending.setdefault(part["section"], []).append((uid, part))
+    del data
+    
+    # Second phase: one FETCH per distinct text part section
+    for section, items in pending.items():
+        parts = dict(items)
+        data = _uid_fetch(mail, sorted(parts), f"(BODY.PEEK[{section}])")
+        for uid, literals, _ in _parse_fetch_response(data):
+            payload = literals.get(f"BODY[{section}]")
+            if payload is None or uid not in parts:
+                continue
+            stats["bytes_downloaded"] += len(payload)
+            if section == "":
+                raw_messages.append((uid, payload))
+            else:
+                raw_messages.append((uid, _text_part_message(headers[uid], parts[uid], payload)))
+    
+    raw_messages.sort(key=lambda message: message[0])
+    return raw_messages
+
+def _uid_fetch(mail: imaplib.IMAP4, uids: List[int], items: str) -> list:
+    status, data = mail.uid("fetch", _uid_set(uids), items)
+    if status != "OK":
+        raise imaplib.IMAP4.error(f"FETCH failed for UIDs {uids[0]}-{uids[-1]}: {data}")
+    return data
+
+_SUBJECT_HEADER_RE = re.compile(rb'^subject[ \t]*:(.*(?:\r?\n[ \t].*)*)', re.I | re.M)
+
+def _decode_preview(header: bytes, part: Dict, preview: bytes) -> Tuple[str, str]:
+    """
+    Cheaply decode the subject and preview text for the support filter,
+    without a full MIME parse
+    """
+    subject = ""
+    match = _SUBJECT_HEADER_RE.search(header)
+    if match:
+        raw_subject = match.group(1).decode("latin-1")
+        try:
+            subject = str(make_header(decode_header(raw_subject)))
+        except Exception:
+            subject = raw_subject
+    
+    try:
+        if part["encoding"] == "base64":
+            data = re.sub(rb'[^A-Za-z0-9+/]', b"", preview)
+            preview = binascii.a2b_base64(data[:len(data) - len(data) % 4])
+        elif part["encoding"] == "quoted-printable":
+            preview = quopri.decodestring(preview)
+    except (binascii.Error, ValueError):
+        pass
+    text = preview.decode(part["charset"] or "utf-8", errors="replace") if _known_charset(part["charset"]) \
+        else preview.decode("latin-1")
+    return subject.strip(), text
+
+def _known_charset(charset: Optional[str]) -> bool:
+    if not charset:
+        return True
+    try:
+        codecs.lookup(charset)
+        return True
+    except LookupError:
+        return False
+
+_CONTENT_HEADER_RE = re.compile(rb'^content-(?:type|transfer-encoding|disposition)[ \t]*:.*\r?\n(?:[ \t].*\r?\n)*', re.I | re.M)
+
+def _text_part_message(header: bytes, part: Optional[Dict], payload: bytes) -> bytes:
+    """
+    Build a single-part message from the top-level header and one body part,
+    so header-first fetches parse exactly like full RFC822 downloads
+    """
+    header = _CONTENT_HEADER_RE.sub(b"", header).rstrip(b"\r\n") + b"\r\n"
+    if part is not None:
+        charset = f'; charset="{part["charset"]}"' if part["charset"] else ""
+        header += f'Content-Type: {part["type"]}{charset}\r\n'.encode()
+        header += f'Content-Transfer-Encoding: {part["encoding"]}\r\n'.encode()
+    return header + b"\r\n" + payload
+
+_BODYSTRUCTURE_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+def _parse_bodystructure(meta: bytes) -> Optional[list]:
+    """
+    Parse the BODYSTRUCTURE item of a FETCH response into nested lists of
+    strings (NIL becomes None)
+    """
+    start = meta.find(b"BODYSTRUCTURE (")
+    if start < 0:
+        return None
+    pos = start + len(b"BODYSTRUCTURE ")
+    stack = []
+    while pos < len(meta):
+        match = _BODYSTRUCTURE_TOKEN_RE.match(meta, pos)
+        if not match:
+            return None
+        pos = match.end()
+        opened, closed, quoted, atom = match.groups()
+        if opened:
+            stack.append([])
+            continue
+        if closed:
+            done = stack.pop()
+            if not stack:
+                return done
+            stack[-1].append(done)
+            continue
+        if quoted is not None:
+            value = re.sub(rb'\\(.)', rb'\1', quoted).decode(errors="replace")
+        else:
+            value = None if atom.upper() == b"NIL" else atom.decode(errors="replace")
+        if not stack:
+            return None
+        stack[-1].append(value)
+    return None
+
+def _find_text_part(structure: list, section: str = "") -> Optional[Dict]:
+    """
+    Locate the body part parse_email would use: the first non-attachment
+    text/plain part of a multipart message, or the body of a single-part one
+    """
+    if not structure:
+        return None
+    if isinstance(structure[0], list):
+        for index, child in enumerate(item for item in structure if isinstance(item, list)):
+            found = _find_text_part(child, f"{section}{index + 1}.")
+            if found is not None and found["type"] == "text/plain":
+                return found
+        return None
+    
+    maintype = (structure[0] or "").lower()
+    subtype = (structure[1] or "").lower() if len(structure) > 1 else ""
+    params = structure[2] if len(structure) > 2 and isinstance(structure[2], list) else []
+    charset = None
+    for key, value in zip(params[::2], params[1::2]):
+        if key and key.lower() == "charset":
+            charset = value
+    # Disposition follows the line count for text parts and the size otherwise
+    disposition = structure[9] if maintype == "text" and len(structure) > 9 else (
+        structure[8] if maintype != "text" and len(structure) > 8 else None)
+    if section and isinstance(disposition, list) and disposition and str(disposition[0]).lower() == "attachment":
+        return None
+    try:
+        size = int(structure[6])
+    except (IndexError, TypeError, ValueError):
+        size = 0
+    return {
+        "section": section.rstrip(".") or "1",
+        "type": f"{maintype}/{subtype}",
+        "charset": charset,
+        "encoding": (structure[5] or "7bit").lower() if len(structure) > 5 else "7bit",
+        "size": size,
+    }
+
+def parse_emails(raw_messages: List[Tuple[int, bytes]], workers: int = None,
+                 errors: List[str] = None) -> List[Dict]:
+    """
+    Parse a chunk of ``(uid, raw)`` messages, skipping ones that fail (they
+    are logged and appended to ``errors`` if given)
+
+    With ``workers`` (default EMAIL_PARSE_WORKERS) above 1 the MIME parsing
+    and decoding is fanned out to a shared process pool; the result is the
+    same list of email dicts in the same order.
+    """
+    workers = settings.EMAIL_PARSE_WORKERS if workers is None else workers
+    results = None
+    if workers > 1 and len(raw_messages) > 1:
+        pool = _get_parse_pool(workers)
+        chunksize = max(1, len(raw_messages) // (workers * 4))
+        try:
+            results = list(pool.map(_parse_one, raw_messages, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            logger.error(f"Parse worker pool failed, parsing in-process: {e}")
+            shutdown_parse_pool()
+    if results is None:
+        results = map(_parse_one, raw_messages)
+    
+    emails = []
+    for uid, email_data, error in results:
+        if error is not None:
+            logger.error(f"Error parsing email UID {uid}: {error}")
+            if errors is not None:
+                errors.append(f"Skipped email UID {uid}, parsing failed: {error}")
+            continue
+        emails.append(email_data)
     return emails
 
-def is_support_email(subject: str, body: str) -> bool:
+def _parse_one(message: Tuple[int, bytes]) -> Tuple[int, Optional[Dict], Optional[str]]:
+    # Top-level so it can be pickled into pool workers; errors are returned
+    # rather than logged because worker logging does not reach the app log
+    uid, raw = message
+    try:
+        email_data = parse_email(raw)
+    except Exception as e:
+        return uid, None, str(e)
+    email_data["uid"] = uid
+    return uid, email_data, None
+
+_parse_pool = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            # spawn rather than fork: the app process runs threads and may
+            # hold torch state that is not fork-safe
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _parse_pool_workers = workers
+        return _parse_pool
+
+def shutdown_parse_pool():
     """
-    Check if email is support-related based on keywords
+    Stop the parse worker processes, if any were started
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+def filter_support_emails(emails: List[Dict]) -> List[Dict]:
+    """
+    Keep only support-related emails
+    """
+    support_emails = []
+    for email_data in emails:
+        # Kept on the email so the analysis stage reuses the same keyword pass
+        body = email_data.get("clean_body", email_data["body"])
+        email_data["keyword_scan"] = scan_keywords(body, email_data["subject"])
+        if is_support_email(email_data["subject"], body, email_data["keyword_scan"]):
+            support_emails.append(email_data)
+        else:
+            logger.info(f"Skipping non-support email: {email_data['subject']}")
+    return support_emails
+
+def _response_int(mail: imaplib.IMAP4, code: str) -> Optional[int]:
+    """
+    Read a numeric response code such as UIDVALIDITY from the last SELECT
     """
-    support_keywords = [
-        "support", "help", "question", "issue", "problem",
-        "assistance", "trouble", "error", "bug", "fix",
-        "not working", "how to", "why", "what", "when",
-        "where", "can't", "cannot", "broken", "complaint"
-    ]
+    _, data = mail.response(code)
+    if data and data[-1] is not None:
+        return int(data[-1])
+    return None
+
+def connect() -> imaplib.IMAP4:
+    """
+    Open an authenticated IMAP connection
+    """
+    logger.info(f"Connecting to {settings.EMAIL_SERVER}:{settings.EMAIL_PORT}")
+    if settings.EMAIL_USE_SSL:
+        mail = imaplib.IMAP4_SSL(settings.EMAIL_SERVER, settings.EMAIL_PORT)
+    else:
+        mail = imaplib.IMAP4(settings.EMAIL_SERVER, settings.EMAIL_PORT)
     
-    content = (subject + " " + body).lower()
-    return any(keyword in content for keyword in support_keywords)
+    logger.info(f"Logging in as {settings.EMAIL_USER}")
+    mail.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
+    return mail
 
-def categorize_email(subject: str, body: str) -> str:
+def wait_for_new_mail(mail: imaplib.IMAP4, timeout: float, poll_interval: float = None) -> bool:
     """
-    Categorize email based on content
+    Block on a selected mailbox until the server reports new mail or
+    ``timeout`` seconds pass. Uses IMAP IDLE when the server supports it and
+    falls back to NOOP polling every ``poll_interval`` seconds otherwise.
+
+    Mail the server announced while the caller synced (e.g. an EXISTS sent
+    along with a FETCH response) counts as new without waiting.
     """
-    content = (subject + " " + body).lower()
+    new_mail, known = _pending_new_mail(mail)
+    if new_mail:
+        return True
+    if "IDLE" in mail.capabilities:
+        return _idle(mail, timeout)
     
-    categories = {
-        "billing": ["payment", "invoice", "bill", "charge", "price", "cost", "refund"],
-        "technical": ["error", "bug", "crash", "not working", "broken", "technical", "server"],
-        "account": ["login", "password", "account", "sign up", "register", "profile"],
-        "feature": ["feature", "request", "suggestion", "idea", "improvement"],
-        "general": ["question", "help", "information", "how to", "what is"]
+    poll_interval = poll_interval or settings.EMAIL_POLL_INTERVAL
+    deadline = time.monotonic() + timeout
+    while True:
+        mail.noop()
+        count = _exists_count(mail, known)
+        if count is not None and (known is None or count > known):
+            return True
+        known = count
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(poll_interval, remaining))
+
+def _pending_new_mail(mail: imaplib.IMAP4) -> Tuple[bool, Optional[int]]:
+    """
+    Check the EXISTS responses left since the caller's SELECT: the first is
+    the mailbox size that SELECT saw, later ones arrived during its search
+    and fetches. Returns whether one of those counts more messages than
+    the SELECT did less the expunged ones (an expunge counted twice only
+    costs an extra sync), and the lowest possible current size, clearing
+    the responses.
+    """
+    _, exists = mail.response("EXISTS")
+    _, expunged = mail.response("EXPUNGE")
+    mail.response("RECENT")
+    if exists[-1] is None:
+        return False, None
+    counts = [int(count) for count in exists]
+    removed = len(expunged) if expunged[-1] is not None else 0
+    floor = counts[0] - removed
+    return any(count > floor for count in counts[1:]), counts[-1] - removed
+
+def _exists_count(mail: imaplib.IMAP4, known: Optional[int]) -> Optional[int]:
+    """
+    The mailbox size from the EXISTS responses received since the last call
+    (``known`` less any expunged messages if there were none), clearing them
+    """
+    _, exists = mail.response("EXISTS")
+    _, expunged = mail.response("EXPUNGE")
+    mail.response("RECENT")
+    if exists[-1] is not None:
+        return int(exists[-1])
+    if known is not None and expunged[-1] is not None:
+        return known - len(expunged)
+    return known
+
+_IDLE_NEW_MAIL_RE = re.compile(rb'^\* \d+ (EXISTS|RECENT)')
+
+def _idle(mail: imaplib.IMAP4, timeout: float) -> bool:
+    # imaplib has no IDLE support before Python 3.14, so speak it directly
+    tag = f"IDLE{int(time.monotonic() * 1000)}".encode()
+    mail.send(tag + b" IDLE\r\n")
+    new_mail = False
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during IDLE")
+        if line.startswith(b"+"):
+            break
+        if line.startswith(tag + b" "):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+        new_mail = new_mail or bool(_IDLE_NEW_MAIL_RE.match(line))
+    
+    deadline = time.monotonic() + timeout
+    while not new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not _wait_readable(mail, remaining):
+            break
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during IDLE")
+        new_mail = bool(_IDLE_NEW_MAIL_RE.match(line))
+    
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during IDLE")
+        if line.startswith(tag + b" "):
+            if not line.startswith(tag + b" OK"):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+            return new_mail
+        new_mail = new_mail or bool(_IDLE_NEW_MAIL_RE.match(line))
+
+def _wait_readable(mail: imaplib.IMAP4, timeout: float) -> bool:
+    # Lines may already sit in imaplib's read buffer, where select() cannot
+    # see them, so peek at the buffer without blocking first.
+    sock = mail.sock
+    previous_timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        if mail.file.peek(1):
+            return True
+    except (BlockingIOError, ssl.SSLWantReadError):
+        pass
+    finally:
+        sock.settimeout(previous_timeout)
+    readable, _, _ = select.select([sock], [], [], timeout)
+    return bool(readable)
+
+def _uid_set(uids: List[int]) -> str:
+    """
+    Compress sorted UIDs into an IMAP sequence set, e.g. [1, 2, 3, 7] -> "1:3,7"
+    """
+    ranges = []
+    for uid in uids:
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(str(lo) if lo == hi else f"{lo}:{hi}" for lo, hi in ranges)
+
+_FETCH_START_RE = re.compile(rb'^\d+ \(')
+_FETCH_UID_RE = re.compile(rb'UID (\d+)')
+_FETCH_LITERAL_RE = re.compile(rb'([A-Z0-9.]+(?:\[[^\]]*\](?:<\d+>)?)?) \{\d+\}$')
+
+def _parse_fetch_response(data: list) -> List[Tuple[int, Dict[str, bytes], bytes]]:
+    """
+    Split a multi-message FETCH response from imaplib into (uid, literals,
+    meta) triples, where literals maps each item name (e.g. "RFC822") to its
+    bytes and meta holds the non-literal text such as UID and BODYSTRUCTURE.
+    """
+    messages = []
+    for part in data:
+        head, literal = part if isinstance(part, tuple) else (part, None)
+        if not head:
+            continue
+        if _FETCH_START_RE.match(head) or not messages:
+            messages.append([b"", {}])
+        messages[-1][0] += head
+        if literal is not None:
+            name = _FETCH_LITERAL_RE.search(head)
+            if name:
+                messages[-1][1][name.group(1).decode()] = literal
+    
+    result = []
+    for meta, literals in messages:
+        uid = _FETCH_UID_RE.search(meta)
+        if uid and literals:
+            result.append((int(uid.group(1)), literals, meta))
+    return result
+
+def parse_email(raw: bytes) -> Dict:
+    """
+    Parse a raw RFC822 message into the email dict used by the app
+    """
+    msg = email.message_from_bytes(raw)
+    
+    # Decode subject
+    subject, encoding = decode_header(msg["Subject"])[0]
+    if isinstance(subject, bytes):
+        subject = subject.decode(encoding if encoding else "utf-8")
+    
+    # Decode sender
+    sender, encoding = decode_header(msg.get("From"))[0]
+    if isinstance(sender, bytes):
+        sender = sender.decode(encoding if encoding else "utf-8")
+    
+    # Extract email address from sender
+    email_match = re.search(r'<(.+?)>', sender)
+    if email_match:
+        sender_email = email_match.group(1)
+    else:
+        sender_email = sender
+    
+    # Get email body
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition"))
+            
+            if content_type == "text/plain" and "attachment" not in content_disposition:
+                try:
+                    body = part.get_payload(decode=True).decode()
+                except:
+                    body = part.get_payload(decode=True).decode('latin-1')
+                break
+    else:
+        try:
+            body = msg.get_payload(decode=True).decode()
+        except:
+            body = msg.get_payload(decode=True).decode('latin-1')
+    
+    clean_text, signature = split_body(body or "")
+    
+    # Parse date
+    date_str = msg["Date"]
+    try:
+        date_tuple = email.utils.parsedate_tz(date_str)
+        if date_tuple:
+            date = datetime.fromtimestamp(email.utils.mktime_tz(date_tuple))
+        else:
+            date = datetime.now()
+    except:
+        date = datetime.now()
+    
+    return {
+        "message_id": msg["Message-ID"] or f"{datetime.now().timestamp()}-{sender_email}",
+        "sender": sender_email,
+        "recipient": msg["To"],
+        "subject": subject or "No Subject",
+        "body": body or "",
+        # What the sender wrote, without quoted thread, footers and signature
+        "clean_body": clean_text,
+        "signature": signature,
+        "date": date
     }
+
+def is_support_email(subject: str, body: str, scan: KeywordScan = None) -> bool:
+    """
+    Check if email is support-related based on keywords
+    """
+    scan = scan or scan_keywords(body, subject)
+    return scan.any_in_text(SUPPORT_KEYWORDS)
+
+def categorize_email(subject: str, body: str, scan: KeywordScan = None) -> str:
+    """
+    Categorize email based on content
+    """
+    scan = scan or scan_keywords(body, subject)
     
-    for category, keywords in categories.items():
-        if any(keyword in content for keyword in keywords):
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if scan.any_in_text(keywords):
             return category
     
     return "general"
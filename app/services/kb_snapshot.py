@@ -0,0 +1,85 @@
+"""
+In-memory snapshot of knowledge base articles per category, preprocessed
+for keyword search, so drafting does not query and re-lowercase the
+knowledge base for every email
+"""
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+from app.config import settings
+from app.services.knowledge_index import snippet
+
+_WORD = re.compile(r'\S+')
+
+class KnowledgeItem(NamedTuple):
+    id: int
+    title: str
+    content: str
+    category: str
+    tags: List[str]
+    text: str  # lowercased "title content", what keyword search matches against
+    tokens: FrozenSet[str]  # whitespace-separated words of text
+    snippet: str
+
+def prepare(item: Any) -> KnowledgeItem:
+    """
+    A knowledge base article with its search text precomputed
+    """
+    text = f"{item.title} {item.content}".lower()
+    return KnowledgeItem(item.id, item.title, item.content, item.category, list(item.tags or []),
+                         text, frozenset(_WORD.findall(text)), snippet(item))
+
+class KnowledgeBaseSnapshot:
+    """
+    Prepared articles per category, loaded on first use and dropped when
+    the knowledge base is written (and after KB_SNAPSHOT_TTL seconds, for
+    writes made by other processes)
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._snapshots: Dict[Optional[str], tuple] = {}  # category -> (loaded at, items)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def get(self, category: Optional[str], load: Callable[[], Iterable[Any]]) -> List[KnowledgeItem]:
+        """
+        The category's prepared articles; ``load`` fetches them from the
+        database when there is no current snapshot
+        """
+        with self._lock:
+            entry = self._snapshots.get(category)
+            if entry is not None and (not self.ttl or time.monotonic() - entry[0] < self.ttl):
+                self.hits += 1
+                return entry[1]
+            generation = self._generation
+        items = [prepare(item) for item in load()]
+        with self._lock:
+            self.loads += 1
+            # A write while loading may not be in what was loaded
+            if generation == self._generation:
+                self._snapshots[category] = (time.monotonic(), items)
+        return items
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "categories": len(self._snapshots),
+                "items": sum(len(items) for _, items in self._snapshots.values()),
+                "hits": self.hits,
+                "loads": self.loads,
+                "invalidations": self.invalidations,
+                "ttl_seconds": self.ttl,
+            }
+
+kb_snapshot = KnowledgeBaseSnapshot(settings.KB_SNAPSHOT_TTL)
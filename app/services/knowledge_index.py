@@ -0,0 +1,151 @@
+"""
+Embedding search over the knowledge base, for drafting context
+"""
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+from app.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def snippet(item: Any) -> str:
+    """
+    How a knowledge base article is quoted in the drafting prompt
+    """
+    return f"{item.title}: {item.content[:200]}..."
+
+def _document(item: Any) -> str:
+    tags = " ".join(item.tags or [])
+    return f"{item.title}\n{tags}\n{item.content}"
+
+class KnowledgeIndex:
+    """
+    Knowledge base articles embedded with a local sentence-embedding model
+    (mean-pooled, unit-normalized transformer outputs) and kept in a
+    VectorIndex. Built from the table at startup, then updated as articles
+    are written; until it is ready, search_knowledge_base keeps using
+    keyword matching. numpy, torch and the model load with the index, not
+    on import.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32, max_length: int = 256):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._encoder = None  # (torch, tokenizer, model)
+        self._index = None
+        self._snippets: Dict[int, str] = {}
+        self._state = {"status": "not_loaded", "model": model_name, "build_seconds": None, "error": None}
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        return self._state["status"] == "ready"
+
+    def build(self, items: Iterable[Any]):
+        """
+        Index ``items`` (all knowledge base articles). Articles written
+        meanwhile are added as usual; search serves from the index once
+        every article is in.
+        """
+        start = time.perf_counter()
+        self._state.update(status="building", error=None)
+        try:
+            self._load_encoder()
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) >= 1000:
+                    self._add(batch)
+                    batch = []
+            self._add(batch)
+        except Exception as e:
+            logger.warning(f"Could not build the knowledge base index, using keyword search: {e}")
+            self._state.update(status="unavailable", error=str(e))
+            return
+        self._state.update(status="ready", build_seconds=round(time.perf_counter() - start, 3))
+        logger.info(f"Knowledge base index ready: {len(self._snippets)} articles")
+
+    def add(self, items: List[Any]):
+        """
+        Index new or changed articles. A no-op until build() has started;
+        failures are logged, never raised to the writer.
+        """
+        if self._state["status"] not in ("building", "ready"):
+            return
+        try:
+            self._add(items)
+        except Exception as e:
+            logger.error(f"Error indexing knowledge base articles: {e}")
+
+    def query(self, query: str, k: int = 3, category: str = None) -> List[Tuple[int, float]]:
+        """
+        The ``k`` (article id, similarity) pairs closest to ``query``, best
+        first, within ``category`` if given and at least KB_MIN_SIMILARITY
+        """
+        if self._index is None or not query:
+            return []
+        hits = self._index.search(self.encode([query])[0], k, label=category)
+        return [(item_id, score) for item_id, score in hits if score >= settings.KB_MIN_SIMILARITY]
+
+    def search(self, query: str, k: int = 3, category: str = None) -> List[str]:
+        """
+        Snippets of the ``k`` articles closest to ``query``
+        """
+        return [self._snippets[item_id] for item_id, _ in self.query(query, k, category)]
+
+    def snippet_for(self, item_id: int) -> str:
+        return self._snippets[item_id]
+
+    def encode(self, texts: List[str]):
+        """
+        Unit-normalized embeddings of ``texts``, one row each
+        """
+        import numpy as np
+        torch, tokenizer, model = self._load_encoder()
+        # Batches of similar lengths pad less
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start:start + self.batch_size]
+            inputs = tokenizer([texts[i] for i in chunk], padding=True, truncation=True,
+                               max_length=self.max_length, return_tensors="pt")
+            with torch.inference_mode():
+                hidden = model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            for i, vector in zip(chunk, torch.nn.functional.normalize(pooled, dim=-1).numpy()):
+                vectors[i] = vector
+        return np.stack(vectors) if vectors else np.zeros((0, model.config.hidden_size), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._state)
+        stats.update(self._index.stats() if self._index is not None else {"items": 0})
+        return stats
+
+    def _add(self, items: List[Any]):
+        if not items:
+            return
+        vectors = self.encode([_document(item) for item in items])
+        with self._lock:
+            if self._index is None:
+                from app.services.vector_index import VectorIndex
+                self._index = VectorIndex(vectors.shape[1], exact_max=settings.KB_INDEX_EXACT_MAX,
+                                          nprobe=settings.KB_INDEX_NPROBE)
+            for item in items:
+                self._snippets[item.id] = snippet(item)
+        self._index.upsert([item.id for item in items], vectors, [item.category for item in items])
+
+    def _load_encoder(self):
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    import torch
+                    from transformers import AutoModel, AutoTokenizer
+                    tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                    model = AutoModel.from_pretrained(self.model_name).eval()
+                    self._encoder = (torch, tokenizer, model)
+        return self._encoder
+
+knowledge_index = KnowledgeIndex(settings.KB_EMBEDDING_MODEL)
@@ -0,0 +1,83 @@
+import imaplib
+import threading
+import logging
+from typing import Callable
+from app.config import settings
+from app.services.email_service import connect, wait_for_new_mail
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MailboxWatcher:
+    """
+    Long-lived ingestion worker holding one authenticated IMAP session.
+
+    ``on_new_mail(mail)`` is called with the open connection once after every
+    (re)connect to catch up, and again whenever IDLE/NOOP reports new mail
+    or ``idle_timeout`` passes without a report, in case the server never
+    sent one.
+    Dropped connections are re-established with exponential backoff.
+    """
+
+    def __init__(self, on_new_mail: Callable[[imaplib.IMAP4], None], mailbox: str = None,
+                 idle_timeout: float = None, max_backoff: float = 60.0):
+        self.on_new_mail = on_new_mail
+        self.mailbox = mailbox or settings.EMAIL_MAILBOX
+        self.idle_timeout = idle_timeout or settings.EMAIL_IDLE_TIMEOUT
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread = None
+        self._mail = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mailbox-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching mailbox {self.mailbox}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        mail = self._mail
+        if mail is not None:
+            # Unblock a pending IDLE/readline
+            try:
+                mail.shutdown()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._mail = connect()
+                self._mail.select(self.mailbox)
+                backoff = 1.0
+                self.on_new_mail(self._mail)
+                while not self._stop.is_set():
+                    wait_for_new_mail(self._mail, self.idle_timeout)
+                    self.on_new_mail(self._mail)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.error(f"Mailbox watcher error, reconnecting in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                self._disconnect()
+
+    def _disconnect(self):
+        mail, self._mail = self._mail, None
+        if mail is None:
+            return
+        try:
+            mail.logout()
+        except Exception:
+            pass
@@ -1,21 +1,123 @@
-from transformers import pipeline
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import torch.nn.functional as F
+import contextlib
 import re
-from typing import Dict, Any
+import threading
+import time
+import warnings
+from typing import Dict, Any, List
 import logging
 from app.config import settings
+from app.services.batching import MicroBatcher
+from app.services.keywords import (
+    IMPORTANT_KEYWORDS, NEGATIVE_WORDS, POSITIVE_WORDS, URGENCY_BY_LEVEL, URGENCY_KEYWORDS, KeywordScan, scan_keywords
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize sentiment analysis model
-try:
-    sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-except:
-    logger.warning("Could not load sentiment analysis model, using fallback")
-    sentiment_analyzer = None
+# Bump when a change to the keyword or entity heuristics changes their
+# results, so cached analysis results are recomputed
+HEURISTICS_VERSION = 2
+
+# Upper bound on characters per token, for clipping huge bodies before
+# tokenizing them
+_MAX_CHARS_PER_TOKEN = 8
+
+# Sentiment model, loaded on first use or by warmup() so importing this
+# module does not pull in torch or touch the model hub
+sentiment_analyzer = None
+_torch = None
+_model_state = {"status": "not_loaded", "model": None, "inference_mode": None, "revision": None,
+                "load_seconds": None, "error": None}
+_model_lock = threading.Lock()
+
+def get_sentiment_analyzer():
+    """
+    Return the sentiment pipeline, loading it on first call. Returns None
+    (and the keyword fallback is used) if the model cannot be loaded.
+    """
+    global sentiment_analyzer
+    if _model_state["status"] in ("ready", "fallback"):
+        return sentiment_analyzer
+    
+    with _model_lock:
+        if _model_state["status"] in ("ready", "fallback"):
+            return sentiment_analyzer
+        
+        _model_state.update(status="loading", model=settings.SENTIMENT_MODEL,
+                            inference_mode=settings.NLP_INFERENCE_MODE)
+        start = time.perf_counter()
+        try:
+            sentiment_analyzer = load_sentiment_pipeline(settings.SENTIMENT_MODEL, settings.NLP_INFERENCE_MODE)
+            # Hub commit of the loaded weights, when transformers reports it
+            config = getattr(sentiment_analyzer.model, "config", None)
+            _model_state.update(status="ready", revision=getattr(config, "_commit_hash", None))
+        except Exception as e:
+            logger.warning("Could not load sentiment analysis model, using fallback")
+            sentiment_analyzer = None
+            _model_state.update(status="fallback", error=str(e))
+        _model_state["load_seconds"] = round(time.perf_counter() - start, 3)
+        return sentiment_analyzer
+
+def load_sentiment_pipeline(model_name: str, mode: str = "fp32"):
+    """
+    Build the sentiment pipeline. ``mode`` is "fp32" or "int8" (Linear
+    layers dynamically quantized to int8 for CPU inference: smaller and
+    faster at a small accuracy cost). NLP_TORCH_THREADS caps the intra-op
+    threads when set.
+    """
+    global _torch
+    import torch
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+    _torch = torch
+    
+    if settings.NLP_TORCH_THREADS:
+        torch.set_num_threads(settings.NLP_TORCH_THREADS)
+    
+    if mode == "fp32":
+        return pipeline("sentiment-analysis", model=model_name)
+    if mode != "int8":
+        raise ValueError(f"Unknown NLP_INFERENCE_MODE {mode!r}, expected 'fp32' or 'int8'")
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    with warnings.catch_warnings():
+        # Deprecated in favour of torchao but shipped by the torch versions
+        # requirements.txt allows, which pins torch for this reason
+        warnings.filterwarnings("ignore", message=r"torch\.ao\.quantization is deprecated")
+        warnings.filterwarnings("ignore", message=r"torch\.quantize_per_tensor")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=-1)
+
+def _inference():
+    # No autograd bookkeeping during inference
+    return _torch.inference_mode() if _torch is not None else contextlib.nullcontext()
+
+def warmup():
+    """
+    Load the models and run one inference so the first request does not
+    pay for it
+    """
+    analyze_sentiment_batch(["Warm up the sentiment model."])
+
+def analysis_version() -> str:
+    """
+    Identify what produces the analysis results (sentiment model, weights
+    revision and inference mode, or the keyword fallback, plus the
+    heuristics revision) so cached results from anything else are not used
+    """
+    if get_sentiment_analyzer() is None:
+        model = "keyword-fallback"
+    else:
+        model = (f"{_model_state['model']}@{_model_state['revision'] or 'unknown'}:{_model_state['inference_mode']}"
+                 f":{settings.NLP_SENTIMENT_STRATEGY}-{settings.NLP_MAX_TOKENS_PER_EMAIL}")
+    return f"{model}:heuristics-{HEURISTICS_VERSION}"
+
+def model_status() -> Dict[str, Any]:
+    """
+    Load state of the NLP models, for the readiness endpoint
+    """
+    return {"sentiment": dict(_model_state)}
 
 def analyze_sentiment(text: str) -> tuple:
     """
@@ -25,87 +127,265 @@ def analyze_sentiment(text: str) -> tuple:
         return "neutral", 0.0
     
     try:
+        sentiment_analyzer = get_sentiment_analyzer()
         if sentiment_analyzer:
-            # Limit text length for the model
-            if len(text) > 512:
-                text = text[:512]
-            
-            result = sentiment_analyzer(text)[0]
-            return result['label'].lower(), result['score']
+            if settings.NLP_MICROBATCH:
+                return sentiment_batcher.submit(text).result()
+            return _predict_sentiment([text])[0]
         else:
-            # Fallback simple sentiment analysis
-            positive_words = ["good", "great", "excellent", "awesome", "fantastic", "thanks", "thank you", "helpful", "appreciate"]
-            negative_words = ["bad", "terrible", "awful", "horrible", "disappointed", "frustrated", "angry", "upset", "problem", "issue"]
-            
-            text_lower = text.lower()
-            positive_count = sum(1 for word in positive_words if word in text_lower)
-            negative_count = sum(1 for word in negative_words if word in text_lower)
-            
-            if positive_count > negative_count:
-                return "positive", 0.7
-            elif negative_count > positive_count:
-                return "negative", 0.7
-            else:
-                return "neutral", 0.5
+            return _fallback_sentiment(text)
                 
     except Exception as e:
         logger.error(f"Error in sentiment analysis: {e}")
         return "neutral", 0.5
 
-def extract_entities(text: str) -> Dict[str, Any]:
+def analyze_sentiment_batch(texts: List[str], batch_size: int = None,
+                            scans: List[KeywordScan] = None) -> List[tuple]:
+    """
+    Analyze sentiment of many texts with padded batches of ``batch_size``
+    (default NLP_BATCH_SIZE) model windows per forward pass; results come
+    back in input order and match analyze_sentiment. ``scans`` (keyword
+    scans of the texts) are reused by the keyword fallback when the model
+    is not available. With NLP_MICROBATCH the texts go through the shared
+    sentiment_batcher instead, batched together with other callers' texts.
+    """
+    results = [("neutral", 0.0)] * len(texts)
+    # Blank texts skip the model
+    pending = [(i, text) for i, text in enumerate(texts) if text.strip()]
+    if not pending:
+        return results
+    
+    sentiment_analyzer = get_sentiment_analyzer()
+    if not sentiment_analyzer:
+        for i, _ in pending:
+            results[i] = _fallback_sentiment(texts[i], scans[i] if scans else None)
+        return results
+    
+    # Neighbouring texts of similar length tend to share a micro-batch
+    pending.sort(key=lambda item: len(item[1]))
+    if settings.NLP_MICROBATCH:
+        futures = sentiment_batcher.submit_many([text for _, text in pending])
+        for (i, _), future in zip(pending, futures):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.error(f"Error in sentiment analysis: {e}")
+                results[i] = "neutral", 0.5
+        return results
+    
+    try:
+        outputs = _predict_sentiment([text for _, text in pending], batch_size)
+        for (i, _), result in zip(pending, outputs):
+            results[i] = result
+    except Exception as e:
+        # One bad input should not cost the whole batch its sentiment
+        logger.error(f"Error in batch sentiment analysis, retrying per text: {e}")
+        for i, text in pending:
+            results[i] = analyze_sentiment(text)
+    return results
+
+def _special_tokens(tokenizer) -> tuple:
+    """
+    (prefix, suffix) special token ids the model expects around a single
+    sequence, e.g. ([CLS], [SEP]), read off the tokenizer's own output
+    """
+    cached = getattr(tokenizer, "_sentiment_special_tokens", None)
+    if cached is None:
+        full = tokenizer("a")["input_ids"]
+        bare = tokenizer("a", add_special_tokens=False)["input_ids"]
+        start = next(i for i in range(len(full)) if full[i:i + len(bare)] == bare)
+        cached = tokenizer._sentiment_special_tokens = (full[:start], full[start + len(bare):])
+    return cached
+
+def _token_window(analyzer) -> int:
+    # Content tokens per model input, without [CLS]/[SEP]
+    tokenizer = analyzer.tokenizer
+    limit = min(tokenizer.model_max_length, getattr(analyzer.model.config, "max_position_embeddings", 512))
+    prefix, suffix = _special_tokens(tokenizer)
+    return limit - len(prefix) - len(suffix)
+
+def _budget_segments(ids: List[int], window: int) -> List[List[int]]:
+    """
+    Cut one email's token ids to its budget and split them into model
+    inputs. Over budget, the first quarter of the budget comes from the
+    start of the email and the rest from its end (greeting and context,
+    then the closing ask). "head_tail" spends at most one window per email,
+    "chunked" up to NLP_MAX_TOKENS_PER_EMAIL in equal windows.
+    """
+    budget = settings.NLP_MAX_TOKENS_PER_EMAIL
+    if settings.NLP_SENTIMENT_STRATEGY == "head_tail":
+        budget = min(budget, window)
+    elif settings.NLP_SENTIMENT_STRATEGY != "chunked":
+        raise ValueError(f"Unknown NLP_SENTIMENT_STRATEGY {settings.NLP_SENTIMENT_STRATEGY!r}, "
+                         "expected 'head_tail' or 'chunked'")
+    if len(ids) > budget:
+        head = budget // 4
+        ids = ids[:head] + ids[len(ids) - (budget - head):]
+    if not ids:
+        # Nothing left once tokenized (e.g. only zero-width characters):
+        # one empty input, scored on the special tokens alone
+        return [ids]
+    count = -(-len(ids) // window)
+    size = -(-len(ids) // count)
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+def _predict_sentiment(texts: List[str], batch_size: int = None) -> List[tuple]:
+    """
+    Score texts with the sentiment model under the per-email token budget.
+    All windows of all texts are batched together, shortest first, and an
+    email's label comes from its windows' class probabilities averaged by
+    token count.
+    """
+    analyzer = get_sentiment_analyzer()
+    tokenizer, model = analyzer.tokenizer, analyzer.model
+    batch_size = batch_size or settings.NLP_BATCH_SIZE
+    window = _token_window(analyzer)
+    
+    # Only the ends of huge bodies can be in the budget: skip tokenizing the rest
+    side = settings.NLP_MAX_TOKENS_PER_EMAIL * _MAX_CHARS_PER_TOKEN
+    clipped = [text if len(text) <= 2 * side else text[:side] + "\n" + text[-side:] for text in texts]
+    encoded = tokenizer(clipped, add_special_tokens=False, verbose=False)["input_ids"]
+    prefix, suffix = _special_tokens(tokenizer)
+    segments = [(i, segment) for i, ids in enumerate(encoded) for segment in _budget_segments(ids, window)]
+    segments.sort(key=lambda item: len(item[1]))
+    
+    totals = [0.0] * len(texts)
+    weights = [0] * len(texts)
+    for start in range(0, len(segments), batch_size):
+        chunk = segments[start:start + batch_size]
+        inputs = tokenizer.pad(
+            {"input_ids": [prefix + ids + suffix for _, ids in chunk]},
+            return_tensors="pt"
+        )
+        with _inference():
+            probabilities = model(**inputs).logits.softmax(dim=-1)
+        for (i, ids), row in zip(chunk, probabilities):
+            weight = max(1, len(ids))
+            totals[i] = totals[i] + row * weight
+            weights[i] += weight
+    
+    results = []
+    for total, weight in zip(totals, weights):
+        probabilities = total / weight
+        label = int(probabilities.argmax())
+        results.append((model.config.id2label[label].lower(), float(probabilities[label])))
+    return results
+
+# Coalesces sentiment requests from every thread in the process (ingest
+# batches, API requests, background jobs) into shared forward passes
+sentiment_batcher = MicroBatcher(_predict_sentiment, settings.NLP_BATCH_SIZE, settings.NLP_MAX_WAIT_MS,
+                                 name="sentiment-batcher")
+
+def inference_stats() -> Dict[str, Any]:
+    """
+    Queue depth, batch-size histograms and counters of the micro-batchers
+    """
+    return {"sentiment": sentiment_batcher.stats()}
+
+def shutdown():
+    sentiment_batcher.stop()
+
+def _fallback_sentiment(text: str, scan: KeywordScan = None) -> tuple:
+    # Fallback simple sentiment analysis
+    scan = scan or scan_keywords(text)
+    positive_count = len(scan.in_body(POSITIVE_WORDS))
+    negative_count = len(scan.in_body(NEGATIVE_WORDS))
+    
+    if positive_count > negative_count:
+        return "positive", 0.7
+    elif negative_count > positive_count:
+        return "negative", 0.7
+    else:
+        return "neutral", 0.5
+
+# Phone numbers, email addresses and URLs in one pass. At each position the
+# first alternative that matches wins, so digits inside a URL are not also
+# reported as a phone number. Emails are matched from their "@domain" part
+# and the local part is read back from the text before it: a pattern that
+# can start on any letter would be tried at every word of the body. The
+# lookahead lets the regex engine skip all other characters cheaply.
+ENTITY_PATTERN = re.compile(
+    r'(?=[h@(\d])(?:'
+    r'(?P<url>https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-=&%]*\??[/\w\.-=&%]*)'
+    r'|(?P<email>@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)'
+    r'|(?P<phone>\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}))'
+)
+_EMAIL_LOCAL_PART = re.compile(r'\b[A-Za-z0-9._%+-]+\Z')
+_EMAIL_LOCAL_MAX = 64
+_URL_TRAILING = ".,;:!?=&"
+
+def _normalize_phone(value: str) -> str:
+    digits = re.sub(r'\D', '', value)
+    return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+
+def _normalize_url(value: str) -> str:
+    # Sentence punctuation after a link, and the scheme and host, which are
+    # case-insensitive; the path is kept as written
+    value = value.rstrip(_URL_TRAILING)
+    scheme, _, rest = value.partition("://")
+    host, sep, path = rest.partition("/")
+    return f"{scheme.lower()}://{host.lower()}{sep}{path}"
+
+_NORMALIZERS = {"phone": _normalize_phone, "email": str.lower, "url": _normalize_url}
+
+def scan_entities(text: str, max_chars: int = None) -> Dict[str, List[str]]:
+    """
+    Find phone numbers, email addresses and URLs in one pass, normalized
+    and deduplicated in order of appearance. Very long bodies (attachments
+    pasted inline, base64 dumps) are only scanned at their start and end.
+    """
+    max_chars = settings.NLP_ENTITY_SCAN_CHARS if max_chars is None else max_chars
+    if max_chars and len(text) > max_chars:
+        head = max_chars // 2
+        text = text[:head] + "\n" + text[len(text) - (max_chars - head):]
+    
+    # Raw matches first, deduplicated, so repeats are normalized only once
+    found = {"phone": {}, "email": {}, "url": {}}
+    email_end = 0
+    for match in ENTITY_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "email":
+            # The local part cannot reach back into the previous address
+            start = match.start()
+            local = _EMAIL_LOCAL_PART.search(text, max(email_end, start - _EMAIL_LOCAL_MAX), start)
+            if local is None:
+                continue
+            value = local.group() + value
+            email_end = match.end()
+        found[kind][value] = None
+    return {kind: list(dict.fromkeys(map(_NORMALIZERS[kind], values))) for kind, values in found.items()}
+
+def extract_entities(text: str, scan: KeywordScan = None) -> Dict[str, Any]:
     """
     Extract entities from email text using regex patterns
     """
+    found = scan_entities(text)
     entities = {
-        "phone_numbers": extract_phone_numbers(text),
-        "email_addresses": extract_email_addresses(text),
-        "urls": extract_urls(text),
-        "important_keywords": extract_important_keywords(text)
+        "phone_numbers": found["phone"],
+        "email_addresses": found["email"],
+        "urls": found["url"],
+        "important_keywords": extract_important_keywords(text, scan)
     }
     return entities
 
 def extract_phone_numbers(text: str):
-    phone_regex = r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-    return re.findall(phone_regex, text)
+    return scan_entities(text)["phone"]
 
 def extract_email_addresses(text: str):
-    email_regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.findall(email_regex, text)
+    return scan_entities(text)["email"]
 
 def extract_urls(text: str):
-    url_regex = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-]*\??[/\w\.-=&%]*'
-    return re.findall(url_regex, text)
-
-def extract_important_keywords(text: str):
-    important_keywords = [
-        "urgent", "asap", "immediately", "emergency", "important",
-        "critical", "broken", "not working", "error", "bug",
-        "payment", "invoice", "refund", "account", "login"
-    ]
-    
-    found_keywords = []
-    text_lower = text.lower()
-    for keyword in important_keywords:
-        if keyword in text_lower:
-            found_keywords.append(keyword)
-    
-    return found_keywords
+    return scan_entities(text)["url"]
+
+def extract_important_keywords(text: str, scan: KeywordScan = None):
+    scan = scan or scan_keywords(text)
+    return scan.in_body(IMPORTANT_KEYWORDS)
 
-def detect_urgency(text: str) -> int:
+def detect_urgency(text: str, scan: KeywordScan = None) -> int:
     """
     Detect urgency level based on keywords (scale 1-5)
     """
-    urgency_keywords = {
-        "urgent": 5, "asap": 5, "immediately": 5, "emergency": 5, "right away": 5,
-        "important": 4, "critical": 4, "soon": 3, "quickly": 3,
-        "when you can": 2, "no rush": 1, "whenever": 1, "at your convenience": 1
-    }
-    
-    text_lower = text.lower()
-    max_urgency = 1
-    
-    for keyword, level in urgency_keywords.items():
-        if keyword in text_lower and level > max_urgency:
-            max_urgency = level
-    
-    return max_urgency
+    scan = scan or scan_keywords(text)
+    keyword = scan.first_in_body(URGENCY_BY_LEVEL)
+    return URGENCY_KEYWORDS[keyword] if keyword is not None else 1
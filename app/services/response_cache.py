@@ -0,0 +1,247 @@
+"""
+Cache of AI drafts, so floods of identical or near-identical emails
+(outage reports, form submissions) cost one LLM call instead of one each
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from app.config import settings
+
+_WHITESPACE = re.compile(r'\s+')
+_TOKEN = re.compile(r'\w+')
+_DIGITS = re.compile(r'\d+')
+_FINGERPRINT_BITS = 64
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, collapse whitespace runs and strip
+    """
+    return _WHITESPACE.sub(" ", text or "").strip().lower()
+
+def fingerprint(text: str) -> int:
+    """
+    64-bit SimHash of the words and word pairs of ``text``: texts sharing
+    most of them differ in few bits. Numbers all count as the same word,
+    so ticket numbers, times and amounts do not set emails apart.
+    """
+    import numpy as np
+    words = _TOKEN.findall(_DIGITS.sub("0", text))
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    hashes = np.array([int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                       for feature in features], dtype=np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(len(features), _FINGERPRINT_BITS)
+    return int.from_bytes(np.packbits(bits.sum(axis=0) * 2 > len(features)).tobytes(), "big")
+
+class DraftKey(NamedTuple):
+    exact: str  # hash of group, subject and body
+    group: str  # hash of category, sentiment, extracted info and knowledge base context
+    fingerprint: Optional[int]  # only in similarity mode
+
+class _Entry(NamedTuple):
+    response: str
+    key: DraftKey
+    created: float
+    tokens: int  # LLM tokens the draft cost
+    seconds: float  # and how long it took
+
+class ResponseCache:
+    """
+    Bounded LRU of drafts, each kept for at most ``ttl`` seconds (0 = no
+    expiry).
+
+    A draft is reused for an email with the same normalized subject and
+    body, category, sentiment, extracted info (contact details quoted in
+    the prompt) and knowledge base context. With ``max_distance`` > 0 it is
+    also reused for an email with the same category, sentiment, extracted
+    info and context whose fingerprint() differs in at most that many bits.
+    Fingerprints are split into max_distance + 1 blocks and indexed by
+    block value: any fingerprint within the distance equals the query in at
+    least one block, so only those are compared.
+
+    Callers that miss claim() the key before calling the LLM, so identical
+    emails drafted at the same time share one call.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, max_distance: int = None):
+        self.max_entries = settings.RESPONSE_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = settings.RESPONSE_CACHE_TTL if ttl is None else ttl
+        max_distance = settings.RESPONSE_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_distance = max(0, min(max_distance, _FINGERPRINT_BITS - 1))
+        width = _FINGERPRINT_BITS // (self.max_distance + 1)
+        # (shift, mask) of each block; the last one takes the leftover bits
+        self._blocks = [(i * width, (1 << width) - 1) for i in range(self.max_distance)]
+        self._blocks.append((self.max_distance * width, (1 << (_FINGERPRINT_BITS - self.max_distance * width)) - 1))
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_block: Dict[Tuple[str, int, int], Set[str]] = {}
+        self._in_flight: Dict[str, list] = {}  # exact key -> [future of the draft, callers waiting on it]
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "similar_hits": 0, "shared_hits": 0, "misses": 0}
+        self._stores = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._saved_tokens = 0
+        self._saved_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, subject: str, body: str, category: Optional[str], sentiment: Optional[str],
+            extracted_info: Dict[str, Any] = None, knowledge_context: List[str] = None) -> DraftKey:
+        context = hashlib.sha256("\0".join(knowledge_context or []).encode("utf-8", "surrogatepass")).hexdigest()
+        info = hashlib.sha256(json.dumps(extracted_info or {}, sort_keys=True, default=str).encode()).hexdigest()
+        group = hashlib.sha256("\0".join((category or "", sentiment or "", info, context)).encode()).hexdigest()
+        subject, body = normalize(subject), normalize(body)
+        exact = hashlib.sha256("\0".join((group, subject, body)).encode("utf-8", "surrogatepass")).hexdigest()
+        similar = self.enabled and self.max_distance > 0
+        return DraftKey(exact, group, fingerprint(f"{subject}\n{body}") if similar else None)
+
+    def get(self, key: DraftKey) -> Optional[str]:
+        """
+        A cached draft for the email ``key`` was made from, or None
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key.exact, now)
+            outcome = "hits"
+            if entry is None and key.fingerprint is not None:
+                entry = self._nearest(key, now)
+                outcome = "similar_hits"
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(entry.key.exact)
+            self._counts[outcome] += 1
+            self._saved_tokens += entry.tokens
+            self._saved_seconds += entry.seconds
+            return entry.response
+
+    def put(self, key: DraftKey, response: str, tokens: int = 0, seconds: float = 0.0):
+        """
+        Cache the draft made for ``key``, which cost ``tokens`` and took
+        ``seconds``
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if key.exact in self._entries:
+                self._drop(key.exact)
+            self._entries[key.exact] = _Entry(response, key, time.monotonic(), tokens, seconds)
+            if key.fingerprint is not None:
+                for index, block in enumerate(self._block_values(key.fingerprint)):
+                    self._by_block.setdefault((key.group, index, block), set()).add(key.exact)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def claim(self, key: DraftKey) -> Optional[Future]:
+        """
+        After a miss: None if the caller is now drafting ``key`` and must
+        release() it, else the future of the identical draft another caller
+        is making, resolving to that draft (or None if it failed)
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            in_flight = self._in_flight.get(key.exact)
+            if in_flight is None:
+                self._in_flight[key.exact] = [Future(), 0]
+                return None
+            in_flight[1] += 1
+            return in_flight[0]
+
+    def release(self, key: DraftKey, response: Optional[str], tokens: int = 0, seconds: float = 0.0):
+        """
+        Finish a claimed draft: cache ``response`` (None if drafting failed)
+        and hand it to the callers waiting on it
+        """
+        if not self.enabled:
+            return
+        if response is not None:
+            self.put(key, response, tokens, seconds)
+        with self._lock:
+            in_flight = self._in_flight.pop(key.exact, None)
+            if in_flight is None:
+                return
+            future, waiting = in_flight
+            if response is not None and waiting:
+                # Their lookups missed, but the draft was shared after all
+                self._counts["misses"] -= waiting
+                self._counts["shared_hits"] += waiting
+                self._saved_tokens += tokens * waiting
+                self._saved_seconds += seconds * waiting
+        if not future.done():
+            future.set_result(response)
+
+    def _live(self, exact: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(exact)
+        if entry is not None and self.ttl and now - entry.created >= self.ttl:
+            self._drop(exact)
+            self._expirations += 1
+            return None
+        return entry
+
+    def _nearest(self, key: DraftKey, now: float) -> Optional[_Entry]:
+        candidates = set()
+        for index, block in enumerate(self._block_values(key.fingerprint)):
+            candidates.update(self._by_block.get((key.group, index, block), ()))
+        best, best_distance = None, self.max_distance + 1
+        for exact in candidates:
+            entry = self._live(exact, now)
+            if entry is None:
+                continue
+            distance = bin(entry.key.fingerprint ^ key.fingerprint).count("1")
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def _block_values(self, value: int) -> List[int]:
+        return [(value >> shift) & mask for shift, mask in self._blocks]
+
+    def _drop(self, exact: str):
+        entry = self._entries.pop(exact)
+        if entry.key.fingerprint is None:
+            return
+        for index, block in enumerate(self._block_values(entry.key.fingerprint)):
+            bucket_key = (entry.key.group, index, block)
+            bucket = self._by_block.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(exact)
+                if not bucket:
+                    del self._by_block[bucket_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_block.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = sum(counts.values())
+            return {
+                **counts,
+                "lookups": lookups,
+                "hit_rate": round((lookups - counts["misses"]) / lookups, 4) if lookups else None,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "entries": len(self._entries),
+                "capacity": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "max_distance": self.max_distance,
+                "saved_tokens": self._saved_tokens,
+                "saved_seconds": round(self._saved_seconds, 3),
+            }
+
+response_cache = ResponseCache()
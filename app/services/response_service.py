@@ -26,8 +26,13 @@ def send_email_response(recipient: str, subject: str, body: str, reply_to: str =
         
         # Send email
         # Use smtp.gmail.com for Gmail SMTP (EMAIL_SERVER is for IMAP)
-        smtp_server = "smtp.gmail.com" if "gmail" in settings.EMAIL_SERVER else settings.EMAIL_SERVER
-        server = smtplib.SMTP_SSL(smtp_server, 465)
+        smtp_server = settings.SMTP_SERVER or (
+            "smtp.gmail.com" if "gmail" in settings.EMAIL_SERVER else settings.EMAIL_SERVER
+        )
+        if settings.SMTP_USE_SSL:
+            server = smtplib.SMTP_SSL(smtp_server, settings.SMTP_PORT)
+        else:
+            server = smtplib.SMTP(smtp_server, settings.SMTP_PORT)
         server.login(settings.EMAIL_USER, settings.EMAIL_PASSWORD)
         text = msg.as_string()
         server.sendmail(settings.EMAIL_USER, recipient, text)
@@ -0,0 +1,102 @@
+"""
+Strip quoted replies, forwarded headers, signatures and legal footers from
+email bodies, so the NLP stages and the LLM only see what the sender wrote
+"""
+import re
+from typing import List, Tuple
+
+# "On Tue, 2 Jan 2024 at 10:00, Jane <jane@example.com> wrote:" and the
+# same attribution line from common non-English clients
+_ATTRIBUTION = re.compile(
+    r'^(?:on|am|le|el|il|op)\b.*\b(?:wrote|schrieb|a écrit|escribió|ha scritto|schreef)\s*:\s*$',
+    re.IGNORECASE
+)
+_ATTRIBUTION_START = re.compile(r'^(?:on|am|le|el|il|op)\s', re.IGNORECASE)
+# Separators after which the rest of the body is the original message
+_ORIGINAL_MESSAGE = re.compile(r'^(?:-{2,}\s*original message\s*-{2,}|_{10,})\s*$', re.IGNORECASE)
+_FORWARDED = re.compile(r'^(?:-{2,}\s*forwarded message\s*-{2,}|begin forwarded message:)\s*$', re.IGNORECASE)
+_HEADER_LINE = re.compile(r'^(?:from|sent|date|to|cc|bcc|subject|reply-to)\s*:', re.IGNORECASE)
+_SIGNATURE_DELIMITER = re.compile(r'^--\s*$')
+_MOBILE_SIGNATURE = re.compile(r'^(?:sent from my |sent from (?:outlook|mail) for |get outlook for )', re.IGNORECASE)
+_LEGAL_FOOTER = re.compile(
+    r'^(?:confidentiality notice|disclaimer\b|this (?:e-?mail|message|communication)\b.{0,80}'
+    r'\b(?:confidential|privileged|intended (?:solely|only) for))',
+    re.IGNORECASE
+)
+# Cheap pre-check: bodies without any of these are returned unchanged
+_MARKERS = re.compile(
+    r'^\s*(?:>|--|__|on\s|am\s|le\s|el\s|il\s|op\s|from\s*:|begin forwarded|sent from|get outlook'
+    r'|confidentiality|disclaimer|this (?:e-?mail|message|communication))',
+    re.IGNORECASE | re.MULTILINE
+)
+
+def split_body(body: str) -> Tuple[str, str]:
+    """
+    Split an email body into (text the sender wrote, their signature).
+
+    Dropped: ``>`` quoted lines and their "On ... wrote:" attribution,
+    Outlook-style original messages ("-----Original Message-----", a
+    "From:/Sent:" header block) with everything after them, forwarded-message
+    header blocks (the forwarded text itself is kept), and legal footers.
+    The signature is what follows a "-- " delimiter, plus "Sent from my ..."
+    lines. If nothing would be left the body is returned as is.
+    """
+    if not body or not _MARKERS.search(body):
+        return (body or "").strip(), ""
+
+    lines = body.splitlines()
+    kept: List[str] = []
+    signature: List[str] = []
+    in_signature = False
+    i = 0
+    while i < len(lines):
+        stripped = lines[i].strip()
+        if stripped.startswith(">"):
+            i += 1
+            continue
+        if _ATTRIBUTION_START.match(stripped):
+            # The attribution may be wrapped over two lines
+            if _ATTRIBUTION.match(stripped):
+                i += 1
+                continue
+            if i + 1 < len(lines) and _ATTRIBUTION.match(stripped + " " + lines[i + 1].strip()):
+                i += 2
+                continue
+        if _ORIGINAL_MESSAGE.match(stripped) or _LEGAL_FOOTER.match(stripped) or _is_header_block(lines, i):
+            break
+        if _FORWARDED.match(stripped):
+            i += 1
+            while i < len(lines) and (_HEADER_LINE.match(lines[i].strip()) or not lines[i].strip()):
+                i += 1
+            in_signature = False
+            continue
+        if _SIGNATURE_DELIMITER.match(stripped):
+            in_signature = True
+            i += 1
+            continue
+        if _MOBILE_SIGNATURE.match(stripped):
+            signature.append(stripped)
+            i += 1
+            continue
+        (signature if in_signature else kept).append(lines[i].rstrip())
+        i += 1
+
+    text = _squeeze_blank_lines(kept)
+    if not text:
+        return body.strip(), ""
+    return text, _squeeze_blank_lines(signature)
+
+def _is_header_block(lines: List[str], i: int) -> bool:
+    # An unquoted original message starts with "From:" followed shortly by
+    # "Sent:" or "Date:"
+    if not lines[i].lstrip()[:5].lower() == "from:":
+        return False
+    following = [line.strip().lower() for line in lines[i + 1:i + 4]]
+    return any(line.startswith(("sent:", "date:")) for line in following)
+
+def _squeeze_blank_lines(lines: List[str]) -> str:
+    out = []
+    for line in lines:
+        if line or (out and out[-1]):
+            out.append(line)
+    return "\n".join(out).strip()
@@ -0,0 +1,189 @@
+"""
+In-memory nearest-neighbour index over unit-normalized embeddings
+"""
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+class VectorIndex:
+    """
+    Embeddings kept in one contiguous float32 matrix, searched by inner
+    product (cosine similarity for unit vectors).
+
+    Up to ``exact_max`` rows a search is a single matrix-vector product over
+    the whole matrix. Past that the rows are clustered (spherical k-means)
+    and stored sorted by cluster, so a search scores the ``nprobe`` closest
+    clusters, each a contiguous slice of the matrix. Rows added since the
+    last clustering are appended and assigned their nearest centroid, and
+    scored when it is probed. Removed and replaced rows are masked until the
+    next clustering compacts them away.
+    """
+
+    def __init__(self, dim: int, exact_max: int = 5000, nprobe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.exact_max = exact_max
+        self.nprobe = nprobe
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._labels = np.zeros(0, dtype=np.int32)  # label code per row, -1 = removed
+        self._clusters = np.zeros(0, dtype=np.int32)  # nearest centroid per row
+        self._label_codes: Dict[str, int] = {}
+        self._row_of: Dict[int, int] = {}
+        self._size = 0
+        # Clusters: rows offsets[c]:offsets[c + 1] belong to centroid c, rows
+        # from offsets[-1] on were added since
+        self._centroids: Optional[np.ndarray] = None
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def upsert(self, ids: Sequence[int], vectors, labels: Sequence[str] = None):
+        """
+        Add or replace rows. ``vectors`` is (n, dim), unit-normalized;
+        ``labels`` (e.g. categories) can be used to filter searches.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels = labels if labels is not None else [None] * len(ids)
+        with self._lock:
+            clusters = _nearest(vectors, self._centroids) if self._centroids is not None else [-1] * len(ids)
+            for item_id, vector, label, cluster in zip(ids, vectors, labels, clusters):
+                code = self._label_codes.setdefault(label, len(self._label_codes))
+                row = self._row_of.get(item_id)
+                if row is not None and row >= self._offsets[-1]:
+                    # Rows added since the last clustering can be overwritten in place
+                    self._vectors[row] = vector
+                    self._labels[row] = code
+                    self._clusters[row] = cluster
+                    continue
+                if row is not None:
+                    self._labels[row] = -1
+                self._append(item_id, vector, code, cluster)
+            if self._needs_clustering():
+                self._cluster()
+
+    def remove(self, item_id: int):
+        with self._lock:
+            row = self._row_of.pop(item_id, None)
+            if row is not None:
+                self._labels[row] = -1
+
+    def search(self, vector, k: int, label: str = None) -> List[Tuple[int, float]]:
+        """
+        The ``k`` best (id, score) pairs, best first, optionally only among
+        rows with ``label``
+        """
+        query = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            if not self._row_of or (label is not None and label not in self._label_codes):
+                return []
+            code = self._label_codes.get(label, -2)
+            rows, scores = self._candidates(query)
+            keep = self._labels[rows] == code if label is not None else self._labels[rows] >= 0
+            rows, scores = rows[keep], scores[keep]
+            if len(rows) < k and label is not None and self._centroids is not None:
+                # A label rare in the probed clusters: score all of its rows
+                rows = np.flatnonzero(self._labels[:self._size] == code)
+                scores = self._vectors[rows] @ query
+            if len(rows) > k:
+                top = np.argpartition(scores, -k)[-k:]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(int(self._ids[rows[i]]), float(scores[i])) for i in order]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            clustered = int(self._offsets[-1])
+            return {
+                "items": len(self._row_of),
+                "rows": self._size,
+                "dim": self.dim,
+                "clusters": 0 if self._centroids is None else len(self._centroids),
+                "unclustered_rows": self._size - clustered,
+            }
+
+    def _candidates(self, query) -> Tuple[np.ndarray, np.ndarray]:
+        if self._centroids is None:
+            return np.arange(self._size), self._vectors[:self._size] @ query
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(self._centroids @ query, -nprobe)[-nprobe:]
+        ranges = [(self._offsets[c], self._offsets[c + 1]) for c in probe]
+        clustered = self._offsets[-1]
+        probed = np.zeros(len(self._centroids), dtype=bool)
+        probed[probe] = True
+        added = clustered + np.flatnonzero(probed[self._clusters[clustered:self._size]])
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges] + [added])
+        scores = np.concatenate([self._vectors[start:end] @ query for start, end in ranges]
+                                + [self._vectors[added] @ query])
+        return rows, scores
+
+    def _append(self, item_id: int, vector, code: int, cluster: int):
+        if self._size == len(self._vectors):
+            capacity = max(1024, 2 * len(self._vectors))
+            self._vectors = _grow(self._vectors, capacity)
+            self._ids = _grow(self._ids, capacity)
+            self._labels = _grow(self._labels, capacity)
+            self._clusters = _grow(self._clusters, capacity)
+        row = self._size
+        self._vectors[row] = vector
+        self._ids[row] = item_id
+        self._labels[row] = code
+        self._clusters[row] = cluster
+        self._row_of[item_id] = row
+        self._size += 1
+
+    def _needs_clustering(self) -> bool:
+        # Recluster once the rows added or replaced since the last time reach
+        # a quarter of those clustered: they are gathered from all over the
+        # tail rather than scored as slices, and the centroids drift
+        if len(self._row_of) <= self.exact_max:
+            return False
+        clustered = int(self._offsets[-1])
+        return self._centroids is None or self._size - clustered > clustered // 4
+
+    def _cluster(self):
+        live = np.flatnonzero(self._labels[:self._size] >= 0)
+        vectors = self._vectors[live]
+        n_clusters = max(1, int(2 * np.sqrt(len(live))))
+        centroids = _spherical_kmeans(vectors, n_clusters, self._rng)
+        assignment = _nearest(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_clusters)
+
+        capacity = max(1024, len(self._vectors))
+        self._vectors = _grow(vectors[order], capacity)
+        self._ids = _grow(self._ids[live][order], capacity)
+        self._labels = _grow(self._labels[live][order], capacity)
+        self._clusters = _grow(assignment[order].astype(np.int32), capacity)
+        self._size = len(live)
+        self._row_of = {int(item_id): row for row, item_id in enumerate(self._ids[:self._size])}
+        self._centroids = centroids
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array[:capacity]
+    return grown
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1) for start in range(0, len(vectors), chunk)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+def _spherical_kmeans(vectors: np.ndarray, n_clusters: int, rng, iterations: int = 8,
+                      sample_per_cluster: int = 64) -> np.ndarray:
+    # Trained on a sample: clustering only has to be good enough to route
+    # queries, and a full k-means over 100k rows would take seconds
+    sample_size = min(len(vectors), n_clusters * sample_per_cluster)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.flatnonzero(~sums.any(axis=1))
+        sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids.astype(np.float32)
@@ -0,0 +1,90 @@
+"""
+Microbenchmark body cleaning (text_cleaning.split_body) on synthetic
+support replies that carry a quoted thread, a signature and a legal
+footer, and report how much text it keeps away from the sentiment model
+and the LLM prompt.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_clean_body
+    python -m benchmarks.bench_clean_body --thread-depths 0 2 8 --emails 500
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.services.text_cleaning import split_body
+from benchmarks.bench_e2e import FILLER, SUPPORT_TEMPLATES
+
+SIGNATURE = "--\nJane Doe\nOperations Lead | Example Corp\n+1 (555) 123-4567\nhttps://example.com\n"
+FOOTER = ("CONFIDENTIALITY NOTICE: This email and any attachments are intended only for the named "
+          "recipient and may contain privileged information. If you received it in error, delete it.\n")
+STYLES = ("gmail", "outlook", "mobile")
+
+
+def make_email(rng: random.Random, depth: int, max_sentences: int) -> str:
+    templates = list(SUPPORT_TEMPLATES.values())
+    reply = rng.choice(templates)[1] + " " + FILLER.format(n=rng.randint(1, 999)) * rng.randint(0, max_sentences - 1)
+    style = rng.choice(STYLES)
+    body = reply + "\n\n"
+    body += "Sent from my iPhone\n" if style == "mobile" else SIGNATURE
+    history = ""
+    for level in range(depth):
+        previous = rng.choice(templates)[1] + " " + FILLER.format(n=level) * rng.randint(1, max_sentences)
+        history = previous + "\n\n" + SIGNATURE + "\n" + history
+        if style == "outlook":
+            history = (f"________________________________\nFrom: Support <support@example.com>\n"
+                       f"Sent: Monday, January {level + 1}, 2024 10:00\nTo: Jane\nSubject: RE: ticket\n\n") + history
+        else:
+            history = (f"On Mon, Jan {level + 1}, 2024 at 10:00 AM Support <support@example.com> wrote:\n"
+                       + "".join("> " + line + "\n" for line in history.splitlines()))
+    if history:
+        body += "\n" + history
+    return body + "\n" + FOOTER
+
+
+def run(emails: int, depths, max_sentences: int, seed: int, repeat: int):
+    rows = []
+    for depth in depths:
+        rng = random.Random(seed)
+        bodies = [make_email(rng, depth, max_sentences) for _ in range(emails)]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = [split_body(body) for body in bodies]
+        elapsed = (time.perf_counter() - start) / repeat
+        raw_chars = sum(len(body) for body in bodies)
+        clean_chars = sum(len(text) for text, _ in results)
+        rows.append({
+            "thread_depth": depth,
+            "emails": emails,
+            "us_per_email": round(elapsed / emails * 1e6, 1),
+            "raw_chars_mean": round(raw_chars / emails),
+            "clean_chars_mean": round(clean_chars / emails),
+            "chars_removed": round(1 - clean_chars / raw_chars, 3),
+            # Share of the model's 512-character window that is the sender's own text
+            "model_window_own_text": round(
+                sum(min(len(text), 512) for text, _ in results) / sum(min(len(body), 512) for body in bodies), 3
+            ),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--thread-depths", type=int, nargs="+", default=[0, 1, 3, 6],
+                        help="quoted earlier messages per email")
+    parser.add_argument("--max-sentences", type=int, default=4,
+                        help="messages get 1..N sentences of filler text")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for row in run(args.emails, args.thread_depths, args.max_sentences, args.seed, args.repeat):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
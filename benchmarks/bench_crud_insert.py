@@ -0,0 +1,96 @@
+"""
+Compare crud.create_email (one commit per row) with crud.create_emails_bulk.
+
+Creates the schema in the given database, inserts the same synthetic
+emails through both paths and reports rows/sec. Point --database-url at a
+scratch PostgreSQL database for production-like numbers; it defaults to a
+temporary SQLite file. Run from the repository root:
+
+    python -m benchmarks.bench_crud_insert --rows 5000
+    python -m benchmarks.bench_crud_insert --database-url postgresql://user:pw@localhost/bench
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+
+
+def make_emails(rows: int, prefix: str):
+    return [
+        schemas.EmailCreate(
+            message_id=f"<{prefix}-{i}@bench.example.com>",
+            sender=f"customer{i}@example.com",
+            recipient="support@example.com",
+            subject=f"Help needed with order #{i}",
+            body="Hi team, I cannot log in to my account. Please help.\n" * 5,
+            date=datetime(2024, 1, 1, 12, 0, 0),
+            sentiment="negative",
+            sentiment_score=0.9,
+            urgency=3,
+            category="account",
+            extracted_info={"phone_numbers": [], "email_addresses": [], "urls": [],
+                            "important_keywords": ["account", "login"]},
+        )
+        for i in range(rows)
+    ]
+
+
+def run(database_url: str, rows: int, batch_size: int):
+    engine = create_engine(database_url)
+    models.Base.metadata.drop_all(bind=engine, tables=[models.Email.__table__])
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    results = []
+    with Session() as db:
+        emails = make_emails(rows, "per-row")
+        start = time.perf_counter()
+        for email in emails:
+            crud.create_email(db, email)
+        elapsed = time.perf_counter() - start
+        results.append({"path": "create_email", "rows": rows, "seconds": round(elapsed, 4),
+                        "rows_per_sec": round(rows / elapsed, 1)})
+
+        emails = make_emails(rows, "bulk")
+        start = time.perf_counter()
+        for i in range(0, rows, batch_size):
+            crud.create_emails_bulk(db, emails[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results.append({"path": "create_emails_bulk", "rows": rows, "batch_size": batch_size,
+                        "seconds": round(elapsed, 4), "rows_per_sec": round(rows / elapsed, 1)})
+
+        # Re-inserting the same batch must be a no-op rather than an error
+        start = time.perf_counter()
+        created = crud.create_emails_bulk(db, emails[:batch_size])
+        elapsed = time.perf_counter() - start
+        results.append({"path": "create_emails_bulk (all conflicts)", "rows": batch_size,
+                        "inserted": len(created), "seconds": round(elapsed, 4)})
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="emails per create_emails_bulk call (one ingest chunk)")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    for row in run(database_url, args.rows, args.batch_size):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+AI drafting throughput against the local LLM stand-in with injected
+latency (and optionally errors): the sequential path, one synchronous
+generate_response call after another, versus the DraftEngine at several
+concurrency levels.
+
+Stores synthetic support emails in a temporary SQLite database (or
+--database-url), drafts all of them with each method in turn and prints
+one JSON line per run with drafts/sec, drafts stored, LLM requests,
+injected errors, retries and the most requests the server saw at once.
+Run from the repository root:
+
+    python -m benchmarks.bench_drafting
+    python -m benchmarks.bench_drafting --emails 500 --llm-latency-ms 1000 --concurrency 16 64
+    python -m benchmarks.bench_drafting --error-rate 0.1 --methods engine
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import wait
+from datetime import datetime
+
+from app.config import settings
+from benchmarks.llm_server import LLMServer
+
+METHODS = ("sequential", "engine")
+CATEGORIES = ("Technical", "Billing", "Account", "General")
+
+
+def make_emails(n: int):
+    from app import schemas
+    return [
+        schemas.EmailCreate(
+            message_id=f"<draft-{i}@bench.example.com>",
+            sender=f"customer{i}@example.com",
+            recipient="support@example.com",
+            subject=f"Cannot login to my account (ticket {i})",
+            body="I reset my password but I still cannot login, my profile seems locked.\n" * 3,
+            date=datetime(2024, 1, 1, 12, 0, 0),
+            sentiment="NEGATIVE",
+            sentiment_score=0.9,
+            urgency=3,
+            category=CATEGORIES[i % len(CATEGORIES)],
+            extracted_info={"phone_numbers": [], "email_addresses": [], "urls": [],
+                            "important_keywords": ["login", "password"]},
+        )
+        for i in range(n)
+    ]
+
+
+def _reset(db):
+    from app import models
+    db.query(models.Email).update({models.Email.ai_response: None, models.Email.is_processed: False})
+    db.commit()
+
+
+def _drafted(db) -> int:
+    from app import models
+    return db.query(models.Email).filter(models.Email.ai_response.isnot(None),
+                                         models.Email.is_processed.is_(True)).count()
+
+
+def run_sequential(db, message_ids):
+    from app.database import SessionLocal
+    from app.drafting import prepare_draft, save_draft
+    from app.services.ai_service import generate_response
+
+    for message_id in message_ids:
+        session = SessionLocal()
+        try:
+            inputs = prepare_draft(session, message_id)
+            if inputs is not None:
+                email_id = inputs.pop("email_id")
+                save_draft(session, email_id, generate_response(**inputs))
+        finally:
+            session.close()
+    return {}
+
+
+def run_engine(db, message_ids, concurrency: int):
+    from app.drafting import DraftEngine
+
+    engine = DraftEngine(concurrency, name="bench-drafts")
+    try:
+        wait(engine.submit(message_ids))
+        stats = engine.stats()
+    finally:
+        engine.stop()
+    return {"concurrency": concurrency, "retries": stats["retries"], "failed": stats["failed"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of LLM requests failed with a 429 or 500")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    llm = LLMServer(latency_ms=args.llm_latency_ms, error_rate=args.error_rate).start()
+    database_url = args.database_url
+    if database_url is None:
+        fd, path = tempfile.mkstemp(prefix="bench-drafting-", suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    # Settings read at import time (engine, OpenAI client) must be set
+    # before the app is imported
+    settings.DATABASE_URL = database_url
+    settings.OPENAI_API_KEY = "sk-bench"
+    settings.OPENAI_BASE_URL = llm.base_url
+    settings.KB_SEARCH_BACKEND = "keyword"
+    # Every email is drafted by the LLM, not reused from the response cache
+    settings.RESPONSE_CACHE_SIZE = 0
+
+    from app import crud, models, schemas
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for category in CATEGORIES:
+            crud.create_knowledge_base_item(db, schemas.KnowledgeBaseCreate(
+                title=f"{category} FAQ", content="To unlock your account, reset your password and login again. " * 3,
+                category=category, tags=[category.lower()]))
+        message_ids = crud.create_emails_bulk(db, make_emails(args.emails))
+
+        runs = [("sequential", None)] if "sequential" in args.methods else []
+        if "engine" in args.methods:
+            runs += [("engine", concurrency) for concurrency in args.concurrency]
+        for method, concurrency in runs:
+            _reset(db)
+            llm.server.max_in_flight = 0
+            requests, errors = llm.requests, llm.errors
+            start = time.perf_counter()
+            if method == "sequential":
+                result = run_sequential(db, message_ids)
+            else:
+                result = run_engine(db, message_ids, concurrency)
+            elapsed = time.perf_counter() - start
+            db.expire_all()
+            print(json.dumps({
+                "method": method, **result, "emails": len(message_ids), "drafted": _drafted(db),
+                "seconds": round(elapsed, 3), "drafts_per_sec": round(len(message_ids) / elapsed, 1),
+                "llm_requests": llm.requests - requests, "injected_errors": llm.errors - errors,
+                "max_llm_in_flight": llm.max_in_flight, "llm_latency_ms": args.llm_latency_ms,
+            }))
+    finally:
+        db.close()
+        llm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+End-to-end ingestion benchmark against local IMAP, SMTP and LLM stand-ins.
+
+Seeds the IMAP stand-in with a synthetic support-mail corpus, points the
+app at it, at a fake OpenAI endpoint and at a fake SMTP server, then drives
+the real FastAPI app: POST /fetch-emails/, polls the ingest job, waits for
+the AI drafts and sends every response through POST
+/emails/{id}/send-response. Prints one JSON document with emails/sec,
+p50/p95 latency per stage and peak RSS, suitable for diffing between runs.
+Run from the repository root:
+
+    python -m benchmarks.bench_e2e --messages 1000
+    python -m benchmarks.bench_e2e --messages 5000 --newsletter-ratio 0.5 --llm-latency-ms 300 --output run.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from app.config import settings
+from benchmarks.imap_server import IMAPServer, Mailbox, make_message
+from benchmarks.llm_server import LLMServer
+from benchmarks.smtp_server import SMTPServer
+
+# (subject, body sentence) templates per support category
+SUPPORT_TEMPLATES = {
+    "billing": ("Refund for invoice #{n}",
+                "I was charged twice for my last payment and would like a refund of the extra charge."),
+    "technical": ("Error when uploading files (ticket {n})",
+                  "The app shows an error and the upload is not working since the last update."),
+    "account": ("Cannot login to my account",
+                "I reset my password but I still cannot login, my profile seems locked."),
+    "feature": ("Feature request: export to CSV",
+                "It would help us a lot if you could add an export feature, here is my suggestion."),
+    "general": ("Question about your plans",
+                "I have a question about what is included, could you help me with some information?"),
+}
+FILLER = ("We rely on your service every day for our team of twelve people. "
+          "Please call me at +1 555 010 {n:04d} or reply to this email. ")
+
+
+def build_corpus(messages: int, newsletter_ratio: float, attachment_ratio: float,
+                 attachment_bytes: int, max_sentences: int, seed: int) -> Mailbox:
+    """
+    Mailbox with ``messages`` emails: support mail spread evenly over the
+    categories with 1..max_sentences of body text, and ``newsletter_ratio``
+    of HTML newsletters. ``attachment_ratio`` of all messages carry a PDF.
+    """
+    rng = random.Random(seed)
+    mailbox = Mailbox()
+    categories = list(SUPPORT_TEMPLATES)
+    for i in range(messages):
+        attachment = attachment_bytes if rng.random() < attachment_ratio else 0
+        if rng.random() < newsletter_ratio:
+            mailbox.append(make_message(i, subject=f"Weekly deals #{i}", body="Our latest offers.\n",
+                                        sender="Deals <news@shop.example.com>", html=True,
+                                        attachment_bytes=attachment))
+            continue
+        subject, sentence = SUPPORT_TEMPLATES[categories[i % len(categories)]]
+        body = sentence + " " + FILLER.format(n=i) * rng.randint(0, max_sentences - 1)
+        mailbox.append(make_message(i, subject=subject.format(n=i), body=body + "\n",
+                                    attachment_bytes=attachment))
+    return mailbox
+
+
+class StageTimer:
+    """Collects wall-clock durations per stage from any thread."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage: str, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_async(self, stage: str, func):
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_iter(self, stage: str, func):
+        # Times each next() of a generator, i.e. the work to produce one item
+        def timed(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                self.record(stage, time.perf_counter() - start)
+                yield item
+        return timed
+
+    def count(self, stage: str) -> int:
+        with self.lock:
+            return len(self.samples[stage])
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[stage] = {
+                "count": len(ordered),
+                "total_ms": round(sum(ordered) * 1000, 2),
+                "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+                "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(_percentile(ordered, 95) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return result
+
+
+def _percentile(ordered, pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage / scale, 1), round(children / scale, 1)
+
+
+def _wait_for(predicate, timeout: float, interval: float = 0.05) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+def run(args) -> dict:
+    mailbox = build_corpus(args.messages, args.newsletter_ratio, args.attachment_ratio,
+                           args.attachment_bytes, args.max_sentences, args.seed)
+    imap = IMAPServer(mailbox, latency_ms=args.imap_latency_ms).start()
+    llm = LLMServer(latency_ms=args.llm_latency_ms).start()
+    smtp = SMTPServer(latency_ms=args.smtp_latency_ms).start()
+
+    database_url = args.database_url
+    if database_url is None:
+        fd, path = tempfile.mkstemp(prefix="bench-e2e-", suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    # Settings read at import time (engine, OpenAI client) must be set
+    # before the app is imported
+    settings.DATABASE_URL = database_url
+    settings.EMAIL_SERVER = "127.0.0.1"
+    settings.EMAIL_PORT = imap.port
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_USER = "bench@example.com"
+    settings.EMAIL_PASSWORD = "bench"
+    settings.EMAIL_WATCH_ENABLED = False
+    settings.EMAIL_INITIAL_SYNC_DAYS = 0
+    settings.SMTP_SERVER = "127.0.0.1"
+    settings.SMTP_PORT = smtp.port
+    settings.SMTP_USE_SSL = False
+    settings.OPENAI_API_KEY = "sk-bench"
+    settings.OPENAI_BASE_URL = llm.base_url
+    if args.chunk_size:
+        settings.EMAIL_FETCH_CHUNK_SIZE = args.chunk_size
+    if args.parse_workers is not None:
+        settings.EMAIL_PARSE_WORKERS = args.parse_workers
+    if args.draft_concurrency:
+        settings.DRAFT_CONCURRENCY = args.draft_concurrency
+
+    import_start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app import crud, drafting, ingest, models
+    from app.database import engine
+    from app.main import app
+    import_seconds = time.perf_counter() - import_start
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+    # Time each stage where app.ingest calls into the services
+    timer = StageTimer()
+    ingest.iter_email_chunks = timer.wrap_iter("fetch_chunk", ingest.iter_email_chunks)
+    ingest.parse_emails = timer.wrap("parse_chunk", ingest.parse_emails)
+    ingest.filter_support_emails = timer.wrap("filter_chunk", ingest.filter_support_emails)
+    crud.get_existing_message_ids = timer.wrap("dedupe_chunk", crud.get_existing_message_ids)
+    ingest.analyze_emails = timer.wrap("analyze_chunk", ingest.analyze_emails)
+    crud.create_emails_bulk = timer.wrap("persist_chunk", crud.create_emails_bulk)
+    drafting.prepare_draft = timer.wrap("draft_prepare", drafting.prepare_draft)
+    drafting.generate_response_async = timer.wrap_async("draft_llm", drafting.generate_response_async)
+    drafting.save_draft = timer.wrap("draft_save", drafting.save_draft)
+
+    result = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "database": engine.dialect.name,
+        "import_seconds": round(import_seconds, 3),
+    }
+    try:
+        with TestClient(app) as client:
+            for category, (subject, sentence) in SUPPORT_TEMPLATES.items():
+                client.post("/knowledge-base/", json={
+                    "title": f"{category.title()} FAQ", "content": sentence * 3,
+                    "category": category, "tags": [category],
+                })
+
+            start = time.perf_counter()
+            response = client.post("/fetch-emails/")
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+            job = None
+            while True:
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] in ("succeeded", "failed"):
+                    break
+                time.sleep(0.02)
+            ingest_seconds = time.perf_counter() - start
+
+            stored = job["counts"].get("stored", 0)
+            drafted = _wait_for(lambda: timer.count("draft_save") >= stored, args.draft_timeout)
+            drafts_seconds = time.perf_counter() - start
+
+            emails = []
+            while len(emails) < stored:
+                page = client.get("/emails/", params={"skip": len(emails), "limit": 500}).json()
+                if not page:
+                    break
+                emails.extend(page)
+            send_start = time.perf_counter()
+            sent = 0
+            for email in emails:
+                if not email["ai_response"]:
+                    continue
+                t0 = time.perf_counter()
+                ok = client.post(f"/emails/{email['id']}/send-response").status_code == 200
+                timer.record("send_email", time.perf_counter() - t0)
+                sent += ok
+            send_seconds = time.perf_counter() - send_start
+            total_seconds = time.perf_counter() - start
+    finally:
+        imap.stop()
+        llm.stop()
+        smtp.stop()
+
+    rss, children_rss = _peak_rss_mb()
+    result.update({
+        "job_status": job["status"],
+        "job_errors": job["errors"],
+        "counts": job["counts"],
+        "drafts_complete": drafted,
+        "llm_requests": llm.requests,
+        "smtp_messages": len(smtp.messages),
+        "sent": sent,
+        "seconds": {
+            "ingest": round(ingest_seconds, 3),
+            "ingest_and_drafts": round(drafts_seconds, 3),
+            "send": round(send_seconds, 3),
+            "total": round(total_seconds, 3),
+        },
+        "emails_per_sec": {
+            # Mailbox messages fetched per second of ingest, and stored
+            # support emails per second through drafting and sending
+            "fetched": round(job["counts"].get("messages", 0) / ingest_seconds, 1) if ingest_seconds else None,
+            "ingested": round(stored / ingest_seconds, 1) if ingest_seconds else None,
+            "end_to_end": round(sent / total_seconds, 1) if total_seconds else None,
+        },
+        "stages": timer.summary(),
+        "peak_rss_mb": rss,
+        "peak_children_rss_mb": children_rss,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--newsletter-ratio", type=float, default=0.3,
+                        help="fraction of non-support newsletters in the mailbox")
+    parser.add_argument("--attachment-ratio", type=float, default=0.1,
+                        help="fraction of messages carrying a PDF attachment")
+    parser.add_argument("--attachment-bytes", type=int, default=200_000)
+    parser.add_argument("--max-sentences", type=int, default=8,
+                        help="support bodies get 1..N sentences of filler text")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--imap-latency-ms", type=float, default=2.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--smtp-latency-ms", type=float, default=1.0)
+    parser.add_argument("--chunk-size", type=int, default=None, help="override EMAIL_FETCH_CHUNK_SIZE")
+    parser.add_argument("--parse-workers", type=int, default=None, help="override EMAIL_PARSE_WORKERS")
+    parser.add_argument("--draft-concurrency", type=int, default=None, help="override DRAFT_CONCURRENCY")
+    parser.add_argument("--draft-timeout", type=float, default=600.0,
+                        help="seconds to wait for the AI drafts after ingest")
+    parser.add_argument("--database-url", default=None,
+                        help="database to benchmark against (default: temporary SQLite file)")
+    parser.add_argument("--output", default=None, help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, default=str)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark entity extraction: the single precompiled scanner
+(nlp_service.scan_entities) versus one ``re.findall`` pass per entity type
+(the previous implementation, reproduced here). Covers ordinary support
+mail of several sizes and a body with a large base64 attachment pasted
+inline, where the scan length limit applies.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_entities
+    python -m benchmarks.bench_entities --sizes 500 5000 --blob-kb 64 512
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import time
+
+from app.services.nlp_service import scan_entities
+
+SENTENCES = [
+    "Hi, my order still has not arrived and the tracking page at https://shop.example.com/track?id=8812 is blank. ",
+    "You can call me on (555) 123-4567 or email jane.doe@example.com if that is easier. ",
+    "I already tried resetting the app and reinstalling it, no luck so far. ",
+    "Our office line is 555.987.6543, ask for the design department. ",
+    "The docs at http://help.example.org/faq/shipping did not cover this case. ",
+    "Thanks in advance for looking into it. ",
+]
+
+
+def previous_extract(text: str):
+    return (
+        re.findall(r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}', text),
+        re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text),
+        re.findall(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[/\w\.-=&%]*\??[/\w\.-=&%]*', text),
+    )
+
+
+def make_text(size: int) -> str:
+    text = ""
+    i = 0
+    while len(text) < size:
+        text += SENTENCES[i % len(SENTENCES)]
+        i += 1
+    return text[:size]
+
+
+def make_blob_text(kilobytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    blob = base64.encodebytes(rng.randbytes(kilobytes * 1024)).decode()
+    return make_text(600) + "\n\n" + blob + "\n" + make_text(300)
+
+
+def _time(func, text: str, min_seconds: float) -> float:
+    start = time.perf_counter()
+    func(text)
+    once = max(time.perf_counter() - start, 1e-6)
+    repeat = max(1, int(min_seconds / once))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def run(sizes, blob_kbs, min_seconds: float):
+    cases = [(f"mail_{size}", make_text(size)) for size in sizes]
+    cases += [(f"base64_{kb}kb", make_blob_text(kb)) for kb in blob_kbs]
+    rows = []
+    for name, text in cases:
+        previous = _time(previous_extract, text, min_seconds)
+        combined = _time(scan_entities, text, min_seconds)
+        found = scan_entities(text)
+        rows.append({
+            "case": name,
+            "body_chars": len(text),
+            "previous_matches": sum(len(matches) for matches in previous_extract(text)),
+            "unique_entities": sum(len(values) for values in found.values()),
+            "previous_us": round(previous * 1e6, 1),
+            "combined_us": round(combined * 1e6, 1),
+            "speedup": round(previous / combined, 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 2000, 20000],
+                        help="body lengths in characters")
+    parser.add_argument("--blob-kb", type=int, nargs="+", default=[64, 1024],
+                        help="sizes of the inline base64 attachment")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="time spent per measurement")
+    args = parser.parse_args()
+
+    for row in run(args.sizes, args.blob_kb, args.min_seconds):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
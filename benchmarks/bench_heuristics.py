@@ -0,0 +1,214 @@
+"""
+Microbenchmark suite for the per-email NLP and filtering functions.
+
+Times analyze_sentiment, extract_entities, detect_urgency,
+categorize_email, is_support_email and split_body over a fixed synthetic
+corpus (short, long, multilingual and adversarial regex inputs) and reports
+ns/op and the peak memory allocated during one call (tracemalloc) for every
+function and input. Results can be saved as a baseline, and compared
+against one: any ns/op or allocation figure more than --threshold above
+the baseline is flagged and the exit status is 1, so it can gate CI.
+Run from the repository root:
+
+    python -m benchmarks.bench_heuristics
+    python -m benchmarks.bench_heuristics --save benchmarks/data/heuristics_baseline.json
+    python -m benchmarks.bench_heuristics --compare benchmarks/data/heuristics_baseline.json --threshold 0.2
+
+analyze_sentiment runs the sentiment model when it can be loaded and the
+keyword fallback otherwise; which one was measured is recorded with the
+results, and --skip-model leaves it out. Micro-batching is disabled so a
+lone call does not include the batching wait.
+"""
+
+import argparse
+import base64
+import json
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+
+from benchmarks.bench_clean_body import make_email
+
+FUNCTIONS = ("analyze_sentiment", "extract_entities", "detect_urgency", "categorize_email",
+             "is_support_email", "split_body")
+
+MULTILINGUAL = (
+    "Guten Tag, ich kann mich seit gestern nicht mehr anmelden, das Passwort wird abgelehnt. "
+    "Bitte rufen Sie mich an: (030) 555-1234 oder schreiben Sie an m.mueller@beispiel.de.\n"
+    "Bonjour, la facture de mars est incorrecte, merci de me rembourser rapidement. "
+    "Voir https://exemple.fr/factures/2024-03 pour le détail.\n"
+    "Hola, la aplicación muestra un error al subir archivos, es urgente.\n"
+    "こんにちは、ログインできません。至急ご連絡ください。support@example.jp\n"
+    "Здравствуйте, у меня проблема с оплатой, счёт выставлен дважды. Телефон 495 555 0199.\n"
+)
+
+
+def build_corpus(seed: int = 7):
+    """
+    Fixed (subject, body) inputs by name. Same seed, same corpus, so
+    results are comparable between runs and machines.
+    """
+    rng = random.Random(seed)
+    blob = base64.encodebytes(rng.randbytes(48 * 1024)).decode()
+    return {
+        "short": ("Cannot login", "I cannot login to my account since this morning, please help asap."),
+        "medium": ("Refund for invoice #4411", make_email(rng, 1, 4)),
+        "long_thread": ("RE: RE: upload errors", make_email(rng, 8, 8)),
+        "multilingual": ("Problème / Problem / 問題", MULTILINGUAL * 3),
+        "base64_blob": ("Logs attached", "Here are the logs, it keeps crashing.\n\n" + blob),
+        "digit_run": ("Order numbers", "My order ids: " + "5" * 20000),
+        "at_signs": ("Weird", "a@" * 10000),
+        "dotted_local_parts": ("Weird", "a." * 10000 + "@example.com"),
+        "deep_quotes": ("RE: thread", "Still broken.\n" + "".join(">" * (i % 20 + 1) + " old text\n" for i in range(2000))),
+        "url_run": ("Links", "See http://" + "a-" * 10000 + " and " + "http://x.io/" * 500),
+    }
+
+
+def _callables(skip_model: bool):
+    from app.services.email_service import categorize_email, is_support_email
+    from app.services.nlp_service import analyze_sentiment, detect_urgency, extract_entities
+    from app.services.text_cleaning import split_body
+
+    funcs = {
+        "analyze_sentiment": lambda subject, body: analyze_sentiment(body),
+        "extract_entities": lambda subject, body: extract_entities(body),
+        "detect_urgency": lambda subject, body: detect_urgency(body),
+        "categorize_email": lambda subject, body: categorize_email(subject, body),
+        "is_support_email": lambda subject, body: is_support_email(subject, body),
+        "split_body": lambda subject, body: split_body(body),
+    }
+    if skip_model:
+        del funcs["analyze_sentiment"]
+    return funcs
+
+
+def _ns_per_op(func, subject: str, body: str, min_seconds: float, repeat: int) -> float:
+    timer = timeit.Timer(lambda: func(subject, body))
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_seconds / repeat or number >= 1_000_000:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_seconds / repeat / elapsed) + 1))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+def _alloc_peak_bytes(func, subject: str, body: str) -> int:
+    func(subject, body)  # caches and lazy imports out of the way
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func(subject, body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def environment(skip_model: bool):
+    from app.services import nlp_service
+
+    env = {"python": platform.python_version(), "implementation": platform.python_implementation(),
+           "machine": platform.machine(), "platform": platform.platform(terse=True)}
+    if not skip_model:
+        nlp_service.warmup()
+        state = nlp_service.model_status()["sentiment"]
+        env["sentiment"] = {"status": state["status"], "model": state["model"],
+                            "inference_mode": state["inference_mode"]}
+    return env
+
+
+def run(functions, cases, min_seconds: float, repeat: int, skip_model: bool):
+    from app.config import settings
+
+    settings.NLP_MICROBATCH = False
+    corpus = build_corpus()
+    funcs = _callables(skip_model)
+    results = {}
+    env = environment(skip_model)
+    for name in functions:
+        if name not in funcs:
+            continue
+        for case in cases:
+            subject, body = corpus[case]
+            results[f"{name}/{case}"] = {
+                "ns_per_op": round(_ns_per_op(funcs[name], subject, body, min_seconds, repeat)),
+                "alloc_peak_bytes": _alloc_peak_bytes(funcs[name], subject, body),
+                "input_chars": len(body),
+            }
+    return {"environment": env, "results": results}
+
+
+def compare(current, baseline, threshold: float):
+    """
+    Rows of current vs baseline figures; ``regression`` is set where a
+    figure grew by more than ``threshold`` (0.1 = 10%)
+    """
+    rows = []
+    for key, now in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            rows.append({"benchmark": key, "status": "new", **now})
+            continue
+        row = {"benchmark": key}
+        regressed = []
+        for metric in ("ns_per_op", "alloc_peak_bytes"):
+            old, new = before[metric], now[metric]
+            change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+            row[metric] = new
+            row[f"{metric}_baseline"] = old
+            row[f"{metric}_change"] = round(change, 3)
+            # A few hundred bytes either way is interpreter noise, not a regression
+            if change > threshold and not (metric == "alloc_peak_bytes" and new - old < 1024):
+                regressed.append(metric)
+        row["status"] = "regression" if regressed else "ok"
+        row["regressed"] = regressed
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--functions", nargs="+", default=list(FUNCTIONS), choices=FUNCTIONS)
+    parser.add_argument("--cases", nargs="+", default=list(build_corpus()), choices=list(build_corpus()))
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="approximate time spent timing each function/input pair")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds, the fastest is reported")
+    parser.add_argument("--skip-model", action="store_true", help="leave analyze_sentiment out")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative increase over the baseline flagged as a regression")
+    args = parser.parse_args()
+
+    current = run(args.functions, args.cases, args.min_seconds, args.repeat, args.skip_model)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if not args.compare:
+        for key, row in current["results"].items():
+            print(json.dumps({"benchmark": key, **row}))
+        return
+
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != current["environment"]:
+        print(json.dumps({"warning": "environment differs from the baseline's",
+                          "baseline": baseline.get("environment"), "current": current["environment"]}),
+              file=sys.stderr)
+    rows = compare(current, baseline, args.threshold)
+    for row in rows:
+        print(json.dumps(row))
+    regressions = [row["benchmark"] for row in rows if row["status"] == "regression"]
+    print(json.dumps({"compared": len(rows), "threshold": args.threshold, "regressions": regressions}))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
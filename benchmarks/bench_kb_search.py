@@ -0,0 +1,170 @@
+"""
+Knowledge base retrieval latency by knowledge base size: the keyword scan
+over article objects (search_knowledge_base without an index), the BM25
+inverted index over the same articles, and a VectorIndex top-k over the
+same number of embeddings.
+
+Articles draw their words from a Zipf-distributed vocabulary, as real text
+does. Embeddings are synthetic unit vectors drawn around a few thousand
+topic centres, so the vector index is timed without loading a model;
+recall@k is measured against exhaustive search. Embedding the query with
+the model is not included (see KnowledgeIndex.encode). Run from the
+repository root:
+
+    python -m benchmarks.bench_kb_search
+    python -m benchmarks.bench_kb_search --sizes 1000 100000 --nprobe 4 8 16
+    python -m benchmarks.bench_kb_search --methods bm25
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.config import settings
+from app.services.bm25_index import BM25Index
+from app.services.vector_index import VectorIndex
+
+WORDS = ("account", "password", "reset", "invoice", "refund", "billing", "upload", "error", "login",
+         "subscription", "plan", "export", "api", "token", "timeout", "sync", "mobile", "browser")
+CATEGORIES = ("Technical", "Billing", "Account", "General")
+METHODS = ("keyword", "bm25", "vector")
+VOCABULARY = list(WORDS) + [f"term{i}" for i in range(30000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 10) for rank in range(len(VOCABULARY))))
+
+
+def make_articles(n: int, rng: random.Random):
+    return [SimpleNamespace(id=i, title=" ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=4)),
+                            content=" ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=150)),
+                            category=CATEGORIES[i % 4], tags=[]) for i in range(n)]
+
+
+def make_queries(count: int, rng: random.Random):
+    return [" ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=6)) for _ in range(count)]
+
+
+def make_vectors(n: int, dim: int, queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(1, n // 50), dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, len(topics), n)] + rng.normal(scale=0.8, size=(n, dim)).astype(np.float32)
+    query = topics[rng.integers(0, len(topics), queries)] + rng.normal(scale=0.8, size=(queries, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query /= np.linalg.norm(query, axis=1, keepdims=True)
+    return vectors, query
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return round(latencies[len(latencies) // 2] * 1000, 3), round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+
+
+def run_keyword(n: int, queries: int, seed: int):
+    from app.services.ai_service import search_knowledge_base
+
+    settings.KB_SEARCH_BACKEND = "keyword"
+    rng = random.Random(seed)
+    articles = make_articles(n, rng)
+    latencies = []
+    for query in make_queries(queries, rng):
+        start = time.perf_counter()
+        search_knowledge_base(query, articles)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = _percentiles(latencies)
+    return {"kb_size": n, "method": "keyword_scan", "p50_ms": p50, "p99_ms": p99}
+
+
+def run_bm25(n: int, queries: int, k: int, seed: int):
+    rng = random.Random(seed)
+    articles = make_articles(n, rng)
+    index = BM25Index()
+    start = time.perf_counter()
+    index.build(articles)
+    build = time.perf_counter() - start
+
+    latencies = []
+    for query in make_queries(queries, rng):
+        start = time.perf_counter()
+        index.query(query, k)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = _percentiles(latencies)
+
+    start = time.perf_counter()
+    index.add([make_articles(1, rng)[0]])
+    update = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "kb_bm25.index")
+        start = time.perf_counter()
+        index.save(path)
+        save = time.perf_counter() - start
+        start = time.perf_counter()
+        BM25Index().load(path)
+        load = time.perf_counter() - start
+        size = os.path.getsize(path)
+    stats = index.stats()
+    return {"kb_size": n, "method": "bm25", "p50_ms": p50, "p99_ms": p99, "terms": stats["terms"],
+            "postings": stats["postings"], "update_ms": round(update * 1000, 3), "build_seconds": round(build, 2),
+            "save_seconds": round(save, 2), "load_seconds": round(load, 2), "file_mb": round(size / 2**20, 1)}
+
+
+def run_index(n: int, dim: int, queries: int, k: int, nprobes, seed: int):
+    vectors, query = make_vectors(n, dim, queries, seed)
+    labels = [CATEGORIES[i % 4] for i in range(n)]
+    index = VectorIndex(dim, exact_max=settings.KB_INDEX_EXACT_MAX)
+    start = time.perf_counter()
+    for offset in range(0, n, 1000):
+        index.upsert(list(range(offset, min(n, offset + 1000))), vectors[offset:offset + 1000], labels[offset:offset + 1000])
+    build = time.perf_counter() - start
+    exact = [set(np.argsort(-(vectors @ q))[:k].tolist()) for q in query]
+
+    rows = []
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        latencies = []
+        found = 0
+        for q, truth in zip(query, exact):
+            start = time.perf_counter()
+            hits = index.search(q, k)
+            latencies.append(time.perf_counter() - start)
+            found += len(truth & {item_id for item_id, _ in hits})
+        p50, p99 = _percentiles(latencies)
+        start = time.perf_counter()
+        index.upsert([n], query[:1], [CATEGORIES[0]])
+        rows.append({
+            "kb_size": n, "method": "vector_index", "nprobe": nprobe, "clusters": index.stats()["clusters"],
+            "p50_ms": p50, "p99_ms": p99, f"recall@{k}": round(found / (k * len(query)), 3),
+            "incremental_add_ms": round((time.perf_counter() - start) * 1000, 3),
+            "build_seconds": round(build, 2),
+        })
+        index.remove(n)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384, help="embedding size (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[settings.KB_INDEX_NPROBE])
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        if "keyword" in args.methods:
+            print(json.dumps(run_keyword(n, min(args.queries, 20), args.seed)))
+        if "bm25" in args.methods:
+            print(json.dumps(run_bm25(n, args.queries, args.k, args.seed)))
+        if "vector" in args.methods:
+            for row in run_index(n, args.dim, args.queries, args.k, args.nprobe, args.seed):
+                print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Microbenchmark the keyword heuristics: one shared keyword scan per email
+versus each heuristic lowercasing and running its own ``keyword in text``
+loop (the previous implementation, reproduced here from the same tables).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_keywords
+    python -m benchmarks.bench_keywords --sizes 200 2000 50000
+"""
+
+import argparse
+import json
+import time
+
+from app.services import keywords
+from app.services.email_service import categorize_email, is_support_email
+from app.services.nlp_service import _fallback_sentiment, detect_urgency, extract_important_keywords
+
+CORPORA = {
+    # Nearly every sentence hits several keywords
+    "dense": [
+        "Hi team, I have a problem with my account and cannot login since yesterday. ",
+        "The invoice shows a charge I do not recognise, please refund it asap. ",
+        "We appreciate the quick help last time, thanks again. ",
+        "On Tue someone wrote: the export is not working and throws an error. ",
+        "Our whole office relies on this so it is important to fix it soon. ",
+    ],
+    # Ordinary prose with few keyword hits, so most lookups scan everything
+    "plain": [
+        "Hello, I ordered a laptop last week and it arrived yesterday. ",
+        "The screen flickers when I open the lid, even after restarting. ",
+        "I already updated the drivers and reset the display settings. ",
+        "Could you tell me how to get a replacement sent to my office? ",
+        "Kind regards, Jane from the design department. ",
+    ],
+}
+
+
+def make_text(size: int, corpus: str = "dense") -> str:
+    sentences = CORPORA[corpus]
+    text = ""
+    i = 0
+    while len(text) < size:
+        text += sentences[i % len(sentences)]
+        i += 1
+    return text[:size]
+
+
+def per_heuristic_scans(subject: str, body: str):
+    content = (subject + " " + body).lower()
+    support = any(keyword in content for keyword in keywords.SUPPORT_KEYWORDS)
+    category = "general"
+    for name, category_keywords in keywords.CATEGORY_KEYWORDS.items():
+        if any(keyword in content for keyword in category_keywords):
+            category = name
+            break
+    body_lower = body.lower()
+    important = [keyword for keyword in keywords.IMPORTANT_KEYWORDS if keyword in body_lower]
+    body_lower = body.lower()
+    urgency = max([level for keyword, level in keywords.URGENCY_KEYWORDS.items() if keyword in body_lower] + [1])
+    body_lower = body.lower()
+    positive = sum(1 for word in keywords.POSITIVE_WORDS if word in body_lower)
+    negative = sum(1 for word in keywords.NEGATIVE_WORDS if word in body_lower)
+    return support, category, important, urgency, positive - negative
+
+
+def shared_scan(subject: str, body: str):
+    scan = keywords.scan_keywords(body, subject)
+    return (is_support_email(subject, body, scan), categorize_email(subject, body, scan),
+            extract_important_keywords(body, scan), detect_urgency(body, scan), _fallback_sentiment(body, scan))
+
+
+def _time(func, subject: str, body: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(subject, body)
+    return (time.perf_counter() - start) / repeat
+
+
+def run(sizes, corpora, min_seconds: float):
+    subject = "Help needed with order #123"
+    rows = []
+    for corpus in corpora:
+        for size in sizes:
+            body = make_text(size, corpus)
+            assert shared_scan(subject, body)[:4] == per_heuristic_scans(subject, body)[:4]
+            repeat = max(1, int(min_seconds / max(_time(per_heuristic_scans, subject, body, 1), 1e-6)))
+            baseline = _time(per_heuristic_scans, subject, body, repeat)
+            shared = _time(shared_scan, subject, body, repeat)
+            rows.append({
+                "corpus": corpus,
+                "body_chars": size,
+                "keywords": len(keywords._all_keywords()),
+                "per_heuristic_us": round(baseline * 1e6, 1),
+                "shared_scan_us": round(shared * 1e6, 1),
+                "speedup": round(baseline / shared, 2),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000, 50000],
+                        help="body lengths in characters")
+    parser.add_argument("--corpora", nargs="+", default=list(CORPORA), choices=list(CORPORA))
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="time spent per measurement")
+    args = parser.parse_args()
+
+    for row in run(args.sizes, args.corpora, args.min_seconds):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
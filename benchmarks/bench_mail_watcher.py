@@ -0,0 +1,88 @@
+"""
+Measure new-mail delivery latency of the mailbox watcher.
+
+Starts a local IMAP stand-in, keeps one MailboxWatcher session open against
+it and appends messages one at a time, timing how long each takes to reach
+the ingest callback. Run from the repository root:
+
+    python -m benchmarks.bench_mail_watcher --mode idle
+    python -m benchmarks.bench_mail_watcher --mode noop --poll-interval 1
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from app.config import settings
+from app.services.email_service import fetch_emails
+from app.services.mail_watcher import MailboxWatcher
+from benchmarks.imap_server import IMAPServer, Mailbox, make_message
+
+
+def run(mode: str, messages: int, poll_interval: float, drop_after: int = None):
+    mailbox = Mailbox()
+    server = IMAPServer(mailbox, idle=(mode == "idle")).start()
+    settings.EMAIL_SERVER = "127.0.0.1"
+    settings.EMAIL_PORT = server.port
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_POLL_INTERVAL = poll_interval
+
+    checkpoint = {}
+    delivered = {}
+    arrived = threading.Condition()
+
+    def on_new_mail(mail):
+        emails, new_checkpoint = fetch_emails(checkpoint=checkpoint or None, mail=mail)
+        checkpoint.update(new_checkpoint)
+        with arrived:
+            for email_data in emails:
+                delivered[email_data["message_id"]] = time.perf_counter()
+            arrived.notify_all()
+
+    watcher = MailboxWatcher(on_new_mail, idle_timeout=30)
+    watcher.start()
+    time.sleep(0.5)
+
+    latencies = []
+    try:
+        for i in range(messages):
+            if drop_after is not None and i == drop_after:
+                # Kill the session server-side to exercise reconnects
+                watcher._mail.shutdown()
+            sent = time.perf_counter()
+            mailbox.append(make_message(i))
+            message_id = f"<bench-{i}@example.com>"
+            with arrived:
+                arrived.wait_for(lambda: message_id in delivered, timeout=30)
+            if message_id in delivered:
+                latencies.append(delivered[message_id] - sent)
+    finally:
+        watcher.stop()
+        server.stop()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "messages": messages,
+        "delivered": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["idle", "noop"], default="idle")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="NOOP polling interval in seconds (noop mode)")
+    parser.add_argument("--drop-after", type=int, default=None,
+                        help="drop the IMAP connection before this message")
+    args = parser.parse_args()
+    print(json.dumps(run(args.mode, args.messages, args.poll_interval, args.drop_after)))
+
+
+if __name__ == "__main__":
+    main()
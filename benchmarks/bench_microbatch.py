@@ -0,0 +1,112 @@
+"""
+Benchmark sentiment throughput under concurrent callers, with and without
+the micro-batching worker (NLP_MICROBATCH).
+
+Each of N threads calls nlp_service.analyze_sentiment once per email, the
+way API requests and background jobs do. With micro-batching the calls are
+coalesced into shared forward passes, so throughput should grow with the
+number of concurrent callers; without it every call is its own forward
+pass. Reports emails/sec, per-call p50/p95 latency and the batcher's batch
+size and queue depth histograms. Run from the repository root:
+
+    python -m benchmarks.bench_microbatch --emails 512
+    python -m benchmarks.bench_microbatch --callers 1 4 16 64 --max-wait-ms 2 5 10
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from benchmarks.bench_sentiment_batch import make_texts
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_callers(texts, callers: int):
+    from app.services import nlp_service
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(share):
+        local = []
+        for text in share:
+            start = time.perf_counter()
+            nlp_service.analyze_sentiment(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(texts[i::callers],)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def run(emails: int, callers_list, max_waits, max_batch_size: int, max_sentences: int, seed: int):
+    from app.config import settings
+    from app.services import nlp_service
+    from app.services.batching import MicroBatcher
+
+    if nlp_service.get_sentiment_analyzer() is None:
+        sys.exit("Sentiment model could not be loaded, nothing to benchmark")
+    nlp_service.warmup()
+    texts = make_texts(emails, max_sentences, seed)
+
+    configs = [("direct", None)] + [("microbatch", wait) for wait in max_waits]
+    rows = []
+    for callers in callers_list:
+        for mode, max_wait in configs:
+            settings.NLP_MICROBATCH = mode == "microbatch"
+            batcher = None
+            if settings.NLP_MICROBATCH:
+                nlp_service.sentiment_batcher.stop()
+                batcher = nlp_service.sentiment_batcher = MicroBatcher(
+                    nlp_service._predict_sentiment, max_batch_size, max_wait, name="sentiment-batcher"
+                )
+            elapsed, latencies = run_callers(texts, callers)
+            row = {
+                "mode": mode,
+                "callers": callers,
+                "max_wait_ms": max_wait,
+                "emails": emails,
+                "emails_per_sec": round(emails / elapsed, 1),
+                "latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+                "latency_p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            }
+            if batcher is not None:
+                stats = batcher.stats()
+                row.update(mean_batch_size=stats["mean_batch_size"], errors=stats["errors"],
+                           batch_size_histogram=stats["batch_size_histogram"],
+                           queue_depth_histogram=stats["queue_depth_histogram"])
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=512)
+    parser.add_argument("--callers", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="concurrent calling threads")
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[5.0])
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-sentences", type=int, default=8,
+                        help="bodies get 1..N sentences of filler text")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for row in run(args.emails, args.callers, args.max_wait_ms, args.max_batch_size,
+                   args.max_sentences, args.seed):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark email_service.parse_emails with different process pool sizes.
+
+Parses a fixed synthetic backlog of raw RFC822 messages (plain, HTML
+alternative, base64 and attachment-bearing) and reports messages/sec and
+speedup over in-process parsing for each worker count. Run from the
+repository root:
+
+    python -m benchmarks.bench_parse_pool --messages 5000 --workers 0 2 4 8
+"""
+
+import argparse
+import json
+import os
+import time
+from email.message import EmailMessage
+
+from app.services.email_service import parse_emails, shutdown_parse_pool
+from benchmarks.imap_server import make_message
+
+
+def build_backlog(messages: int, attachment_bytes: int):
+    backlog = []
+    for i in range(messages):
+        kind = i % 4
+        if kind == 0:
+            raw = make_message(i)
+        elif kind == 1:
+            raw = make_message(i, html=True)
+        elif kind == 2:
+            raw = make_message(i, html=True, attachment_bytes=attachment_bytes)
+        else:
+            msg = EmailMessage()
+            msg["From"] = f"=?utf-8?q?Cl=C3=A9ment_{i}?= <client{i}@example.fr>"
+            msg["To"] = "support@example.com"
+            msg["Subject"] = f"Problème de connexion {i}"
+            msg["Message-ID"] = f"<bench-b64-{i}@example.fr>"
+            msg.set_content("Bonjour, je n'arrive pas à me connecter depuis hier.\n" * 20,
+                            charset="utf-8", cte="base64")
+            raw = msg.as_bytes()
+        backlog.append((i + 1, raw))
+    return backlog
+
+
+def run(messages: int, workers_list, attachment_bytes: int, repeat: int):
+    backlog = build_backlog(messages, attachment_bytes)
+    results = []
+    baseline = None
+    for workers in workers_list:
+        # First call spawns the pool; keep that out of the measurement
+        parse_emails(backlog[:workers * 2], workers=workers)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parsed = parse_emails(backlog, workers=workers)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        assert len(parsed) == len(backlog)
+        rate = len(backlog) / best
+        baseline = baseline or rate
+        results.append({
+            "workers": workers,
+            "messages": len(backlog),
+            "seconds": round(best, 4),
+            "messages_per_sec": round(rate, 1),
+            "speedup": round(rate / baseline, 2),
+        })
+        shutdown_parse_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=4000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({0, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--attachment-bytes", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for row in run(args.messages, args.workers, args.attachment_bytes, args.repeat):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Draft reuse by the response cache on a synthetic incident flood: a few
+outage reports, each sent by many customers with their own names, times,
+ticket numbers and sign-offs (some with a phone number, which ends up in
+the extracted info and so in the cache key), mixed with unrelated one-off
+emails.
+
+For each --max-distance (0 = exact matches only) prints one JSON line with
+the LLM calls left, hit rates, tokens and LLM seconds saved (each call
+costing the tokens of its prompt plus a typical draft and
+--llm-latency-ms), lookup latency, and wrong reuses: hits on a draft made
+for a different report. Run from the repository root:
+
+    python -m benchmarks.bench_response_cache
+    python -m benchmarks.bench_response_cache --emails 5000 --max-distance 0 4 8 12
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.services.response_cache import ResponseCache
+
+NAMES = ("Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy", "Mallory", "Olivia")
+COMPANIES = ("Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne")
+INCIDENTS = (
+    ("Website is down", "Your website has been returning a 502 error since {time} and none of our team can log "
+     "in to the dashboard. We have customers waiting, please tell us when it will be fixed."),
+    ("Payments failing", "Every card payment on our checkout fails with an error since {time}. We are losing "
+     "orders, is there an outage on your side? Please let us know as soon as possible."),
+    ("Emails not delivered", "Since {time} none of the notification emails we send through your service "
+     "arrive. Our customers are not getting their receipts, can you look into this urgently?"),
+    ("API timeouts", "All requests to your API time out since {time}, our integration is completely broken. "
+     "Is this a known incident and is there a workaround we can use meanwhile?"),
+)
+SIGN_OFFS = ("Thanks,", "Regards,", "Best,", "Cheers,", "Thank you,")
+WORDS = ("account", "invoice", "export", "report", "profile", "settings", "upload", "browser", "plan",
+         "upgrade", "password", "mobile", "sync", "calendar", "team", "billing", "refund", "feature")
+# Pseudo-words, so one-off emails rarely share much of their wording
+VOCABULARY = list(WORDS) + ["".join(random.Random(i).choices("abcdefghijklmnopqrstuvwxyz", k=7)) for i in range(5000)]
+PROMPT_TOKENS = 250  # the prompt around an email, roughly
+DRAFT_TOKENS = 150
+
+
+def make_emails(n: int, incident_ratio: float, rng: random.Random, phone_ratio: float = 0.0):
+    emails = []
+    for i in range(n):
+        name, company = rng.choice(NAMES), rng.choice(COMPANIES)
+        phone = f"+1 555 {rng.randrange(10**7):07d}" if rng.random() < phone_ratio else None
+        if rng.random() < incident_ratio:
+            label = rng.randrange(len(INCIDENTS))
+            subject, body = INCIDENTS[label]
+            subject = rng.choice((subject, subject + "!", "URGENT: " + subject, f"{subject} ({company})"))
+            body = (f"Hi support,\n\nthis is {name} from {company} (ticket {rng.randrange(10**6)}). "
+                    + body.format(time=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+                    + f"\n\n{rng.choice(SIGN_OFFS)}\n{name}" + (f"\n{phone}" if phone else ""))
+        else:
+            label = None
+            subject = " ".join(rng.choices(VOCABULARY, k=4))
+            body = f"Hi,\n\n{' '.join(rng.choices(VOCABULARY, k=40))}\n\n{name}"
+        info = {"phone_numbers": [phone] if phone else [], "email_addresses": [], "urls": [],
+                "important_keywords": ["urgent"] if "urgent" in body.lower() else []}
+        emails.append((label, subject, body, info))
+    return emails
+
+
+def run(emails, max_distance: int, llm_latency_ms: float):
+    cache = ResponseCache(max_entries=10000, ttl=3600, max_distance=max_distance)
+    wrong = 0
+    calls = 0
+    latencies = []
+    for i, (label, subject, body, info) in enumerate(emails):
+        start = time.perf_counter()
+        key = cache.key(subject, body, "Technical", "NEGATIVE", info, ["Status page: ..."])
+        draft = cache.get(key)
+        latencies.append(time.perf_counter() - start)
+        if draft is None:
+            calls += 1
+            tokens = PROMPT_TOKENS + (len(subject) + len(body)) // 4 + DRAFT_TOKENS
+            cache.put(key, f"draft for {label if label is not None else f'email {i}'}", tokens,
+                      llm_latency_ms / 1000)
+        elif label is None or draft != f"draft for {label}":
+            wrong += 1
+    latencies.sort()
+    stats = cache.stats()
+    return {
+        "max_distance": max_distance, "emails": len(emails), "llm_calls": calls, "hits": stats["hits"],
+        "similar_hits": stats["similar_hits"], "hit_rate": stats["hit_rate"], "wrong_reuses": wrong,
+        "saved_tokens": stats["saved_tokens"], "saved_llm_seconds": stats["saved_seconds"],
+        "lookup_p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "lookup_p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--incident-ratio", type=float, default=0.8,
+                        help="fraction of emails reporting one of the incidents")
+    parser.add_argument("--phone-ratio", type=float, default=0.3,
+                        help="fraction of emails signed with a phone number")
+    parser.add_argument("--max-distance", type=int, nargs="+", default=[0, 3, 6, 10])
+    parser.add_argument("--llm-latency-ms", type=float, default=2000.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    emails = make_emails(args.emails, args.incident_ratio, random.Random(args.seed), args.phone_ratio)
+    for max_distance in args.max_distance:
+        print(json.dumps(run(emails, max_distance, args.llm_latency_ms)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark nlp_service.analyze_sentiment_batch against per-email calls.
+
+Runs the sentiment model over synthetic support-mail bodies of mixed
+length, once per email with analyze_sentiment and then with
+analyze_sentiment_batch at several batch sizes (plus unsorted batches to
+show the padding cost), and reports emails/sec on CPU and how many labels
+agree with the per-email run. Run from the repository root:
+
+    python -m benchmarks.bench_sentiment_batch --emails 512
+    python -m benchmarks.bench_sentiment_batch --batch-sizes 1 8 32 --threads 4
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.bench_e2e import FILLER, SUPPORT_TEMPLATES
+
+
+def make_texts(count: int, max_sentences: int, seed: int):
+    rng = random.Random(seed)
+    templates = list(SUPPORT_TEMPLATES.values())
+    return [
+        templates[i % len(templates)][1] + " " + FILLER.format(n=i) * rng.randint(0, max_sentences - 1)
+        for i in range(count)
+    ]
+
+
+def _timed(func, texts):
+    start = time.perf_counter()
+    results = func(texts)
+    return results, time.perf_counter() - start
+
+
+def run(emails: int, batch_sizes, max_sentences: int, seed: int, threads: int = None):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    from app.config import settings
+    from app.services import nlp_service
+
+    # Measure the batch sizes given here, not the shared micro-batcher's
+    settings.NLP_MICROBATCH = False
+
+    if nlp_service.get_sentiment_analyzer() is None:
+        sys.exit("Sentiment model could not be loaded, nothing to benchmark")
+
+    texts = make_texts(emails, max_sentences, seed)
+    # Load the model up front so lazy initialisation is not measured
+    nlp_service.warmup()
+
+    baseline, elapsed = _timed(lambda t: [nlp_service.analyze_sentiment(text) for text in t], texts)
+    rows = [{"mode": "per_email", "batch_size": 1, "emails": emails, "seconds": round(elapsed, 4),
+             "emails_per_sec": round(emails / elapsed, 1), "label_agreement": 1.0}]
+
+    def agreement(results):
+        return round(sum(a[0] == b[0] for a, b in zip(results, baseline)) / emails, 4)
+
+    for batch_size in batch_sizes:
+        results, elapsed = _timed(lambda t: nlp_service.analyze_sentiment_batch(t, batch_size=batch_size), texts)
+        rows.append({"mode": "batch_sorted", "batch_size": batch_size, "emails": emails,
+                     "seconds": round(elapsed, 4), "emails_per_sec": round(emails / elapsed, 1),
+                     "label_agreement": agreement(results)})
+
+        # Same batches in arrival order, i.e. without sorting by length
+        analyzer = nlp_service.get_sentiment_analyzer()
+        results, elapsed = _timed(
+            lambda t: [(r["label"].lower(), r["score"])
+                       for r in analyzer([text[:512] for text in t], batch_size=batch_size, truncation=True)],
+            texts
+        )
+        rows.append({"mode": "batch_unsorted", "batch_size": batch_size, "emails": emails,
+                     "seconds": round(elapsed, 4), "emails_per_sec": round(emails / elapsed, 1),
+                     "label_agreement": agreement(results)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--emails", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--max-sentences", type=int, default=8,
+                        help="bodies get 1..N sentences of filler text")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads")
+    args = parser.parse_args()
+
+    for row in run(args.emails, args.batch_sizes, args.max_sentences, args.seed, args.threads):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
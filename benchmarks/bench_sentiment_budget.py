@@ -0,0 +1,107 @@
+"""
+Latency of sentiment scoring by body size for the long-email strategies.
+
+Compares the previous behaviour (first 512 characters through the
+pipeline) with the token-budgeted "head_tail" and "chunked" strategies
+(NLP_SENTIMENT_STRATEGY, NLP_MAX_TOKENS_PER_EMAIL) on bodies from a few
+hundred characters to megabytes, reporting p50/max latency per email and
+how many tokens of each email the model actually saw. Latency should stop
+growing once a body exceeds the budget. Run from the repository root:
+
+    python -m benchmarks.bench_sentiment_budget
+    python -m benchmarks.bench_sentiment_budget --sizes 500 50000 --max-tokens 1024 2048 --repeat 5
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.bench_e2e import FILLER, SUPPORT_TEMPLATES
+
+
+def make_body(size: int) -> str:
+    opening = SUPPORT_TEMPLATES["technical"][1] + " "
+    closing = " Honestly this is the third time, I am frustrated and considering cancelling."
+    middle = ""
+    i = 0
+    while len(opening) + len(middle) + len(closing) < size:
+        middle += FILLER.format(n=i)
+        i += 1
+    return opening + middle[:max(0, size - len(opening) - len(closing))] + closing
+
+
+def _time(func, body: str, repeat: int):
+    latencies = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(body)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return result, latencies[len(latencies) // 2], latencies[-1]
+
+
+def run(sizes, max_tokens_list, repeat: int):
+    from app.config import settings
+    from app.services import nlp_service
+
+    settings.NLP_MICROBATCH = False
+    analyzer = nlp_service.get_sentiment_analyzer()
+    if analyzer is None:
+        sys.exit("Sentiment model could not be loaded, nothing to benchmark")
+    nlp_service.warmup()
+    tokenizer = analyzer.tokenizer
+    window = nlp_service._token_window(analyzer)
+
+    def chars512(body):
+        with nlp_service._inference():
+            result = analyzer(body[:512], truncation=True)[0]
+        return result["label"].lower(), result["score"]
+
+    configs = [("chars512", None)]
+    configs += [(strategy, max_tokens) for max_tokens in max_tokens_list for strategy in ("head_tail", "chunked")]
+    rows = []
+    for size in sizes:
+        body = make_body(size)
+        body_tokens = len(tokenizer(body, add_special_tokens=False, verbose=False)["input_ids"])
+        for strategy, max_tokens in configs:
+            if strategy == "chars512":
+                func = chars512
+                scored = len(tokenizer(body[:512], add_special_tokens=False, verbose=False)["input_ids"])
+            else:
+                settings.NLP_SENTIMENT_STRATEGY = strategy
+                settings.NLP_MAX_TOKENS_PER_EMAIL = max_tokens
+                func = nlp_service.analyze_sentiment
+                budget = min(max_tokens, window) if strategy == "head_tail" else max_tokens
+                scored = min(body_tokens, budget)
+            (label, score), p50, worst = _time(func, body, repeat)
+            rows.append({
+                "body_chars": size,
+                "body_tokens": body_tokens,
+                "strategy": strategy,
+                "max_tokens": max_tokens,
+                "tokens_scored": min(scored, body_tokens),
+                "latency_p50_ms": round(p50 * 1000, 1),
+                "latency_max_ms": round(worst * 1000, 1),
+                "label": label,
+                "score": round(score, 4),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 3000, 30000, 1000000],
+                        help="body lengths in characters")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[1536],
+                        help="NLP_MAX_TOKENS_PER_EMAIL values to try")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for row in run(args.sizes, args.max_tokens, args.repeat):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
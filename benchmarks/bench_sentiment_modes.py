@@ -0,0 +1,109 @@
+"""
+Accuracy vs latency report for the sentiment model inference modes.
+
+Loads the sentiment model once per NLP_INFERENCE_MODE (fp32, int8) and
+torch thread count, runs it over a labelled sample of support emails and
+reports accuracy, label agreement with the first mode (fp32 by default),
+per-email p50/p95 latency, batched emails/sec, load time and serialized
+model size, with the hub revision of the weights measured (accuracy only
+means something for the real checkpoint). Run from the repository root:
+
+    python -m benchmarks.bench_sentiment_modes
+    python -m benchmarks.bench_sentiment_modes --threads 1 2 4 --repeat 5
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+
+from app.config import settings
+from app.services import nlp_service
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "data", "sentiment_sample.jsonl")
+
+
+def load_sample(path: str):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [row["text"] for row in rows], [row["label"] for row in rows]
+
+
+def _model_size_mb(pipe) -> float:
+    import torch
+    buffer = io.BytesIO()
+    torch.save(pipe.model.state_dict(), buffer)
+    return round(buffer.tell() / (1024 * 1024), 1)
+
+
+def run(modes, threads_list, sample_path: str, repeat: int, batch_size: int):
+    import torch
+
+    default_threads = torch.get_num_threads()
+    texts, labels = load_sample(sample_path)
+    reference = None
+    rows = []
+    for threads in threads_list:
+        for mode in modes:
+            settings.NLP_TORCH_THREADS = threads
+            torch.set_num_threads(threads or default_threads)
+            start = time.perf_counter()
+            pipe = nlp_service.load_sentiment_pipeline(settings.SENTIMENT_MODEL, mode)
+            load_seconds = time.perf_counter() - start
+
+            with torch.inference_mode():
+                pipe(texts[:4], batch_size=4, truncation=True)
+
+                latencies = []
+                predictions = None
+                for _ in range(repeat):
+                    current = []
+                    for text in texts:
+                        t0 = time.perf_counter()
+                        current.append(pipe(text[:512], truncation=True)[0]["label"].lower())
+                        latencies.append(time.perf_counter() - t0)
+                    predictions = current
+
+                t0 = time.perf_counter()
+                for _ in range(repeat):
+                    pipe([text[:512] for text in sorted(texts, key=len)], batch_size=batch_size, truncation=True)
+                batched_seconds = time.perf_counter() - t0
+
+            if reference is None:
+                reference = predictions
+            ordered = sorted(latencies)
+            rows.append({
+                "mode": mode,
+                "revision": getattr(pipe.model.config, "_commit_hash", None),
+                "threads": torch.get_num_threads(),
+                "samples": len(texts),
+                "accuracy": round(sum(p == l for p, l in zip(predictions, labels)) / len(labels), 4),
+                "agreement_with_first": round(sum(p == r for p, r in zip(predictions, reference)) / len(labels), 4),
+                "latency_p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                "latency_p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                "latency_mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+                "batched_emails_per_sec": round(len(texts) * repeat / batched_seconds, 1),
+                "load_seconds": round(load_seconds, 2),
+                "model_size_mb": _model_size_mb(pipe),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["fp32", "int8"], choices=["fp32", "int8"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0],
+                        help="torch thread counts to try (0 = torch default)")
+    parser.add_argument("--sample", default=SAMPLE, help="JSONL file of {text, label} rows")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the sample per mode")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    for row in run(args.modes, args.threads, args.sample, args.repeat, args.batch_size):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measure API import time and time to first request.
+
+Imports app.main in fresh interpreters (also listing the slowest imports
+from ``python -X importtime``), then starts uvicorn repeatedly and times
+how long until GET / answers and until GET /ready returns 200. Run from
+the repository root:
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --database-url postgresql://user:pw@localhost/bench
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env, runs: int):
+    code = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+    seconds = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        seconds.append(float(out.stdout.strip().splitlines()[-1]))
+
+    # Slowest modules by cumulative import time, from one extra run
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.strip()))
+    # Nested imports are included, so a package and its heavy dependency both show up
+    slowest = [{"module": name, "cumulative_ms": round(us / 1000, 1)}
+               for us, name in sorted(modules, reverse=True)[:15]]
+    return seconds, slowest
+
+
+def measure_serve(env, timeout: float):
+    """
+    Start uvicorn and return (seconds to first 200 from /, seconds to 200
+    from /ready or None)
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    first_request = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - start < timeout and ready is None:
+                try:
+                    if first_request is None and client.get("/").status_code == 200:
+                        first_request = time.perf_counter() - start
+                    if first_request is not None and client.get("/ready").status_code == 200:
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_request, ready
+
+
+def _stats(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"median_s": round(statistics.median(values), 3), "min_s": round(min(values), 3),
+            "max_s": round(max(values), 3), "runs": len(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="give up on a server start after this many seconds")
+    parser.add_argument("--database-url", default=None,
+                        help="database for the app (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        fd, path = tempfile.mkstemp(prefix="bench-startup-", suffix=".db")
+        os.close(fd)
+        env["DATABASE_URL"] = f"sqlite:///{path}"
+    env.setdefault("EMAIL_WATCH_ENABLED", "false")
+
+    import_seconds, slowest = measure_import(env, args.runs)
+    serves = [measure_serve(env, args.timeout) for _ in range(args.runs)]
+    print(json.dumps({
+        "import_app_main": _stats(import_seconds),
+        "first_request": _stats([first for first, _ in serves]),
+        "ready": _stats([ready for _, ready in serves]),
+        "slowest_imports": slowest,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
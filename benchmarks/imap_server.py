@@ -0,0 +1,347 @@
+"""
+Minimal local IMAP4rev1 stand-in used by the benchmarks.
+
+Implements just enough of RFC 3501 for app.services.email_service to run
+against it unmodified over a plain (non-SSL) socket, with an optional
+artificial delay per command to simulate network round trips.
+"""
+
+import re
+import select
+import socketserver
+import threading
+import time
+from datetime import datetime
+from email import message_from_bytes
+from email.message import EmailMessage
+from typing import List, Optional
+
+
+class Mailbox:
+    """In-memory mailbox holding raw RFC822 messages keyed by UID."""
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.next_uid = 1
+        self.messages = []  # list of [uid, raw bytes, flags]
+        self.lock = threading.Lock()
+
+    def append(self, raw: bytes, flags=()) -> int:
+        with self.lock:
+            uid = self.next_uid
+            self.next_uid += 1
+            self.messages.append([uid, raw, set(flags)])
+            return uid
+
+    def snapshot(self) -> List[list]:
+        with self.lock:
+            return list(self.messages)
+
+
+def make_message(index: int, subject: str = None, body: str = None,
+                 sender: str = None, html: bool = False,
+                 attachment_bytes: int = 0) -> bytes:
+    """
+    Build a synthetic email. ``html`` adds a text/html alternative and
+    ``attachment_bytes`` attaches a PDF-like blob of that size.
+    """
+    msg = EmailMessage()
+    msg["From"] = sender or f"Customer {index} <customer{index}@example.com>"
+    msg["To"] = "support@example.com"
+    msg["Subject"] = subject or f"Help needed with order #{index}"
+    msg["Message-ID"] = f"<bench-{index}@example.com>"
+    msg["Date"] = datetime(2024, 1, 1, 12, 0, 0).strftime("%a, %d %b %Y %H:%M:%S +0000")
+    text = body or (
+        f"Hi team, I have a problem with my account and cannot log in since "
+        f"yesterday. Please help me as soon as possible. Ticket {index}.\n"
+    )
+    msg.set_content(text)
+    if html:
+        msg.add_alternative(f"<html><body><p>{text}</p></body></html>", subtype="html")
+    if attachment_bytes:
+        blob = (b"%PDF-1.4 synthetic " * (attachment_bytes // 19 + 1))[:attachment_bytes]
+        msg.add_attachment(blob, maintype="application", subtype="pdf",
+                           filename=f"document-{index}.pdf")
+    return msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+
+
+def _split_header(raw: bytes):
+    for sep in (b"\r\n\r\n", b"\n\n"):
+        pos = raw.find(sep)
+        if pos >= 0:
+            return raw[:pos + len(sep)], raw[pos + len(sep):]
+    return raw, b""
+
+
+def _quote(value) -> str:
+    return "NIL" if value is None else '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _bodystructure(part) -> str:
+    """Render an email.message part as an IMAP BODYSTRUCTURE list."""
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype())})"
+    params = [f"{_quote(k)} {_quote(v)}" for k, v in part.get_params()[1:]]
+    params = f"({' '.join(params)})" if params else "NIL"
+    body = _split_header(part.as_bytes())[1]
+    fields = [
+        _quote(part.get_content_maintype()), _quote(part.get_content_subtype()), params,
+        "NIL", "NIL", _quote(part.get("Content-Transfer-Encoding", "7bit").lower()), str(len(body)),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(body.count(b"\n")))
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        disp_params = f'("filename" {_quote(filename)})' if filename else "NIL"
+        fields += ["NIL", f"({_quote(disposition)} {disp_params})"]
+    return f"({' '.join(fields)})"
+
+
+def _section(raw: bytes, section: str) -> bytes:
+    """Return the bytes of a BODY[section] such as HEADER, TEXT or 1.2."""
+    if section == "":
+        return raw
+    if section == "HEADER":
+        return _split_header(raw)[0]
+    if section == "TEXT":
+        return _split_header(raw)[1]
+    part = message_from_bytes(raw)
+    for index in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(index) - 1]
+        elif index != "1":
+            return b""
+    return _split_header(part.as_bytes())[1]
+
+
+def _parse_set(spec: str, values: List[int]) -> List[int]:
+    """Resolve an IMAP sequence set (``1:3,7,10:*``) against ``values``."""
+    if not values:
+        return []
+    top = max(values)
+    wanted = set()
+    ranges = []
+    for item in spec.split(","):
+        if ":" in item:
+            lo, hi = item.split(":", 1)
+            lo = top if lo == "*" else int(lo)
+            hi = top if hi == "*" else int(hi)
+            ranges.append((min(lo, hi), max(lo, hi)))
+        else:
+            wanted.add(top if item == "*" else int(item))
+    return [v for v in values if v in wanted or any(lo <= v <= hi for lo, hi in ranges)]
+
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    """Handles one client connection."""
+
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def send(self, line):
+        if isinstance(line, str):
+            line = line.encode()
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        self.selected = None
+        self.known_exists = 0
+        self.send("* OK [CAPABILITY IMAP4rev1] IMAP stand-in ready")
+        self.wfile.flush()
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            parts = line.decode().rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2:
+                continue
+            tag, command = parts[0], parts[1].upper()
+            args = parts[2] if len(parts) > 2 else ""
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            use_uid = False
+            if command == "UID":
+                use_uid = True
+                command, _, args = args.partition(" ")
+                command = command.upper()
+            handler = getattr(self, f"do_{command}", None)
+            if handler is None:
+                self.send(f"{tag} BAD unknown command {command}")
+                self.wfile.flush()
+                continue
+            if handler(tag, args, use_uid) is False:
+                break
+            self.wfile.flush()
+
+    def do_CAPABILITY(self, tag, args, use_uid):
+        self.send("* CAPABILITY IMAP4rev1" + (" IDLE" if self.server.idle else ""))
+        self.send(f"{tag} OK CAPABILITY completed")
+
+    def do_LOGIN(self, tag, args, use_uid):
+        self.send(f"{tag} OK LOGIN completed")
+
+    def do_NOOP(self, tag, args, use_uid):
+        self._report_exists()
+        self.send(f"{tag} OK NOOP completed")
+
+    def do_IDLE(self, tag, args, use_uid):
+        if not self.server.idle:
+            self.send(f"{tag} BAD IDLE not supported")
+            return
+        self.send("+ idling")
+        self.wfile.flush()
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.01)
+            if readable:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    break
+            self._report_exists()
+            self.wfile.flush()
+        self.send(f"{tag} OK IDLE terminated")
+
+    def _report_exists(self):
+        if self.selected is None:
+            return
+        count = len(self.selected.snapshot())
+        if count != self.known_exists:
+            self.known_exists = count
+            self.send(f"* {count} EXISTS")
+
+    def do_SELECT(self, tag, args, use_uid):
+        self.selected = self.server.mailbox
+        box = self.selected
+        self.known_exists = len(box.snapshot())
+        self.send(f"* {self.known_exists} EXISTS")
+        self.send("* 0 RECENT")
+        self.send("* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)")
+        self.send(f"* OK [UIDVALIDITY {box.uidvalidity}] UIDs valid")
+        self.send(f"* OK [UIDNEXT {box.next_uid}] Predicted next UID")
+        self.send(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    do_EXAMINE = do_SELECT
+
+    def do_SEARCH(self, tag, args, use_uid):
+        messages = self.selected.snapshot()
+        tokens = args.upper().split()
+        matches = list(range(len(messages)))
+        i = 0
+        while i < len(tokens):
+            token = tokens[i].strip("()")
+            if token == "UNSEEN":
+                matches = [m for m in matches if "\\Seen" not in messages[m][2]]
+            elif token in ("SINCE", "BEFORE", "ON", "CHARSET"):
+                i += 1  # dates are ignored; every message is "recent"
+            elif token == "UID":
+                i += 1
+                uids = _parse_set(tokens[i].strip("()"), [messages[m][0] for m in matches])
+                matches = [m for m in matches if messages[m][0] in uids]
+            elif token not in ("ALL", "NIL"):
+                seqs = _parse_set(token, [m + 1 for m in matches])
+                matches = [m for m in matches if m + 1 in seqs]
+            i += 1
+        if use_uid:
+            found = [str(messages[m][0]) for m in matches]
+        else:
+            found = [str(m + 1) for m in matches]
+        self.send("* SEARCH" + ("" if not found else " " + " ".join(found)))
+        self.send(f"{tag} OK SEARCH completed")
+
+    def do_FETCH(self, tag, args, use_uid):
+        spec, _, items = args.partition(" ")
+        messages = self.selected.snapshot()
+        if use_uid:
+            uids = set(_parse_set(spec, [m[0] for m in messages]))
+            targets = [(n + 1, m) for n, m in enumerate(messages) if m[0] in uids]
+        else:
+            seqs = set(_parse_set(spec, list(range(1, len(messages) + 1))))
+            targets = [(n + 1, m) for n, m in enumerate(messages) if n + 1 in seqs]
+        wanted = re.findall(r"BODY(?:\.PEEK)?\[[^\]]*\](?:<[\d.]+>)?|[A-Z0-9.]+", items.upper())
+        if use_uid and "UID" not in wanted:
+            wanted.insert(0, "UID")
+        for seq, (uid, raw, flags) in targets:
+            out = f"* {seq} FETCH (".encode()
+            first = True
+            for item in wanted:
+                chunk = self._fetch_item(item, uid, raw, flags)
+                if chunk is None:
+                    continue
+                out += (b"" if first else b" ") + chunk
+                first = False
+            self.wfile.write(out + b")\r\n")
+        self.send(f"{tag} OK FETCH completed")
+
+    def _fetch_item(self, item, uid, raw, flags) -> Optional[bytes]:
+        if item == "UID":
+            return f"UID {uid}".encode()
+        if item == "FLAGS":
+            return f"FLAGS ({' '.join(sorted(flags))})".encode()
+        if item == "RFC822.SIZE":
+            return f"RFC822.SIZE {len(raw)}".encode()
+        if item == "BODYSTRUCTURE":
+            return b"BODYSTRUCTURE " + self._cached(uid, "BODYSTRUCTURE", raw)
+        if item == "RFC822":
+            flags.add("\\Seen")
+            return f"RFC822 {{{len(raw)}}}\r\n".encode() + raw
+        match = re.match(r"BODY(\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?$", item)
+        if match:
+            peek, section, offset, length = match.groups()
+            data = self._cached(uid, section, raw)
+            name = f"BODY[{section}]"
+            if offset is not None:
+                data = data[int(offset):int(offset) + int(length)]
+                name += f"<{offset}>"
+            if not peek:
+                flags.add("\\Seen")
+            return f"{name} {{{len(data)}}}\r\n".encode() + data
+        return None
+
+    def _cached(self, uid, key, raw) -> bytes:
+        # Re-parsing MIME on every FETCH would make the stand-in the bottleneck
+        cache = self.server.cache
+        if (uid, key) not in cache:
+            if key == "BODYSTRUCTURE":
+                cache[(uid, key)] = _bodystructure(message_from_bytes(raw)).encode()
+            else:
+                cache[(uid, key)] = _section(raw, key)
+        return cache[(uid, key)]
+
+    def do_CLOSE(self, tag, args, use_uid):
+        self.selected = None
+        self.send(f"{tag} OK CLOSE completed")
+
+    def do_LOGOUT(self, tag, args, use_uid):
+        self.send("* BYE IMAP stand-in closing connection")
+        self.send(f"{tag} OK LOGOUT completed")
+        return False
+
+
+class IMAPServer(socketserver.ThreadingTCPServer):
+    """Threaded IMAP stand-in bound to localhost on an ephemeral port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox: Mailbox = None, latency_ms: float = 0.0,
+                 idle: bool = True, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), IMAPHandler)
+        self.mailbox = mailbox or Mailbox()
+        self.latency = latency_ms / 1000.0
+        self.idle = idle
+        self.cache = {}
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "IMAPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
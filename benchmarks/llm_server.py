@@ -0,0 +1,133 @@
+"""
+Local stand-in for the OpenAI chat completions API used by the benchmarks.
+
+Answers ``POST /v1/chat/completions`` with a canned draft after an
+artificial delay, so app.services.ai_service can run unmodified with
+OPENAI_BASE_URL pointed at it. A fraction of requests can be failed with
+a 429 or 500 instead, to exercise retries.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if server.latency_ms:
+                time.sleep(server.latency_ms / 1000.0)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        if server.error_rate and random.random() < server.error_rate:
+            status = random.choice((429, 500))
+            with server.lock:
+                server.errors += 1
+            self._reply(status, {"error": {"message": "injected error", "type": "bench", "code": status}})
+            return
+        prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+        with server.lock:
+            server.requests += 1
+            server.prompt_chars += prompt_chars
+        content = ("Thank you for reaching out. We are sorry for the trouble and are "
+                   "looking into it now; we will follow up shortly.")
+        self._reply(200, {
+            "id": f"chatcmpl-bench-{server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "bench"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            # Rough 4 chars/token estimate, good enough for relative numbers
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (prompt_chars + len(content)) // 4},
+        })
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Room for every connection of a highly concurrent client
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on a slow request (cancelled drafts) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class LLMServer:
+    """
+    Fake OpenAI endpoint on a background thread. ``base_url`` is the value
+    for OPENAI_BASE_URL; ``requests`` counts completions served, ``errors``
+    the injected failures (``error_rate`` of all requests, half 429s and
+    half 500s) and ``max_in_flight`` the most requests served at once.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 error_rate: float = 0.0):
+        self.server = _HTTPServer((host, port), LLMHandler)
+        self.server.daemon_threads = True
+        self.server.latency_ms = latency_ms
+        self.server.error_rate = error_rate
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.prompt_chars = 0
+        self.server.errors = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    @property
+    def errors(self) -> int:
+        return self.server.errors
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.server.max_in_flight
+
+    def start(self) -> "LLMServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
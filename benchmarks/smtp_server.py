@@ -0,0 +1,107 @@
+"""
+Minimal local SMTP stand-in used by the benchmarks.
+
+Accepts any AUTH PLAIN/LOGIN credentials over a plain socket and keeps
+delivered messages in memory, so app.services.response_service can send
+through it with SMTP_USE_SSL=false.
+"""
+
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def send(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        self.send("220 localhost ESMTP bench")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if server.latency_ms:
+                time.sleep(server.latency_ms / 1000.0)
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.send("250-localhost")
+                self.send("250-AUTH PLAIN LOGIN")
+                self.send("250 8BITMIME")
+            elif verb == "HELO":
+                self.send("250 localhost")
+            elif verb == "AUTH":
+                args = command.split()
+                if len(args) > 1 and args[1].upper() == "LOGIN":
+                    for _ in range(2 if len(args) == 2 else 1):
+                        self.send("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                elif len(args) == 2:
+                    # AUTH PLAIN with the credentials on the next line
+                    self.send("334 ")
+                    self.rfile.readline()
+                self.send("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip(), []
+                self.send("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:].strip())
+                self.send("250 OK")
+            elif verb == "DATA":
+                self.send("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                with server.lock:
+                    server.messages.append((sender, recipients, b"".join(data)))
+                self.send("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.send("250 OK")
+            elif verb == "QUIT":
+                self.send("221 Bye")
+                return
+            else:
+                self.send("502 Command not implemented")
+
+
+class SMTPServer:
+    """
+    SMTP stand-in on a background thread. ``messages`` holds
+    ``(sender, recipients, raw_bytes)`` for every accepted message.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.latency_ms = latency_ms
+        self.server.lock = threading.Lock()
+        self.server.messages = []
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    @property
+    def messages(self):
+        return self.server.messages
+
+    def start(self) -> "SMTPServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,3 +1,4 @@
+import time
 import streamlit as st
 from datetime import datetime
 from streamlit_utils import (
@@ -6,6 +7,8 @@ from streamlit_utils import (
     set_api_base_url
 )
 
+# Seconds to follow a fetch job's progress before leaving it to the server
+FETCH_MAX_WAIT = 300
 
 st.set_page_config(page_title="AI Email Assistant Dashboard", layout="wide")
 
@@ -27,15 +30,44 @@ st.sidebar.subheader("🔄 Actions")
 col_fetch, col_manual = st.sidebar.columns(2)
 with col_fetch:
     if st.sidebar.button("📬 Fetch & Process", use_container_width=True):
-        with st.spinner("Fetching emails from server..."):
-            result = safe_api_call(
-                lambda: api_post("/fetch-emails/"),
-                error_message="Failed to fetch emails",
-                return_default=None
-            )
-            if result:
-                st.sidebar.success(f"✅ {result.get('message', 'Fetch started')}")
-                st.session_state["emails"] = None  # Force refresh
+        result = safe_api_call(
+            lambda: api_post("/fetch-emails/"),
+            error_message="Failed to start email fetch",
+            return_default=None
+        )
+        if result and result.get("job_id"):
+            job_id = result["job_id"]
+            st.sidebar.info(f"{result.get('message', 'Fetch started')} (job {job_id[:8]})")
+            progress = st.sidebar.empty()
+            job = None
+            # The job runs server-side; poll its progress instead of holding the request open
+            deadline = time.monotonic() + FETCH_MAX_WAIT
+            while time.monotonic() < deadline:
+                job = safe_api_call(
+                    lambda: api_get(f"/jobs/{job_id}"),
+                    error_message="Failed to read job progress",
+                    return_default=None
+                )
+                if not job or job.get("status") in ("succeeded", "failed"):
+                    break
+                counts = job.get("counts", {})
+                progress.caption(
+                    f"⏳ {counts.get('messages', 0)} fetched · {counts.get('parsed', 0)} parsed · "
+                    f"{counts.get('analyzed', 0)} analyzed · {counts.get('stored', 0)} stored"
+                )
+                time.sleep(1)
+            progress.empty()
+            if job and job.get("status") == "succeeded":
+                stored = job.get("counts", {}).get("stored", 0)
+                st.sidebar.success(f"✅ Processed {stored} new emails")
+            elif job and job.get("status") != "failed":
+                st.sidebar.warning(
+                    f"Still fetching after {FETCH_MAX_WAIT}s; the job continues on the server, "
+                    "use Refresh List later to see the new emails"
+                )
+            elif job:
+                st.sidebar.error(f"Fetch failed: {'; '.join(job.get('errors', []))}")
+            st.session_state["emails"] = None  # Force refresh
 
 with col_manual:
     if st.sidebar.button("🔃 Refresh List", use_container_width=True):
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.services import analysis_cache as analysis_cache_module
+from app.services.analysis_cache import AnalysisCache
+
+
+def _cache(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    monkeypatch.setattr(analysis_cache_module, "SessionLocal", session)
+    return AnalysisCache(max_entries=0, use_db=True), session
+
+
+def _versions(session):
+    db = session()
+    try:
+        return sorted(version for version, in db.query(models.AnalysisCacheEntry.version))
+    finally:
+        db.close()
+
+
+def test_new_version_deletes_rows_of_older_versions(monkeypatch, tmp_path):
+    cache, session = _cache(monkeypatch, tmp_path)
+    cache.put_many({cache.key("v1", "a", "body"): {"urgency": 1}, cache.key("v1", "b", "body"): {"urgency": 2}}, "v1")
+    cache.put_many({cache.key("v1", "c", "body"): {"urgency": 3}}, "v1")
+    assert _versions(session) == ["v1", "v1", "v1"]
+
+    cache.put_many({cache.key("v2", "a", "body"): {"urgency": 1}}, "v2")
+    assert _versions(session) == ["v2"]
+    assert cache.stats()["db_pruned_rows"] == 3
+
+
+def test_rows_older_than_max_age_are_deleted(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        crud.save_analysis_cache_entries(db, {"old": {}, "new": {}}, "v1")
+        db.query(models.AnalysisCacheEntry).filter(models.AnalysisCacheEntry.key == "old").update(
+            {models.AnalysisCacheEntry.created_at: datetime.utcnow() - timedelta(days=40)})
+        db.commit()
+        assert crud.delete_stale_analysis_cache_entries(db, "v1", max_age_days=0) == 0
+        assert crud.delete_stale_analysis_cache_entries(db, "v1", max_age_days=30) == 1
+        assert [key for key, in db.query(models.AnalysisCacheEntry.key)] == ["new"]
+    finally:
+        db.close()
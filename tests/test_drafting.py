@@ -0,0 +1,72 @@
+from concurrent.futures import wait
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, drafting, models
+from app.config import settings
+from benchmarks.bench_drafting import make_emails
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'drafts.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    monkeypatch.setattr(drafting, "SessionLocal", session)
+    monkeypatch.setattr(settings, "KB_SEARCH_BACKEND", "keyword")
+    return session
+
+
+def _store(session, n: int):
+    db = session()
+    try:
+        return list(crud.create_emails_bulk(db, make_emails(n)))
+    finally:
+        db.close()
+
+
+def test_draft_without_api_key_is_not_saved(monkeypatch, session):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+    message_ids = _store(session, 1)
+    engine = drafting.DraftEngine(2, name="test-drafts")
+    try:
+        wait(engine.submit(message_ids), timeout=10)
+        assert engine.stats()["failed"] == 1
+    finally:
+        engine.stop()
+    db = session()
+    try:
+        email = crud.get_email_by_message_id(db, message_ids[0])
+        assert email.ai_response is None and not email.is_processed
+        assert crud.get_undrafted_message_ids(db) == message_ids
+    finally:
+        db.close()
+
+
+def test_failed_drafts_are_retried_with_backoff_up_to_max_attempts(session):
+    message_ids = _store(session, 2)
+    db = session()
+    try:
+        crud.record_draft_failure(db, message_ids[0])
+        # Failed a moment ago: not due before the retry delay
+        assert crud.get_undrafted_message_ids(db, max_attempts=2, retry_delay=60) == message_ids[1:]
+        assert crud.get_undrafted_message_ids(db, max_attempts=2, retry_delay=0) == message_ids
+        crud.record_draft_failure(db, message_ids[0])
+        assert crud.get_undrafted_message_ids(db, max_attempts=2, retry_delay=0) == message_ids[1:]
+        assert crud.get_undrafted_message_ids(db) == message_ids
+    finally:
+        db.close()
+
+
+def test_email_drafted_meanwhile_is_not_drafted_again(session):
+    message_ids = _store(session, 1)
+    db = session()
+    try:
+        inputs = drafting.prepare_draft(db, message_ids[0])
+        assert inputs is not None
+        drafting.save_draft(db, inputs["email_id"], "Thanks, we are on it.")
+        assert drafting.prepare_draft(db, message_ids[0]) is None
+    finally:
+        db.close()
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, ingest, models
+from app.config import settings
+from benchmarks.imap_server import IMAPServer, Mailbox, make_message
+
+
+def test_sync_skips_an_email_that_fails_and_advances_the_checkpoint(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    monkeypatch.setattr(ingest, "SessionLocal", session)
+    monkeypatch.setattr(ingest, "analyze_sentiment_batch",
+                        lambda texts, scans=None: [("NEUTRAL", 0.5)] * len(texts))
+    monkeypatch.setattr(settings, "EMAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "EMAIL_USE_SSL", False)
+    monkeypatch.setattr(settings, "EMAIL_PARSE_WORKERS", 1)
+
+    mailbox = Mailbox()
+    # Bcc'd to support: no To: header, so no recipient
+    mailbox.append(make_message(0).replace(b"To: support@example.com\r\n", b""))
+    mailbox.append(make_message(1))
+    server = IMAPServer(mailbox).start()
+    monkeypatch.setattr(settings, "EMAIL_PORT", server.port)
+    db = session()
+    try:
+        stats, errors = {}, []
+        stored = ingest.sync_mailbox(db, stats=stats, errors=errors)
+        assert stored == ["<bench-1@example.com>"]
+        assert stats["failed"] == 1
+        assert len(errors) == 1 and "<bench-0@example.com>" in errors[0]
+        assert crud.get_sync_state(db, settings.EMAIL_MAILBOX).last_uid == 2
+
+        # The next sync starts after it instead of failing on it again
+        assert ingest.sync_mailbox(db, stats={}, errors=errors) == []
+        assert len(errors) == 1
+    finally:
+        db.close()
+        server.stop()
+
+
+def test_analysis_skips_only_the_email_that_breaks_the_batch(monkeypatch):
+    def analyze_sentiment_batch(texts, scans=None):
+        if any("boom" in text for text in texts):
+            raise RuntimeError("boom")
+        return [("NEUTRAL", 0.5)] * len(texts)
+
+    monkeypatch.setattr(ingest, "analyze_sentiment_batch", analyze_sentiment_batch)
+    monkeypatch.setattr(ingest.analysis_cache, "max_entries", 0)
+    monkeypatch.setattr(ingest.analysis_cache, "use_db", False)
+    emails = [
+        {"message_id": f"<{i}@example.com>", "sender": "customer@example.com", "recipient": "support@example.com",
+         "subject": "Help", "body": body, "date": datetime(2024, 1, 1)}
+        for i, body in enumerate(["I cannot log in", "boom", "My invoice is wrong"])
+    ]
+    errors = []
+    analyzed = ingest.analyze_emails(emails, errors=errors)
+    assert [email.message_id for email in analyzed] == ["<0@example.com>", "<2@example.com>"]
+    assert len(errors) == 1 and "<1@example.com>" in errors[0]
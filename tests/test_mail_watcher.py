@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.mail_watcher import MailboxWatcher
+from benchmarks.imap_server import IMAPHandler, IMAPServer, Mailbox, make_message
+
+
+class _BusyMailboxHandler(IMAPHandler):
+    """
+    A message arrives right after the first search, and the server reports
+    it along with the FETCH response, as real servers do
+    """
+
+    def do_SEARCH(self, tag, args, use_uid):
+        super().do_SEARCH(tag, args, use_uid)
+        if not self.server.arrived:
+            self.server.arrived = True
+            self.server.mailbox.append(make_message(1))
+
+    def do_FETCH(self, tag, args, use_uid):
+        self._report_exists()
+        super().do_FETCH(tag, args, use_uid)
+
+
+def _watch(monkeypatch, server: IMAPServer, calls: list, idle_timeout: float = 30.0) -> MailboxWatcher:
+    monkeypatch.setattr(settings, "EMAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "EMAIL_PORT", server.port)
+    monkeypatch.setattr(settings, "EMAIL_USE_SSL", False)
+    monkeypatch.setattr(settings, "EMAIL_POLL_INTERVAL", 0.05)
+
+    def on_new_mail(mail):
+        # Like sync_mailbox: select the mailbox again, search and fetch
+        mail.select("inbox")
+        _, found = mail.uid("search", None, "ALL")
+        uids = found[0].decode().split()
+        if uids:
+            mail.uid("fetch", ",".join(uids), "(UID)")
+        calls.append(uids)
+
+    watcher = MailboxWatcher(on_new_mail, idle_timeout=idle_timeout)
+    watcher.start()
+    return watcher
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_noop_watcher_stays_idle_without_new_mail(monkeypatch):
+    mailbox = Mailbox()
+    mailbox.append(make_message(0))
+    server = IMAPServer(mailbox, idle=False).start()
+    calls = []
+    watcher = _watch(monkeypatch, server, calls)
+    try:
+        assert _wait_for(lambda: len(calls) >= 1)
+        time.sleep(1.0)
+        # Only the catch-up sync after connecting
+        assert len(calls) == 1
+
+        mailbox.append(make_message(1))
+        assert _wait_for(lambda: len(calls) >= 2)
+        time.sleep(0.5)
+        assert len(calls) == 2
+    finally:
+        watcher.stop()
+        server.stop()
+
+
+def test_idle_watcher_stays_idle_without_new_mail(monkeypatch):
+    server = IMAPServer(Mailbox(), idle=True).start()
+    calls = []
+    watcher = _watch(monkeypatch, server, calls)
+    try:
+        assert _wait_for(lambda: len(calls) >= 1)
+        time.sleep(1.0)
+        assert len(calls) == 1
+    finally:
+        watcher.stop()
+        server.stop()
+
+
+@pytest.mark.parametrize("idle", [True, False])
+def test_watcher_syncs_mail_announced_during_a_sync(monkeypatch, idle):
+    mailbox = Mailbox()
+    mailbox.append(make_message(0))
+    server = IMAPServer(mailbox, idle=idle)
+    server.RequestHandlerClass = _BusyMailboxHandler
+    server.arrived = False
+    server.start()
+    calls = []
+    watcher = _watch(monkeypatch, server, calls)
+    try:
+        assert _wait_for(lambda: len(calls) >= 2, timeout=3.0)
+        assert calls[:2] == [["1"], ["1", "2"]]
+    finally:
+        watcher.stop()
+        server.stop()
+
+
+@pytest.mark.parametrize("idle", [True, False])
+def test_watcher_syncs_when_idle_timeout_passes(monkeypatch, idle):
+    server = IMAPServer(Mailbox(), idle=idle).start()
+    calls = []
+    watcher = _watch(monkeypatch, server, calls, idle_timeout=0.3)
+    try:
+        assert _wait_for(lambda: len(calls) >= 3, timeout=3.0)
+    finally:
+        watcher.stop()
+        server.stop()
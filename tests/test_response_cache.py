@@ -0,0 +1,47 @@
+from app.services.response_cache import ResponseCache
+
+BODY = "Your website has been returning a 502 error since 10:32, please fix it."
+
+
+def test_key_includes_extracted_info():
+    cache = ResponseCache(max_entries=10, ttl=0, max_distance=0)
+    alice = cache.key("Site down", BODY, "Technical", "NEGATIVE", {"phone_numbers": ["+1 555 0100"]})
+    bob = cache.key("Site down", BODY, "Technical", "NEGATIVE", {"phone_numbers": ["+1 555 0199"]})
+    cache.put(alice, "Dear customer at +1 555 0100, ...")
+    assert alice != bob
+    assert cache.get(bob) is None
+    assert cache.get(cache.key("Site  down", BODY, "Technical", "NEGATIVE", {"phone_numbers": ["+1 555 0100"]}))
+
+
+def test_similar_key_needs_same_extracted_info():
+    cache = ResponseCache(max_entries=10, ttl=0, max_distance=8)
+    cache.put(cache.key("Site down", BODY, "Technical", "NEGATIVE", {"urls": ["https://a.example"]}), "draft")
+    assert cache.get(cache.key("Site down!", BODY, "Technical", "NEGATIVE", {"urls": ["https://a.example"]})) == "draft"
+    assert cache.get(cache.key("Site down!", BODY, "Technical", "NEGATIVE", {"urls": ["https://b.example"]})) is None
+
+
+def test_claim_shares_one_draft_in_progress():
+    cache = ResponseCache(max_entries=10, ttl=0, max_distance=0)
+    key = cache.key("Site down", BODY, "Technical", "NEGATIVE", {})
+    assert cache.get(key) is None
+    assert cache.claim(key) is None  # this caller drafts it
+    waiting = [cache.claim(key) for _ in range(3)]
+    assert all(future is not None and not future.done() for future in waiting)
+    cache.release(key, "draft", tokens=100, seconds=2.0)
+    assert [future.result() for future in waiting] == ["draft"] * 3
+    stats = cache.stats()
+    assert stats["shared_hits"] == 3
+    assert stats["saved_tokens"] == 300
+    assert cache.get(key) == "draft"
+    assert cache.claim(cache.key("Other", BODY, "Technical", "NEGATIVE", {})) is None
+
+
+def test_failed_draft_releases_waiters():
+    cache = ResponseCache(max_entries=10, ttl=0, max_distance=0)
+    key = cache.key("Site down", BODY, "Technical", "NEGATIVE", {})
+    assert cache.claim(key) is None
+    waiting = cache.claim(key)
+    cache.release(key, None)
+    assert waiting.result() is None
+    assert cache.get(key) is None
+    assert cache.claim(key) is None  # the next caller drafts it again
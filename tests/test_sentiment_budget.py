@@ -0,0 +1,17 @@
+import pytest
+
+from app.config import settings
+from app.services import nlp_service
+
+
+@pytest.mark.parametrize("strategy", ["head_tail", "chunked"])
+def test_budget_segments_of_empty_text(monkeypatch, strategy):
+    monkeypatch.setattr(settings, "NLP_SENTIMENT_STRATEGY", strategy)
+    assert nlp_service._budget_segments([], 510) == [[]]
+
+
+def test_predict_sentiment_of_text_without_tokens():
+    pytest.importorskip("transformers")
+    results = nlp_service._predict_sentiment(["​", "Thanks, that fixed it!"])
+    assert len(results) == 2
+    assert all(0.0 <= score <= 1.0 for _, score in results)